@@ -1,6 +1,5 @@
 import configparser
 import logging
-import requests
 import time
 import os
 import math
@@ -15,9 +14,6 @@ config = configparser.ConfigParser()
 config.read(os.path.join(os.path.dirname(__file__), '../..', 'config.ini'))
 setup_logging(config['Flight_Script']['App_Name'])
 
-FLIGHT_API = f"http://{config['Flight_API']['API_IP_Address']}" + \
-             f":{config['Flight_API']['API_IP_PORT']}"
-
 
 class CommandHandler:
 
@@ -28,6 +24,8 @@ class CommandHandler:
         self.light = light_controller
         self.sound = sound_controller
         self.current_command = {}
+        # Set by the flight loop on the battery_change_completed event
+        self.battery_change_completed = False
 
     def execute_command(self, command):
         # Commands Accepted:
@@ -61,6 +59,7 @@ class CommandHandler:
             self.pixhawk.set_altitude(
                 self.current_command["Details"]["Altitude"])
         elif self.current_command["Command"] == "BatteryChange":
+            self.battery_change_completed = False
             self.sound.play_quick_sound(5)
         elif self.current_command["Command"] == "Hold":
             self.sound.countdown(command["Details"]["Time"])
@@ -112,16 +111,8 @@ class CommandHandler:
                 return True
         elif self.current_command["Command"] == "BatteryChange":
             # Wait till button pressed that battery change completed
-            try:
-                battery_endpoint = "check-for-battery-change-completed"
-                response = requests.get(f"{FLIGHT_API}/{battery_endpoint}")
-                response.raise_for_status()
-                if response.json() and "battery_change_completed" in response.json():
-                    bc_status = response.json()["battery_change_completed"]
-                    logging.info(f"Battery Change Status: {bc_status}")
-                    return bc_status
-            except requests.exceptions.RequestException as e:
-                logging.error(f"Battery Change Status Error {e}")
-                return False
+            if self.battery_change_completed:
+                logging.info("Battery Change Completed")
+                return True
 
         return False
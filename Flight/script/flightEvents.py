@@ -0,0 +1,111 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+import requests
+
+from Shared.apiClient import ApiClient
+
+# Seconds to wait for the Flight API to accept a connection
+CONNECT_TIMEOUT = 3
+# Seconds without data, keepalives included, before reconnecting
+READ_TIMEOUT = 15
+# Seconds between reconnection attempts
+RECONNECT_TIME = 1
+
+
+class FlightEventStream:
+    """Keeps an event stream open to the Flight API /events endpoint.
+
+    A background thread reads server-sent events as Flight API pushes them
+    and queues them for the flight loop, reconnecting with the id of the
+    last event received so no event is missed.
+    """
+
+    def __init__(self, client: ApiClient, endpoint: str = "/events") -> None:
+        """Initialize FlightEventStream object and start reading the stream
+
+        :param client: client of the Flight API (ApiClient)
+        :param endpoint: event stream endpoint (str)
+        """
+        self.client = client
+        self.endpoint = endpoint
+        self.events = deque()
+        self.condition = threading.Condition()
+        self.last_event_id = None
+        self.connected = False
+
+        self.stream_thread = threading.Thread(target=self._read_stream)
+        self.stream_thread.daemon = True
+        self.stream_thread.start()
+
+    def get_events(self) -> list:
+        """Remove and return every event received, without blocking
+
+        :return: list of (event name, data dict) in the order received
+        """
+        with self.condition:
+            events = list(self.events)
+            self.events.clear()
+        return events
+
+    def wait_for(self, event_name: str, timeout: float = None):
+        """Block until an event is received, leaving other events queued
+
+        :param event_name: event to wait for (str)
+        :param timeout: max seconds to wait, None to wait forever (float)
+        :return: data of the event, None if timed out
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                for event in self.events:
+                    if event[0] == event_name:
+                        self.events.remove(event)
+                        return event[1]
+                remaining = None if deadline is None else \
+                    deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+
+    def _read_stream(self) -> None:
+        while True:
+            headers = {}
+            if self.last_event_id is not None:
+                headers['Last-Event-ID'] = str(self.last_event_id)
+            try:
+                # Reconnection is handled here, not retried by the client
+                with self.client.get(self.endpoint, stream=True,
+                                     headers=headers, retries=0,
+                                     timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) \
+                        as response:
+                    response.raise_for_status()
+                    self.connected = True
+                    logging.info("Flight Events - Stream connected")
+                    self._parse_events(response)
+            except requests.exceptions.RequestException as e:
+                logging.info(f"Flight Events - Stream disconnected:\n\t{e}")
+            self.connected = False
+            time.sleep(RECONNECT_TIME)
+
+    def _parse_events(self, response: requests.Response) -> None:
+        # Server-sent events: "field: value" lines, blank line ends an event
+        fields = {}
+        for line in response.iter_lines(chunk_size=1, decode_unicode=True):
+            if line.startswith(':'):
+                continue
+            if line:
+                field, _, value = line.partition(':')
+                fields[field] = value[1:] if value.startswith(' ') else value
+                continue
+            if 'event' in fields and 'data' in fields:
+                if 'id' in fields:
+                    self.last_event_id = int(fields['id'])
+                with self.condition:
+                    self.events.append((fields['event'],
+                                        json.loads(fields['data'])))
+                    self.condition.notify_all()
+            fields = {}
@@ -9,6 +9,7 @@ import sys
 sys.path.append('../../')
 
 from Shared.loggingHandler import setup_logging
+from Shared.apiClient import get_api_client
 
 
 config = configparser.ConfigParser()
@@ -20,12 +21,16 @@ GROUND_API = f"http://{config['Ground']['API_IP_Address']}" + \
 FLIGHT_API = f"http://{config['Flight_API']['API_IP_Address']}" + \
              f":{config['Flight_API']['API_IP_PORT']}"
 
+ground_api = get_api_client(GROUND_API)
+flight_api = get_api_client(FLIGHT_API)
+
 initial_connection_obtained = False
 connection_lost_count = 1
 while True:
     time.sleep(2)
     try:
-        response = requests.get(f"{GROUND_API}/heartbeat")
+        # Not retried, lost connections are counted
+        response = ground_api.get("/heartbeat", retries=0)
         response.raise_for_status()
         print("Connection", response.status_code)
         connection_lost_count = 0
@@ -41,8 +46,8 @@ while True:
             try:
                 print("ERROR: Connection Lost to Ground for 10 seconds")
                 print("ERROR: Sending Emergency Land Priority Command")
-                response = requests.post(f"{FLIGHT_API}/set-priority-command",
-                                         json=priority_command)
+                response = flight_api.post("/set-priority-command",
+                                           json=priority_command)
                 response.raise_for_status()
             except requests.exceptions.RequestException as e:
                 logging.error(f"Heartbeat - Emergency Land Error:\n\t{e}")
@@ -1,4 +1,3 @@
-from datetime import datetime
 import time
 import math
 import threading
@@ -11,6 +10,9 @@ sys.path.append('../../')
 from pymavlink import mavutil
 from Shared.loggingHandler import setup_logging
 from Shared.shared_utils import get_distance_meters
+from Shared.telemetryUplink import TelemetryUplink
+from Shared.telemetryCodec import format_time_ns
+from Shared.apiClient import get_api_client
 
 config = configparser.ConfigParser()
 config.read(os.path.join(os.path.dirname(__file__), '../..', 'config.ini'))
@@ -19,6 +21,20 @@ setup_logging(config['Flight_Script']['App_Name'])
 FLIGHT_API = f"http://{config['Flight_API']['API_IP_Address']}" + \
              f":{config['Flight_API']['API_IP_PORT']}"
 
+# Rate in Hz each telemetry message is requested at, 0 to stop streaming it
+TELEMETRY_STREAM_RATES = {
+    "GLOBAL_POSITION_INT": config['Flight_Script'].getfloat('Position_Rate',
+                                                            fallback=10),
+    "ATTITUDE": config['Flight_Script'].getfloat('Attitude_Rate',
+                                                 fallback=10),
+    "SYS_STATUS": config['Flight_Script'].getfloat('Status_Rate', fallback=1)
+}
+# Rate in Hz telemetry is sent to Flight API
+TELEMETRY_UPLINK_RATE = config['Flight_Script'].getfloat(
+    'Telemetry_Uplink_Rate', fallback=2)
+# Seconds to wait for a message from the Pixhawk
+MESSAGE_TIMEOUT = 1
+
 
 class PixhawkController:
 
@@ -29,12 +45,17 @@ class PixhawkController:
         self.current_command = None
         self.command_complete = False
         self.flight_api_connected = False
+        # Sends telemetry to Flight API without blocking the telemetry thread
+        self.flight_api = get_api_client(FLIGHT_API)
+        self.telemetry_uplink = TelemetryUplink(self.flight_api,
+                                                "/propagate-telemetry")
         self.battery_change_completed = False
-        self.telemetry_types = {
-            "GLOBAL_POSITION_INT": 33,
-            "ATTITUDE": 30,
-            "SYS_STATUS": 1
-        }
+        self.stream_rates = dict(TELEMETRY_STREAM_RATES)
+        # Latest message and number received of each type, filled by the
+        # telemetry thread, the only reader of the connection once started
+        self.latest_messages = {}
+        self.message_counts = {}
+        self.message_condition = threading.Condition()
         self.system_id = 0
         self.component_id = 0
 
@@ -54,7 +75,15 @@ class PixhawkController:
 
         self.takeoff_altitude = 0
 
-    def connect(self, device):
+    def connect(self, device, stream_rates: dict = None):
+        """
+        Connects to the Pixhawk, requests telemetry streams and starts the
+        telemetry thread
+        Args:
+            device: mavlink connection string
+            stream_rates: Hz per message name, defaults to
+                TELEMETRY_STREAM_RATES
+        """
         self.vehicle = mavutil.mavlink_connection(device, baud=115200)
         self.vehicle.wait_heartbeat()
         print("Heartbeat received from Pixhawk")
@@ -63,15 +92,7 @@ class PixhawkController:
         self.system_id = self.vehicle.target_system
         self.component_id = self.vehicle.target_component
 
-        # Request telemetry at faster rate
-        for value in self.telemetry_types.values():
-            self.vehicle.mav.request_data_stream_send(
-                self.system_id,
-                self.component_id,
-                value,
-                1,  # Hz
-                1
-            )
+        self.set_stream_rates(stream_rates or self.stream_rates)
 
         # Save starting position
         time.sleep(1)   # Wait to allow telemetry stream
@@ -81,21 +102,24 @@ class PixhawkController:
         self.starting_longitude = position.lon / 1e7
         self.starting_altitude = position.alt / 1e3
         self.current_altitude = position.alt / 1e3
+        with self.message_condition:
+            self.latest_messages['GLOBAL_POSITION_INT'] = position
 
         # Start telemetry thread
-        self.telemetry_thread = threading.Thread(target=self._get_telemetry)
+        self.telemetry_thread = threading.Thread(target=self._read_messages)
         self.telemetry_thread.daemon = True
         self.telemetry_thread.start()
 
     def disconnect(self):
         self.close_thread = True
+        self.telemetry_uplink.close()
         self.vehicle.close()
 
     def connect_to_flight_api(self, blocking=True) -> bool:
         initial_route_received = False
         while not initial_route_received and blocking:
             try:
-                response = requests.get(f"{FLIGHT_API}/flight-ready")
+                response = self.flight_api.get("/flight-ready")
                 response.raise_for_status()
                 if response.json():
                     logging.info("Connected to Flight API")
@@ -108,50 +132,102 @@ class PixhawkController:
                     return False
                 time.sleep(3)
 
-    def get_command_ack(self):
-        cmd_resp = self.vehicle.recv_match(type='COMMAND_ACK',
-                                           blocking=True, timeout=10)
+    def set_stream_rates(self, stream_rates: dict):
+        """
+        Requests each message at its own rate with MAV_CMD_SET_MESSAGE_INTERVAL
+        Args:
+            stream_rates: Hz per message name, 0 to stop streaming a message
+        """
+        for msg_name, rate in stream_rates.items():
+            msg_id = getattr(mavutil.mavlink, f"MAVLINK_MSG_ID_{msg_name}")
+            # Interval in microseconds, -1 disables the message
+            interval = int(1e6 / rate) if rate > 0 else -1
+            self.vehicle.mav.command_long_send(
+                self.system_id,
+                self.component_id,
+                mavutil.mavlink.MAV_CMD_SET_MESSAGE_INTERVAL,
+                0, msg_id, interval, 0, 0, 0, 0, 0)
+            self.stream_rates[msg_name] = rate
+        logging.info(f"Telemetry stream rates: {self.stream_rates}")
+
+    def message_count(self, msg_type: str) -> int:
+        with self.message_condition:
+            return self.message_counts.get(msg_type, 0)
+
+    def wait_for_message(self, msg_type: str, timeout: float,
+                         after_count: int = None):
+        """
+        Waits for the telemetry thread to receive a new message of a type
+        Args:
+            msg_type: mavlink message name
+            timeout: max seconds to wait
+            after_count: message_count taken before the message was
+                triggered, defaults to the current count
+        Returns: the message, None if none arrived within timeout
+        """
+        with self.message_condition:
+            if after_count is None:
+                after_count = self.message_counts.get(msg_type, 0)
+            if self.message_condition.wait_for(
+                    lambda: self.message_counts.get(msg_type, 0) > after_count,
+                    timeout):
+                return self.latest_messages[msg_type]
+        return None
+
+    def get_snapshot(self) -> dict:
+        """
+        Returns the latest message received of each type
+        """
+        with self.message_condition:
+            return dict(self.latest_messages)
+
+    def get_command_ack(self, ack_count: int = None):
+        cmd_resp = self.wait_for_message('COMMAND_ACK', 10, ack_count)
         logging.info(f"\t{cmd_resp}")
         return cmd_resp
 
     def arm(self):
         print("Arming motors")
+        ack_count = self.message_count('COMMAND_ACK')
         self.vehicle.mav.command_long_send(
             self.system_id,
             self.component_id,
             mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM,
             0, 1, 0, 0, 0, 0, 0, 0)
-        return self.get_command_ack()
+        return self.get_command_ack(ack_count)
 
     def disarm(self):
         print("Disarming motors")
+        ack_count = self.message_count('COMMAND_ACK')
         self.vehicle.mav.command_long_send(
             self.system_id,
             self.component_id,
             mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM,
             0, 0, 0, 0, 0, 0, 0, 0)
-        return self.get_command_ack()
+        return self.get_command_ack(ack_count)
 
     def takeoff(self, altitude):
         print("Taking off to {} meters".format(altitude))
         self.current_command = "Takeoff"
         self.takeoff_altitude = self.last_telemetry["altitude"]
+        ack_count = self.message_count('COMMAND_ACK')
         self.vehicle.mav.command_long_send(
             self.system_id,
             self.component_id,
             mavutil.mavlink.MAV_CMD_NAV_TAKEOFF,
             0, 0, 0, 0, 0, 0, 0, altitude)
-        return self.get_command_ack()
+        return self.get_command_ack(ack_count)
 
     def land(self):
         print("Landing")
         self.current_command = "Landing"
+        ack_count = self.message_count('COMMAND_ACK')
         self.vehicle.mav.command_long_send(
             self.vehicle.target_system,
             self.vehicle.target_component,
             mavutil.mavlink.MAV_CMD_NAV_LAND, 0, 0, 0, 0, 0, 0, 0, 0)
         time.sleep(1)
-        return self.get_command_ack()
+        return self.get_command_ack(ack_count)
 
     def set_mode(self, mode):
         if mode not in self.vehicle.mode_mapping():
@@ -161,11 +237,12 @@ class PixhawkController:
 
         print("Setting mode to {}".format(mode))
         mode_id = self.vehicle.mode_mapping()[mode]
+        ack_count = self.message_count('COMMAND_ACK')
         self.vehicle.mav.set_mode_send(
             self.system_id,
             mavutil.mavlink.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED,
             mode_id)
-        return self.get_command_ack()
+        return self.get_command_ack(ack_count)
 
     def go_to_location(self, latitude, longitude, altitude):
         print(f"Going to location: ",
@@ -183,8 +260,8 @@ class PixhawkController:
                 0, 0, 0, 0, 0, 0, 0, 0))
 
     def go_to_location_relative(self, latitude, longitude, altitude):
-        current_position = self.vehicle.recv_match(type='GLOBAL_POSITION_INT',
-                                                   blocking=True)
+        current_position = self.get_snapshot().get('GLOBAL_POSITION_INT') or \
+            self.wait_for_message('GLOBAL_POSITION_INT', MESSAGE_TIMEOUT)
         current_latitude = current_position.lat / 1e7
         current_longitude = current_position.lon / 1e7
         current_altitude = current_position.alt / 1e3
@@ -216,10 +293,17 @@ class PixhawkController:
         time.sleep(1)
 
     def get_telemetry(self, blocking=False):
-        msg1 = self.vehicle.recv_match(type='GLOBAL_POSITION_INT',
-                                       blocking=blocking)
-        msg2 = self.vehicle.recv_match(type='ATTITUDE', blocking=blocking)
-        msg3 = self.vehicle.recv_match(type='SYS_STATUS', blocking=blocking)
+        """
+        Returns the latest telemetry received by the telemetry thread
+        Args:
+            blocking: wait for the next position message first
+        """
+        if blocking:
+            self.wait_for_message('GLOBAL_POSITION_INT', MESSAGE_TIMEOUT)
+        snapshot = self.get_snapshot()
+        msg1 = snapshot.get('GLOBAL_POSITION_INT')
+        msg2 = snapshot.get('ATTITUDE')
+        msg3 = snapshot.get('SYS_STATUS')
 
         # Parse the message and print the relevant data
         telemetry_msg = {
@@ -231,27 +315,47 @@ class PixhawkController:
             'pitch': -1,
             'battery_percentage': -1
         }
-        if msg1 and msg1.get_type() == 'GLOBAL_POSITION_INT':
+        if msg1:
             telemetry_msg["latitude"] = msg1.lat / 1e7
             telemetry_msg["longitude"] = msg1.lon / 1e7
             telemetry_msg["altitude"] = msg1.alt / 1e3
-        if msg2 and msg2.get_type() == 'ATTITUDE':
+        if msg2:
             telemetry_msg["roll"] = msg2.roll
             telemetry_msg["yaw"] = msg2.yaw
             telemetry_msg["pitch"] = msg2.pitch
-        if msg3 and msg3.get_type() == 'SYS_STATUS':
+        if msg3:
             telemetry_msg["battery_percentage"] = msg3.battery_remaining
-        telemetry_msg["time"] = datetime.now().strftime("%H:%M:%S %f")
+        # Epoch timestamp for the binary uplink, formatted for display
+        telemetry_msg["time_ns"] = time.time_ns()
+        telemetry_msg["time"] = format_time_ns(telemetry_msg["time_ns"])
         return telemetry_msg
 
-    def _get_telemetry(self):
-        count = 0
+    def _read_messages(self):
+        # Read every message once, keeping the latest of each type
+        last_uplink_time = 0
         while not self.close_thread:
-            count += 0.5
-            time.sleep(0.25)
-            msg = self.get_telemetry(blocking=True)
-            self.last_telemetry = msg
+            msg = self.vehicle.recv_match(blocking=True,
+                                          timeout=MESSAGE_TIMEOUT)
+            if msg is None:
+                continue
+            msg_type = msg.get_type()
+            if msg_type == 'BAD_DATA':
+                continue
+            with self.message_condition:
+                self.latest_messages[msg_type] = msg
+                self.message_counts[msg_type] = \
+                    self.message_counts.get(msg_type, 0) + 1
+                self.message_condition.notify_all()
+
+            if msg_type != 'GLOBAL_POSITION_INT':
+                continue
+            self.last_telemetry = self.get_telemetry()
+            now = time.monotonic()
+            if now - last_uplink_time < 1 / TELEMETRY_UPLINK_RATE:
+                continue
+            last_uplink_time = now
+            msg = dict(self.last_telemetry)
             msg['current_command'] = self.current_command
             logging.info(msg)
-            if self.flight_api_connected and count % 1 == 0:
-                requests.post(f"{FLIGHT_API}/propagate-telemetry", json=msg)
+            if self.flight_api_connected:
+                self.telemetry_uplink.submit(msg)
@@ -1,16 +1,17 @@
 import configparser
 import logging
-import requests
 import time
 import os
 import sys
 sys.path.append('../../')
 
 from Shared.loggingHandler import setup_logging
+from Shared.apiClient import get_api_client
 from Flight.script.pixhawkController import PixhawkController
 from Flight.script.commandHandler import CommandHandler
 from Flight.script.lightController import LightController
 from Flight.script.soundController import SoundController
+from Flight.script.flightEvents import FlightEventStream
 
 
 config = configparser.ConfigParser()
@@ -34,38 +35,19 @@ logging.info("Connecting to Flight API")
 pixhawk.connect_to_flight_api(blocking=True)
 print("Connected to Pixhawk and Flight API")
 
+# Flight API pushes routes, launch and priority commands as they happen
+flight_events = FlightEventStream(get_api_client(FLIGHT_API))
+
 
 # Get initial route when ready
-route = []
 logging.info("Requesting Initial Route")
-initial_route_received = False
-while not initial_route_received:
-    try:
-        response = requests.get(f"{FLIGHT_API}/get-initial-route")
-        response.raise_for_status()
-        if response.json() and response.json()["route"] != []:
-            route = response.json()["route"]
-            logging.info(f"Initial route received:\n\t {route}")
-            initial_route_received = True
-            # TODO: Validate route
-
-    except requests.exceptions.RequestException as e:
-        logging.info(f"Initial route not received {e}")
-        time.sleep(5)
+route = flight_events.wait_for("initial_route")["route"]
+logging.info(f"Initial route received:\n\t {route}")
+# TODO: Validate route
 
 
 # Wait for Initiate signal
-initiate_route = False
-while not initiate_route:
-    try:
-        response = requests.get(f"{FLIGHT_API}/check-for-launch")
-        response.raise_for_status()
-        if response.json() and response.json()["initiate_launch"]:
-            initiate_route = True
-
-    except requests.exceptions.RequestException as e:
-        logging.info("Waiting for Initiate")
-        time.sleep(1)
+flight_events.wait_for("launch")
 
 # Initiating
 print("Launching in 10 seconds")
@@ -88,21 +70,20 @@ while True:
         commandHandler.execute_command(current_command)
         current_command_sent = True
 
-    # Check if priority command received, execute immediately
-    try:
-        response = requests.get(f"{FLIGHT_API}/check-for-priority-command")
-        response.raise_for_status()
-        if response.json() and "priority_command" in response.json():
-            priority_cmd_exists = response.json()["priority_command_created"]
-            if priority_cmd_exists:
-                priority_cmd = response.json()["priority_command"]
-                logging.info(f"Executing Priority Command: {priority_cmd}")
-                commandHandler.execute_command(priority_cmd)
-                executing_priority_command = True
-                # Hold after priority command to stabilize/finish
-                time.sleep(5)
-    except requests.exceptions.RequestException as e:
-        logging.info("Unable to check for priority command", e)
+    # Handle events pushed since the last iteration
+    for event, data in flight_events.get_events():
+        if event == "priority_command":
+            # Priority command received, execute immediately
+            priority_cmd = data["priority_command"]
+            logging.info(f"Executing Priority Command: {priority_cmd}")
+            commandHandler.execute_command(priority_cmd)
+            executing_priority_command = True
+            # Hold after priority command to stabilize/finish
+            time.sleep(5)
+        elif event == "battery_change_completed":
+            # Battery change button pressed, completes BatteryChange
+            logging.info("Battery Change Completed Received")
+            commandHandler.battery_change_completed = True
 
     # Check if current command completed
     if commandHandler.is_current_command_completed():
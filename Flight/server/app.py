@@ -4,8 +4,11 @@ import sys
 
 sys.path.append('../../')
 
-from flask import Flask, request
+from flask import Flask, Response, jsonify, request
 from Shared.loggingHandler import setup_logging
+from Shared.apiClient import get_api_metrics
+from Shared.shared_utils import error_dict
+from Shared.telemetryCodec import read_telemetry_request
 from flightController import FlightController
 
 config = configparser.ConfigParser()
@@ -17,6 +20,35 @@ setup_logging(config['Flight_API']['App_Name'])
 flightController = FlightController()
 
 
+def long_poll_args() -> tuple:
+    """Long-poll arguments of a check request: ?since=<version>&wait=<s>.
+    The If-None-Match header is used as since when it is not given
+
+    :return: 1. version the caller has (int or None) 2. max seconds to wait
+    """
+    since = request.args.get('since', type=int)
+    if since is None and request.if_none_match:
+        etag = next(iter(request.if_none_match), None)
+        since = int(etag) if etag and etag.isdigit() else None
+    return since, request.args.get('wait', default=0, type=float)
+
+
+def versioned_response(result: dict, since: int = None) -> Response:
+    """JSON response with the state version as its ETag, or 304 Not Modified
+    without a body when the caller already has that version
+
+    :param result: controller response with the state version (dict)
+    :param since: version the caller has, from long_poll_args (int)
+    :return: response to send
+    """
+    if since is not None and result["version"] == since:
+        response = Response(status=304)
+    else:
+        response = jsonify(result)
+    response.set_etag(str(result["version"]))
+    return response
+
+
 @app.route('/', methods=['GET'])
 @app.route('/home', methods=['GET'])
 def home():
@@ -37,10 +69,35 @@ def flight_ready():
 def propagate_telemetry():
     # Called by script, with telemetry data
     # Calls Ground/set-telemetry with same data
-    json_response = request.get_json()
+    try:
+        json_response = read_telemetry_request(request)
+    except ValueError as e:
+        return error_dict(str(e)), 400
     return flightController.propagate_telemetry(json_response)
 
 
+@app.route('/telemetry-stats', methods=['GET'])
+def telemetry_stats():
+    # Counts of telemetry samples forwarded to and dropped before Ground
+    return flightController.get_telemetry_stats()
+
+
+@app.route('/events', methods=['GET'])
+def events():
+    # Called by script, kept open to receive events as they happen
+    # Resumes after the Last-Event-ID header when reconnecting
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    return Response(flightController.stream_events(last_event_id),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
+
+@app.route('/api-metrics', methods=['GET'])
+def api_metrics():
+    # Latency and failures of requests sent to Ground
+    return {"success": True, "api_metrics": get_api_metrics()}
+
+
 @app.route('/set-initial-route', methods=['POST'])
 def set_initial_route():
     # Called from ground
@@ -52,13 +109,17 @@ def set_initial_route():
 @app.route('/get-initial-route', methods=['GET'])
 def get_initial_route():
     # Called by script
-    return flightController.get_initial_route()
+    since, wait = long_poll_args()
+    return versioned_response(
+        flightController.get_initial_route(since, wait), since)
 
 
 @app.route('/get-updated-route', methods=['GET'])
 def get_updated_route():
     # Called by script
-    return flightController.get_updated_route()
+    since, wait = long_poll_args()
+    return versioned_response(
+        flightController.get_updated_route(since, wait), since)
 
 
 @app.route('/launch', methods=['POST'])
@@ -70,19 +131,25 @@ def launch():
 @app.route('/check-for-launch', methods=['GET'])
 def check_for_launch():
     # Called by script
-    return flightController.check_for_launch()
+    since, wait = long_poll_args()
+    return versioned_response(
+        flightController.check_for_launch(since, wait), since)
 
 
 @app.route('/check-for-route-update', methods=['GET'])
 def check_for_update():
     # Called by script
-    return flightController.check_for_route_update()
+    since, wait = long_poll_args()
+    return versioned_response(
+        flightController.check_for_route_update(since, wait), since)
 
 
 @app.route('/check-for-priority-command', methods=['GET'])
 def check_for_priority_command():
     # Called by script
-    return flightController.check_for_priority_command()
+    since, wait = long_poll_args()
+    return versioned_response(
+        flightController.check_for_priority_command(since, wait), since)
 
 
 @app.route('/set-detour-route', methods=['POST'])
@@ -124,7 +191,10 @@ def battery_change_completed():
 @app.route('/check-for-battery-change-completed', methods=['GET'])
 def check_for_battery_change_completed():
     # Called by script
-    return flightController.check_for_battery_change_completed()
+    since, wait = long_poll_args()
+    return versioned_response(
+        flightController.check_for_battery_change_completed(since, wait),
+        since)
 
 
 if __name__ == '__main__':
@@ -1,10 +1,14 @@
 import os
 import configparser
-import logging
-import requests
+import json
+import threading
+from collections import deque
+from queue import Queue, Empty
 
 from Shared.loggingHandler import setup_logging
 from Shared.shared_utils import success_dict, error_dict
+from Shared.telemetryUplink import TelemetryUplink
+from Shared.apiClient import get_api_client
 
 config = configparser.ConfigParser()
 config.read(os.path.join(os.path.dirname(__file__), '../..', 'config.ini'))
@@ -13,6 +17,13 @@ setup_logging(config['Flight_API']['App_Name'])
 GROUND_API = f"http://{config['Ground']['API_IP_Address']}" + \
              f":{config['Ground']['API_IP_PORT']}"
 
+# Events kept to replay to streams reconnecting with Last-Event-ID
+EVENT_HISTORY_SIZE = 64
+# Seconds between keepalive comments on an idle event stream
+EVENT_KEEPALIVE_TIME = 5
+# Max seconds a long-poll request waits for its state to change
+MAX_LONG_POLL_WAIT = 30
+
 
 class FlightController:
 
@@ -37,39 +48,177 @@ class FlightController:
 
         self.battery_change_completed = False
 
+        # Event streams to the script, events are pushed as they happen.
+        # Priority commands and route updates received by a stream are
+        # consumed, so polling does not return them again
+        self.event_lock = threading.RLock()
+        self.event_subscribers = []
+        self.event_history = deque(maxlen=EVENT_HISTORY_SIZE)
+        self.event_id = 0
+        # Version of each state, the id of the last event changing it.
+        # Long-poll requests wait on state_changed until it passes theirs
+        self.state_versions = {}
+        self.state_changed = threading.Condition(self.event_lock)
+
+        # Forwards telemetry to Ground without blocking the script's request
+        self.ground_api = get_api_client(GROUND_API)
+        self.telemetry_uplink = TelemetryUplink(self.ground_api,
+                                                "/set-telemetry")
+
     def propagate_telemetry(self, json_response: dict):
-        resp = requests.post(f"{GROUND_API}/set-telemetry", json=json_response)
-        logging.info(resp)
-        return success_dict("Sent")
+        self.telemetry_uplink.submit(json_response)
+        return success_dict("Queued")
+
+    def get_telemetry_stats(self):
+        """
+        Returns counts of telemetry samples forwarded to and dropped before
+        reaching Ground
+        """
+        return {
+            "success": True,
+            "telemetry_stats": self.telemetry_uplink.stats()
+        }
+
+    def publish_event(self, event: str, data: dict) -> bool:
+        """
+        Push an event to every connected event stream
+        Returns True if a stream received the event
+        """
+        with self.event_lock:
+            self.event_id += 1
+            self.event_history.append((self.event_id, event, data))
+            self.state_versions[event] = self.event_id
+            self.state_changed.notify_all()
+            for subscriber in self.event_subscribers:
+                subscriber.put((self.event_id, event, data))
+            return bool(self.event_subscribers)
+
+    def current_events(self) -> list:
+        """
+        Events bringing a new event stream up to date with the current state
+        """
+        events = []
+        if self.route:
+            events.append(("initial_route", {"route": self.route}))
+        if self.launch:
+            events.append(("launch", {"initiate_launch": self.launch}))
+        if self.priority_command:
+            events.append(("priority_command",
+                           {"priority_command": self.priority_command}))
+        if self.is_route_updated:
+            events.append(("route_update", {"route": self.updated_route}))
+        if self.battery_change_completed:
+            events.append(("battery_change_completed",
+                           {"battery_change_completed": True}))
+        return events
+
+    def consume_pushed_commands(self):
+        # Priority command, route update and battery change completion
+        # delivered to a stream
+        if self.priority_command:
+            self.priority_commands_executed.append(self.priority_command)
+            self.priority_command = {}
+        self.is_route_updated = False
+        self.battery_change_completed = False
+
+    def subscribe_events(self, last_event_id: int = None) -> Queue:
+        """
+        Register an event stream. A stream reconnecting with the id of the
+        last event it received gets the events it missed, a new stream gets
+        the current state
+        """
+        subscriber = Queue()
+        with self.event_lock:
+            if last_event_id is not None and self.event_history and \
+                    self.event_history[0][0] <= last_event_id + 1:
+                for event_id, event, data in self.event_history:
+                    if event_id > last_event_id:
+                        subscriber.put((event_id, event, data))
+            else:
+                for event, data in self.current_events():
+                    subscriber.put((self.event_id, event, data))
+            self.consume_pushed_commands()
+            self.event_subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe_events(self, subscriber: Queue):
+        with self.event_lock:
+            if subscriber in self.event_subscribers:
+                self.event_subscribers.remove(subscriber)
+
+    def stream_events(self, last_event_id: int = None):
+        """
+        Generates a server-sent event stream for one connection, with
+        keepalive comments while idle so closed connections are noticed
+        """
+        subscriber = self.subscribe_events(last_event_id)
+        try:
+            while True:
+                try:
+                    event_id, event, data = subscriber.get(
+                        timeout=EVENT_KEEPALIVE_TIME)
+                except Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"id: {event_id}\nevent: {event}\n" \
+                      f"data: {json.dumps(data)}\n\n"
+        finally:
+            self.unsubscribe_events(subscriber)
+
+    def wait_for_state(self, state: str, since: int = None,
+                       wait: float = 0) -> int:
+        """
+        Long-poll for a state change. Blocks until the state's version is
+        newer than since, or for at most wait seconds
+        Returns the state's version, for the caller's next since
+        """
+        with self.state_changed:
+            if since is not None and wait > 0:
+                self.state_changed.wait_for(
+                    lambda: self.state_versions.get(state, 0) > since,
+                    min(wait, MAX_LONG_POLL_WAIT))
+            return self.state_versions.get(state, 0)
 
     def initiate_launch(self):
-        self.launch = True
+        with self.event_lock:
+            self.launch = True
+            self.publish_event("launch", {"initiate_launch": self.launch})
         return {"initiate_launch": self.launch}
 
-    def check_for_launch(self):
-        return {"initiate_launch": self.launch}
+    def check_for_launch(self, since: int = None, wait: float = 0):
+        with self.event_lock:
+            version = self.wait_for_state("launch", since, wait)
+            return {"initiate_launch": self.launch, "version": version}
 
     def set_initial_route(self, json_response: dict):
         # Parse route from json
         route_plan_json = json_response["Route"]
         if route_plan_json and len(route_plan_json) != 0:
-            self.route = route_plan_json
+            with self.event_lock:
+                self.route = route_plan_json
+                self.publish_event("initial_route", {"route": self.route})
         return {
             "success": True,
             "route": route_plan_json
         }
 
-    def get_initial_route(self):
-        return {
-            "success": True,
-            "route": self.route
-        }
+    def get_initial_route(self, since: int = None, wait: float = 0):
+        with self.event_lock:
+            version = self.wait_for_state("initial_route", since, wait)
+            return {
+                "success": True,
+                "route": self.route,
+                "version": version
+            }
 
-    def get_updated_route(self):
-        return {
-            "success": True,
-            "route": self.updated_route
-        }
+    def get_updated_route(self, since: int = None, wait: float = 0):
+        with self.event_lock:
+            version = self.wait_for_state("route_update", since, wait)
+            return {
+                "success": True,
+                "route": self.updated_route,
+                "version": version
+            }
 
     def set_detour_route(self, json_response: dict):
         """
@@ -78,12 +227,26 @@ class FlightController:
         # Verify json_response
         if "Priority Command" in json_response and \
                 "Updated Flight Plan" in json_response:
-            # Set priority command
-            self.priority_command = json_response["Priority Command"]
+            with self.event_lock:
+                # Set priority command. Detour replans carry none, keep a
+                # pending one the script has not picked up yet
+                if json_response["Priority Command"]:
+                    self.priority_command = json_response["Priority Command"]
 
-            # Set new route
-            self.is_route_updated = True
-            self.updated_route = json_response["Updated Flight Plan"]
+                # Set new route
+                self.is_route_updated = True
+                self.updated_route = json_response["Updated Flight Plan"]
+
+                delivered = False
+                if json_response["Priority Command"]:
+                    delivered = self.publish_event(
+                        "priority_command",
+                        {"priority_command": self.priority_command})
+                delivered = self.publish_event(
+                    "route_update", {"route": self.updated_route}) or delivered
+                if delivered:
+                    self.consume_pushed_commands()
+            return success_dict("Detour Route Set")
         else:
             return error_dict("Missing JSON Parameters")
 
@@ -93,49 +256,81 @@ class FlightController:
         """
         # Verify json_response
         if "Priority Command" in json_response:
-            # Set priority command
-            self.priority_command = json_response["Priority Command"]
+            with self.event_lock:
+                # Set priority command
+                self.priority_command = json_response["Priority Command"]
+                if self.publish_event(
+                        "priority_command",
+                        {"priority_command": self.priority_command}):
+                    self.consume_pushed_commands()
+            return success_dict("Priority Command Set")
         else:
             return error_dict("Missing JSON Parameters")
 
-    def check_for_route_update(self):
-        if self.is_route_updated:
-            # Reset after route updated checked
-            self.is_route_updated = False
+    def check_for_route_update(self, since: int = None, wait: float = 0):
+        with self.event_lock:
+            version = self.wait_for_state("route_update", since, wait)
+            if self.is_route_updated:
+                # Reset after route updated checked
+                self.is_route_updated = False
 
-            return {
-                "success": True,
-                "route_updated": True,
-                "route": self.updated_route
-            }
-        else:
-            return {
-                "success": True,
-                "route_updated": False
-            }
+                return {
+                    "success": True,
+                    "route_updated": True,
+                    "route": self.updated_route,
+                    "version": version
+                }
+            else:
+                return {
+                    "success": True,
+                    "route_updated": False,
+                    "version": version
+                }
 
-    def check_for_priority_command(self):
+    def check_for_priority_command(self, since: int = None, wait: float = 0):
         """
-        Returns priority command if it exists. Resets command after read
+        Returns priority command if it exists. Resets command after read.
+        With since and wait, waits for a priority command newer than since
         """
-        if self.priority_command:
-            self.priority_commands_executed.append(self.priority_command)
-            return_msg = {
-                "success": True,
-                "priority_command_created": True,
-                "priority_command": self.priority_command
-            }
-            self.priority_command = {}
-            return return_msg
-        else:
-            return {
-                "success": True,
-                "priority_command_created": False
-            }
+        with self.event_lock:
+            version = self.wait_for_state("priority_command", since, wait)
+            if self.priority_command:
+                self.priority_commands_executed.append(self.priority_command)
+                return_msg = {
+                    "success": True,
+                    "priority_command_created": True,
+                    "priority_command": self.priority_command,
+                    "version": version
+                }
+                self.priority_command = {}
+                return return_msg
+            else:
+                return {
+                    "success": True,
+                    "priority_command_created": False,
+                    "version": version
+                }
 
     def battery_change_is_complete(self):
-        self.battery_change_completed = True
-        return {"battery_change_completed": self.battery_change_completed}
+        # Pending until delivered, so a later battery change is not
+        # completed by this one
+        with self.event_lock:
+            self.battery_change_completed = True
+            if self.publish_event("battery_change_completed",
+                                  {"battery_change_completed": True}):
+                self.consume_pushed_commands()
+        return {"battery_change_completed": True}
 
-    def check_for_battery_change_completed(self):
-        return {"battery_change_completed": self.battery_change_completed}
+    def check_for_battery_change_completed(self, since: int = None,
+                                           wait: float = 0):
+        """
+        Returns whether the battery change completed. Resets after read.
+        With since and wait, waits for a completion newer than since
+        """
+        with self.event_lock:
+            version = self.wait_for_state("battery_change_completed", since,
+                                          wait)
+            battery_change_completed = self.battery_change_completed
+            self.battery_change_completed = False
+            return {"battery_change_completed": battery_change_completed,
+                    "version": version}
@@ -0,0 +1,82 @@
+# Tests for the long-poll and conditional GET endpoints of the Flight API
+#
+# Usage (from the repository root):
+#   python -m pytest Flight/server/test/flight_api_test.py
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Ahead of Ground/server, which has modules of the same names
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../..'))
+
+# setup_logging writes to logs/ under the working directory
+working_directory = os.getcwd()
+os.chdir(tempfile.mkdtemp())
+os.mkdir("logs")
+try:
+    from app import app
+finally:
+    os.chdir(working_directory)
+
+DETOUR = {"Priority Command": {}, "Updated Flight Plan": [{"Command": "NavMode"}, {"Command": "Land"}]}
+
+
+def version(response) -> int:
+    return int(response.get_etag()[0])
+
+
+def post_later(endpoint: str, json_data: dict, delay: float) -> threading.Thread:
+    def post():
+        time.sleep(delay)
+        app.test_client().post(endpoint, json=json_data)
+    thread = threading.Thread(target=post)
+    thread.start()
+    return thread
+
+
+def test_conditional_get():
+    client = app.test_client()
+    response = client.get('/check-for-launch')
+    assert response.status_code == 200
+    launch_version = version(response)
+
+    response = client.get('/check-for-launch', headers={"If-None-Match": f'"{launch_version}"'})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert version(response) == launch_version
+
+    client.post('/launch')
+    response = client.get('/check-for-launch', headers={"If-None-Match": f'"{launch_version}"'})
+    assert response.status_code == 200
+    assert response.get_json()["initiate_launch"] is True
+    assert version(response) > launch_version
+
+
+def test_long_poll_returns_on_change():
+    client = app.test_client()
+    route_version = version(client.get('/get-updated-route'))
+
+    thread = post_later('/set-detour-route', DETOUR, 0.3)
+    start_time = time.monotonic()
+    response = client.get(f'/get-updated-route?since={route_version}&wait=5')
+    elapsed = time.monotonic() - start_time
+    thread.join()
+
+    assert response.status_code == 200
+    assert response.get_json()["route"] == DETOUR["Updated Flight Plan"]
+    assert version(response) > route_version
+    assert 0.2 < elapsed < 4
+
+
+def test_long_poll_not_modified_after_wait():
+    client = app.test_client()
+    priority_version = version(client.get('/check-for-priority-command'))
+
+    start_time = time.monotonic()
+    response = client.get(f'/check-for-priority-command?since={priority_version}&wait=0.3')
+    assert time.monotonic() - start_time >= 0.3
+    assert response.status_code == 304
+    assert version(response) == priority_version
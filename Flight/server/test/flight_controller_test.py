@@ -0,0 +1,84 @@
+# Tests for the state Flight API pushes to and is polled for by the script
+#
+# Usage (from the repository root):
+#   python -m pytest Flight/server/test/flight_controller_test.py
+import os
+import sys
+import tempfile
+
+# Ahead of Ground/server, which has modules of the same names
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../..'))
+
+# setup_logging writes to logs/ under the working directory
+working_directory = os.getcwd()
+os.chdir(tempfile.mkdtemp())
+os.mkdir("logs")
+try:
+    from flightController import FlightController
+finally:
+    os.chdir(working_directory)
+
+EMERGENCY_LAND = {"Command": "Emergency Land"}
+BRAKE = {"Command": "Brake", "Details": {}}
+DETOUR = [{"Command": "NavMode"}, {"Command": "Land"}]
+REPLANNED_DETOUR = [{"Command": "NavMode"}, {"Command": "Navigate"}, {"Command": "Land"}]
+
+
+def drain(subscriber) -> list:
+    events = []
+    while not subscriber.empty():
+        events.append(subscriber.get_nowait()[1:])
+    return events
+
+
+def test_detour_replan_keeps_pending_priority_command():
+    # No stream connected, the script has not picked up the command yet
+    controller = FlightController()
+    controller.set_priority_command({"Priority Command": EMERGENCY_LAND})
+    controller.set_detour_route({"Priority Command": {}, "Updated Flight Plan": REPLANNED_DETOUR})
+
+    priority = controller.check_for_priority_command()
+    assert priority["priority_command_created"] is True
+    assert priority["priority_command"] == EMERGENCY_LAND
+    assert controller.check_for_route_update()["route"] == REPLANNED_DETOUR
+
+
+def test_detour_replan_streams_route_only():
+    controller = FlightController()
+    subscriber = controller.subscribe_events()
+    controller.set_detour_route({"Priority Command": BRAKE, "Updated Flight Plan": DETOUR})
+    controller.set_detour_route({"Priority Command": {}, "Updated Flight Plan": REPLANNED_DETOUR})
+
+    assert drain(subscriber) == [
+        ("priority_command", {"priority_command": BRAKE}),
+        ("route_update", {"route": DETOUR}),
+        ("route_update", {"route": REPLANNED_DETOUR}),
+    ]
+    assert controller.priority_commands_executed == [BRAKE]
+
+
+def test_battery_change_completed_once():
+    controller = FlightController()
+    controller.battery_change_is_complete()
+
+    assert controller.check_for_battery_change_completed()["battery_change_completed"] is True
+    # A later battery change waits for its own completion
+    assert controller.check_for_battery_change_completed()["battery_change_completed"] is False
+
+
+def test_battery_change_completed_not_replayed():
+    controller = FlightController()
+    subscriber = controller.subscribe_events()
+    controller.battery_change_is_complete()
+    assert drain(subscriber) == [("battery_change_completed", {"battery_change_completed": True})]
+
+    # New stream after a reconnect the history does not cover
+    controller.unsubscribe_events(subscriber)
+    assert drain(controller.subscribe_events()) == []
+
+    # Completion before any stream connects is delivered once
+    controller = FlightController()
+    controller.battery_change_is_complete()
+    assert drain(controller.subscribe_events()) == [("battery_change_completed", {"battery_change_completed": True})]
+    assert drain(controller.subscribe_events()) == []
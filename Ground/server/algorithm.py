@@ -2,18 +2,72 @@ from waypoint import WAYPOINT_LST, Waypoint
 from route import Route
 from flightplan import FlightPlan
 from route_generator import generate_routes
+from planCostModel import PlanCostModel, is_better_plan
+from multiStartPlanner import multi_start_search
+from localSearch import LocalSearch
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from threading import Event
+from typing import Iterator
 import configparser
+import copy
+import logging
+import math
 import os
 import json
+import time
 
 config = configparser.ConfigParser()
 config.read(os.path.join(os.path.dirname(__file__), '../..', 'config.ini'))
 
+# Task 2 planning engines
+AUTO_ENGINE = "auto"
+GREEDY_ENGINE = "greedy"
+ITERATIVE_ENGINE = "iterative"
+BRANCH_AND_BOUND_ENGINE = "branch_and_bound"
+DYNAMIC_PROGRAMMING_ENGINE = "dynamic_programming"
+MULTI_START_ENGINE = "multi_start"
+TASK_2_ENGINES = [GREEDY_ENGINE, ITERATIVE_ENGINE, DYNAMIC_PROGRAMMING_ENGINE, BRANCH_AND_BOUND_ENGINE,
+                  MULTI_START_ENGINE]
+
+# Largest route set AUTO_ENGINE plans with the dynamic programming engine
+DYNAMIC_PROGRAMMING_MAX_ROUTES = 12
+# Resolution of battery time kept apart by the dynamic programming engine (seconds)
+BATTERY_BUCKET_TIME = 150.0
+
+# Max seconds the branch and bound engine searches before returning its best plan
+BRANCH_AND_BOUND_TIME_LIMIT = 30.0
+# Largest route set the branch and bound engine usually proves optimal within BRANCH_AND_BOUND_TIME_LIMIT
+BRANCH_AND_BOUND_MAX_ROUTES = 16
+# Max seconds task_2 spends improving the engine's plan by local search
+LOCAL_SEARCH_TIME_LIMIT = 1.0
+# Worker processes the multi start engine uses when task_2 is not given a worker count
+MULTI_START_WORKERS = os.cpu_count() or 1
+# Seconds the multi start engine leaves for starting workers and collecting their plans
+MULTI_START_OVERHEAD = 1.0
+# Seconds each multi start round of the anytime planner runs before reporting its plans
+ANYTIME_ROUND_TIME = 2.0
+# Max seconds the anytime planner keeps improving a plan
+ANYTIME_TIME_LIMIT = 600.0
+
 def format_for_execute_command(flightplan: FlightPlan) -> list:
     command_sequence = []
     for i in range(len(flightplan.waypoints)):
         curr_wp = flightplan.waypoints[i]
         instruction = flightplan.instructions[i]
+        if i > 0:
+            # Fly around obstacles between waypoints
+            for detour_wp in WAYPOINT_LST.get_detour_path(flightplan.waypoints[i - 1], curr_wp):
+                cmd = {
+                    "Command" : "Navigate",
+                    "Details" : {
+                        "Name" : detour_wp.name,
+                        "Latitude" : detour_wp.latitude,
+                        "Longitude" : detour_wp.longitude,
+                        "Altitude" : config["Ground"]["ALTITUDE"]
+                    }
+                }
+                command_sequence.append(cmd)
 # --------------------------------------- TAKEOFF ---------------------------------------
         if instruction == "Takeoff":
             cmd = {
@@ -192,18 +246,47 @@ def add_route_instructions(waypoints: list[Waypoint], routes: list[Route], batte
         i += 1
     return instructions, route_plan
 
-def count_waypoint_occurances(curr_wp: Waypoint, final_waypoints: list[Waypoint]) -> int:
-    """Recursive algorithm which builds a route path through all desired waypoints using provided routes
-    and time / distance / reward considerations.
+class WaypointPath:
+    """Append-only record of the waypoints traversed as a flight plan is built, shared by every
+    level of the planner, with visit counts kept alongside for constant time lookups
+    """
+
+    def __init__(self) -> None:
+        self.waypoints = []
+        self.visits = Counter()
+
+    def push(self, waypoint: Waypoint) -> None:
+        """Add a waypoint to the end of the path
+
+        param waypoint: waypoint traversed (Waypoint)
+        """
+        self.waypoints.append(waypoint)
+        self.visits[waypoint.name] += 1
+
+    def pop(self) -> Waypoint:
+        """Remove the last waypoint added to the path
+
+        :return: waypoint removed (Waypoint)
+        """
+        waypoint = self.waypoints.pop()
+        self.visits[waypoint.name] -= 1
+        return waypoint
+
+    def __len__(self) -> int:
+        return len(self.waypoints)
+
+
+def count_waypoint_occurances(curr_wp: Waypoint, final_waypoints: WaypointPath) -> int:
+    """Count how many times a waypoint has been traversed in the flight plan being built
 
     param curr_wp: current waypoint in route path (Waypoint)
-    param final_waypoints: waypoints traversed as a flight plan is built ([Waypoint])
+    param final_waypoints: waypoints traversed as a flight plan is built (WaypointPath)
     :return: number of occurances of a waypoint in the complete waypoint list
     """
     if curr_wp is None:
         return 0
-    
-    return len([wp for wp in final_waypoints if wp.name == curr_wp.name])
+
+    return final_waypoints.visits[curr_wp.name]
 
 
 def get_next_waypoint_opts(current_waypoint: Waypoint, routes: list[Route]) -> tuple[list, float]:
@@ -228,32 +311,216 @@ def get_next_waypoint_opts(current_waypoint: Waypoint, routes: list[Route]) -> t
     return next_possible_waypoints, max_dist_to_nextwp / FlightPlan.drone_speed
 
 def compare_optimal_paths(path_1: FlightPlan, path_2: FlightPlan) -> FlightPlan:
-    """Compare the pre-computed ratio between two FlightPlan's, returning the best option
+    """Compare two FlightPlan's by reward collected, returning the best option
 
-    param path_1: Flight plan option with computed ratio (FlightPlan)
-    param path_2: Flight plan option with computed ratio (FlightPlan)
+    param path_1: Flight plan option (FlightPlan)
+    param path_2: Flight plan option (FlightPlan)
     :return: FlightPlan with route plan and route specific details (FlightPlan)
     """
-    # equal choose money over distance or sm
-    if path_1.ratio > path_2.ratio:
-        # Compare path ratios
+    # Most reward, or equal rewards finishing sooner
+    if is_better_plan(path_1.reward_collected, path_1.time_accumulated, path_2.reward_collected,
+                      path_2.time_accumulated):
         return path_1
-    elif path_1.ratio == path_2.ratio:
-        # Equal path ratios, return path with smaller distance travelled
-        if path_1.distance_travelled < path_2.distance_travelled:
-            return path_1
-
     return path_2
 
 
-def calculate_optimized_path(current_waypoint: Waypoint, routes: list[Route], final_waypoints: list[Waypoint],
+def plan_final_route(current_waypoint: Waypoint, route: Route, acc_time: float) -> FlightPlan:
+    """Build the tail of a flight plan completing the last route and returning to origin
+
+    param current_waypoint: current waypoint in route path (Waypoint)
+    param route: last route to be completed (Route)
+    param acc_time: time accumulated on the current battery (float)
+    :return: FlightPlan with the last route and return to origin
+    """
+    if route.start_waypoint == current_waypoint:
+        # 1 Route left, you are at starting position, complete route
+        flightplan = FlightPlan(route.reward, route.distance)
+
+        # Verify that there is enough battery to complete the final route
+        acc_time_update = acc_time + flightplan.time_accumulated + 2 * (FlightPlan.time_to_land \
+            + FlightPlan.time_to_load) + FlightPlan.time_to_takeoff
+        if acc_time_update > FlightPlan.max_time_on_battery:
+            flightplan.append_at_next_head()
+            acc_time_update += FlightPlan.time_to_swap_battery
+    else:
+        # Not at the starting waypoint as the last route
+        flightplan = FlightPlan(route.reward, route.distance)
+        # Route added to start of planned route
+        flightplan.add_route_tail(current_waypoint, route.start_waypoint, without_start=True)
+
+        # Verify if there is enough battery to travel to start of planned route and complete
+        acc_time_update = acc_time + flightplan.time_accumulated + 2 * (FlightPlan.time_to_land \
+            + FlightPlan.time_to_load) + FlightPlan.time_to_takeoff
+        if acc_time_update > FlightPlan.max_time_on_battery:
+            flightplan.battery_swap()
+            acc_time_update += FlightPlan.time_to_swap_battery
+
+    # Add path to return to origin
+    flightplan.add_route_tail_wp_only(route.end_waypoint, FlightPlan.origin)
+
+    # start procedure
+    flightplan.complete_route()
+    # end procedure
+    flightplan.complete_route()
+
+    return flightplan
+
+
+def choose_next_route(current_waypoint: Waypoint, routes: list[Route], next_possible_wp: list) -> tuple[int, bool]:
+    """Pick the next route by the lowest distance / reward ratio
+
+    param current_waypoint: current waypoint in route path (Waypoint)
+    param routes: list of routes remaining to be completed ([Route])
+    param next_possible_wp: next waypoint options from get_next_waypoint_opts ([(Waypoint, int, bool)])
+    :return: index of the chosen route in routes, True if completing the route from current_waypoint
+    """
+    route_opt = (-1, False) # route_index, is_completing_route
+    min_ratio = 10000 # ratio = dist / reward
+    for next_wp, route_index, at_start_wp in next_possible_wp:
+        route = routes[route_index]
+        ratio_cr = 10000
+        ratio_ncr = 10000
+
+        if at_start_wp:
+            # next_wp could complete a route
+            ratio_cr = route.distance / route.reward
+
+        else:
+            # next_wp is the begining of another route
+            dist = FlightPlan.calculate_distance(current_waypoint, next_wp)
+            ratio_ncr = (dist + route.distance) / route.reward
+
+        if ratio_cr <= min_ratio:
+            min_ratio = ratio_cr
+            route_opt = (route_index, True)
+        if ratio_ncr < min_ratio:
+            min_ratio = ratio_ncr
+            route_opt = (route_index, False)
+
+    return route_opt
+
+
+def plan_route_completion(current_waypoint: Waypoint, route_completed: Route, acc_time: float,
+                          total_time: float) -> tuple[Waypoint, float, float, bool, bool]:
+    """Update battery and mission time for completing a route from current_waypoint
+
+    param current_waypoint: start of the route being completed (Waypoint)
+    param route_completed: route being completed (Route)
+    param acc_time: time accumulated on the current battery (float)
+    param total_time: mission time accumulated (float)
+    :return: 1. next waypoint 2. updated battery time 3. updated mission time 4. True if origin must be
+    visited before the route 5. True if the battery is swapped at origin after the route
+    """
+    next_wp = route_completed.end_waypoint
+    add_origin_before_route_head = False
+    rtl_swap = False
+
+    acc_time_update = acc_time + (
+            route_completed.distance / FlightPlan.drone_speed) + 2 * (FlightPlan.time_to_land + \
+        FlightPlan.time_to_load + FlightPlan.time_to_takeoff)
+    total_time_update = total_time + acc_time_update - acc_time
+
+    if FlightPlan.is_low_battery(acc_time, route_completed.distance, next_wp) or FlightPlan.rtl_swap_battery(current_waypoint, acc_time_update):
+        # route will need more battery life, signal to go back to origin
+        # prior to starting route
+        add_origin_before_route_head = True
+        # reset time accumulated to start with this route only + time from origin to start (s)
+        acc_time_update = acc_time_update - acc_time + FlightPlan.get_time_from_origin(current_waypoint) + FlightPlan.time_to_takeoff
+        total_time_update += FlightPlan.get_time_from_origin(current_waypoint) + FlightPlan.time_to_swap_battery + FlightPlan.time_to_takeoff
+
+    elif FlightPlan.rtl_swap_battery(next_wp, acc_time_update):
+        acc_time_update = FlightPlan.time_to_takeoff
+        total_time_update += FlightPlan.time_to_swap_battery + FlightPlan.time_to_takeoff
+        rtl_swap = True
+
+    return next_wp, acc_time_update, total_time_update, add_origin_before_route_head, rtl_swap
+
+
+def plan_transit(current_waypoint: Waypoint, next_wp: Waypoint, acc_time: float,
+                 total_time: float) -> tuple[float, float, float, bool]:
+    """Update battery and mission time for flying to the start of the next route
+
+    param current_waypoint: current waypoint in route path (Waypoint)
+    param next_wp: start of the next route to complete (Waypoint)
+    param acc_time: time accumulated on the current battery (float)
+    param total_time: mission time accumulated (float)
+    :return: 1. distance flown 2. updated battery time 3. updated mission time 4. True if origin must be
+    visited for a battery swap before next_wp
+    """
+    # Transit only, no reward earned
+    transit_distance = FlightPlan.calculate_distance(current_waypoint, next_wp)
+
+    # Current accumulated time plus time to next waypoint
+    acc_time_update = acc_time + transit_distance / FlightPlan.drone_speed
+    total_time_update = total_time + transit_distance / FlightPlan.drone_speed
+    battery_swap = False
+
+    if FlightPlan.is_low_battery(acc_time, transit_distance, next_wp) or FlightPlan.rtl_swap_battery(next_wp, acc_time_update):
+        # route will need more battery life, add a stop at origin before
+        # going to next_wp
+        battery_swap = True
+
+        # reset time to time taken from refuel to next waypoint
+        acc_time_update = FlightPlan.get_time_from_origin(next_wp) + FlightPlan.time_to_takeoff
+        total_time_update -= transit_distance / FlightPlan.drone_speed
+        total_time_update += acc_time_update + FlightPlan.get_time_from_origin(current_waypoint) + FlightPlan.time_to_swap_battery \
+            + FlightPlan.time_to_takeoff
+
+    return transit_distance, acc_time_update, total_time_update, battery_swap
+
+
+def add_route_completion(flightplan: FlightPlan, route_completed: Route, next_wp: Waypoint,
+                         add_origin_before_route_head: bool, rtl_swap: bool) -> None:
+    """Add a completed route to the head of a flight plan built for the remaining routes
+
+    param flightplan: flight plan for the routes after route_completed (FlightPlan)
+    param route_completed: route completed (Route)
+    param next_wp: end of the route completed (Waypoint)
+    param add_origin_before_route_head: signal to add a stop at origin before the route (bool)
+    param rtl_swap: signal to swap the battery at origin after the route (bool)
+    """
+    # pickup procedure
+    flightplan.complete_route()
+    # drop off procedure
+    flightplan.complete_route()
+
+    if rtl_swap:
+        flightplan.append_at_next_head()
+
+    flightplan.add_route_head(route_completed.reward,
+                    route_completed.distance,
+                    next_wp)
+
+    if add_origin_before_route_head:
+        # Signal for flightplan to add origin before whichever wp is added to the head next
+        flightplan.append_at_next_head()
+
+
+def add_transit(flightplan: FlightPlan, transit_distance: float, next_wp: Waypoint, battery_swap: bool) -> None:
+    """Add the flight to the start of the next route to the head of a flight plan
+
+    param flightplan: flight plan starting at next_wp (FlightPlan)
+    param transit_distance: distance flown to next_wp (float)
+    param next_wp: start of the next route (Waypoint)
+    param battery_swap: signal to add a stop at origin before next_wp (bool)
+    """
+    if battery_swap:
+        # Add signal such that next time a wp is added to the head, origin is added as well
+        flightplan.append_at_next_head()
+
+    flightplan.add_route_head(0,
+                            transit_distance,
+                            next_wp)
+
+
+def calculate_optimized_path(current_waypoint: Waypoint, routes: list[Route], final_waypoints: WaypointPath,
                              acc_time: float, total_time: float) -> FlightPlan:
     """Recursive algorithm which builds a route path through all desired waypoints using provided routes
     and time / distance / reward considerations.
 
     param current_waypoint: current waypoint in route path (Waypoint)
     param routes: list of routes provided to be completed in final flight plan ([Waypoint])
-    param final_waypoints: waypoints traversed as a flight plan is built ([Waypoint])
+    param final_waypoints: waypoints traversed as a flight plan is built, shared by all levels (WaypointPath)
     param acc_time: time accumulated as routes are completed (float)
     :return: FlightPlan with route plan and route specific details
     """
@@ -263,180 +530,568 @@ def calculate_optimized_path(current_waypoint: Waypoint, routes: list[Route], fi
 
     if (total_time + max_possible_next_time) >= FlightPlan.max_time_in_air:
         # Max time in air reached
-        return FlightPlan(waypoints=[FlightPlan.origin])
+        return FlightPlan(waypoints=deque([FlightPlan.origin]))
 
     elif len(routes) == 1:
+        return plan_final_route(current_waypoint, routes[0], acc_time)
 
-        if routes[0].start_waypoint == current_waypoint:
-            # 1 Route left, you are at starting position, complete route
-            flightplan = FlightPlan(routes[0].reward, routes[0].distance)
-
-            # Verify that there is enough battery to complete the final route
-            acc_time_update = acc_time + flightplan.time_accumulated + 2 * (FlightPlan.time_to_land \
-                + FlightPlan.time_to_load) + FlightPlan.time_to_takeoff
-            if acc_time_update > FlightPlan.max_time_on_battery:
-                flightplan.append_at_next_head()
-                acc_time_update += FlightPlan.time_to_swap_battery
-
-            # Add path to return to origin
-            flightplan.add_route_tail_wp_only(routes[0].end_waypoint, final_waypoints[0])
-
-            # start procedure
-            flightplan.complete_route()
-            # end procedure
-            flightplan.complete_route()
-            
-            return flightplan
-        else:
-            # Not at the starting waypoint as the last route
-            flightplan = FlightPlan(routes[0].reward, routes[0].distance)
-            # Route added to start of planned route
-            flightplan.add_route_tail(current_waypoint, routes[0].start_waypoint, without_start=True)
-
-            # Verify if there is enough battery to travel to start of planned route and complete
-            acc_time_update = acc_time + flightplan.time_accumulated + 2 * (FlightPlan.time_to_land \
-                + FlightPlan.time_to_load) + FlightPlan.time_to_takeoff
-            if acc_time_update > FlightPlan.max_time_on_battery:
-                flightplan.battery_swap()
-                acc_time_update += FlightPlan.time_to_swap_battery
-            # Add path to return to origin
-            flightplan.add_route_tail_wp_only(routes[0].end_waypoint, final_waypoints[0])
-
-            # start procedure
-            flightplan.complete_route()
-            # end procedure
-            flightplan.complete_route()
-            
-            return flightplan
+    route_index, complete_route = choose_next_route(current_waypoint, routes, next_possible_wp)
+
+    if complete_route:
+        # Doing the route current_wp = start, next_wp = end
+        route_completed = routes.pop(route_index)
+        next_wp, acc_time_update, total_time_update, add_origin_before_route_head, rtl_swap = \
+            plan_route_completion(current_waypoint, route_completed, acc_time, total_time)
+
+        final_waypoints.push(current_waypoint)
+        flightplan = calculate_optimized_path(next_wp, routes, final_waypoints, acc_time_update, total_time_update)
+        final_waypoints.pop()
+
+        add_route_completion(flightplan, route_completed, next_wp, add_origin_before_route_head, rtl_swap)
+        return flightplan
 
     else:
+        # Not Completing Route, Move to next best starting point for a route (assume in air)
+        next_wp = routes[route_index].start_waypoint
+        transit_distance, acc_time_update, total_time_update, battery_swap = \
+            plan_transit(current_waypoint, next_wp, acc_time, total_time)
 
-        route_opt = (-1, False) # route_index, is_completing_route
-        min_ratio = 10000 # ratio = dist / reward
-        for next_wp, route_index, at_start_wp in next_possible_wp:
-            route = routes[route_index]
-            ratio_cr = 10000
-            ratio_ncr = 10000
-            
-            if at_start_wp:
-                # next_wp could complete a route
-                ratio_cr = route.distance / route.reward
+        final_waypoints.push(current_waypoint)
+        flightplan = calculate_optimized_path(next_wp, routes, final_waypoints, acc_time_update, total_time_update)
+        final_waypoints.pop()
 
-            else:
-                # next_wp is the begining of another route
-                dist = FlightPlan.calculate_distance(current_waypoint, next_wp)
-                ratio_ncr = (dist + route.distance) / route.reward
+        add_transit(flightplan, transit_distance, next_wp, battery_swap)
+        return flightplan
 
-            if ratio_cr <= min_ratio:
-                min_ratio = ratio_cr
-                route_opt = (route_index, True)
-            if ratio_ncr < min_ratio:
-                min_ratio = ratio_ncr
-                route_opt = (route_index, False)
 
-        route_index, complete_route = route_opt
+def calculate_optimized_path_iterative(current_waypoint: Waypoint, routes: list[Route],
+                                       acc_time: float, total_time: float) -> FlightPlan:
+    """Iterative version of calculate_optimized_path producing identical flight plans without a
+    recursion depth limit. Steps are chosen walking forward and recorded on an explicit stack, then
+    the flight plan is built from the last route back to the first by unwinding the stack
 
-        # Signal to add a stop at origin before current waypoint
-        add_origin_before_route_head = False
+    param current_waypoint: current waypoint in route path (Waypoint)
+    param routes: list of routes provided to be completed in final flight plan ([Route])
+    param acc_time: time accumulated as routes are completed (float)
+    param total_time: mission time accumulated (float)
+    :return: FlightPlan with route plan and route specific details
+    """
+    final_waypoints = WaypointPath()
+    # (True, route_completed, next_wp, add_origin_before_route_head, rtl_swap) or
+    # (False, transit_distance, next_wp, battery_swap)
+    steps = []
+
+    while True:
+        next_possible_wp, max_possible_next_time = get_next_waypoint_opts(current_waypoint, routes)
 
-        if(complete_route):
-            # Doing the route current_wp = start, next_wp = end
+        if (total_time + max_possible_next_time) >= FlightPlan.max_time_in_air:
+            # Max time in air reached
+            flightplan = FlightPlan(waypoints=deque([FlightPlan.origin]))
+            break
+        elif len(routes) == 1:
+            flightplan = plan_final_route(current_waypoint, routes[0], acc_time)
+            break
+
+        route_index, complete_route = choose_next_route(current_waypoint, routes, next_possible_wp)
+
+        if complete_route:
             route_completed = routes.pop(route_index)
-            next_wp = route_completed.end_waypoint
-            rtl_swap = False
-
-            acc_time_update = acc_time + (
-                    route_completed.distance / FlightPlan.drone_speed) + 2 * (FlightPlan.time_to_land + \
-                FlightPlan.time_to_load + FlightPlan.time_to_takeoff)
-            total_time_update = total_time + acc_time_update - acc_time
-
-            if FlightPlan.is_low_battery(acc_time, route_completed.distance, next_wp) or FlightPlan.rtl_swap_battery(current_waypoint, acc_time_update):
-                # route will need more battery life, signal to go back to origin
-                # prior to starting route 
-                add_origin_before_route_head = True
-                # reset time accumulated to start with this route only + time from origin to start (s)
-                acc_time_update = acc_time_update - acc_time + FlightPlan.get_time_from_origin(current_waypoint) + FlightPlan.time_to_takeoff
-                total_time_update += FlightPlan.get_time_from_origin(current_waypoint) + FlightPlan.time_to_swap_battery + FlightPlan.time_to_takeoff
-
-            elif FlightPlan.rtl_swap_battery(next_wp, acc_time_update):
-                acc_time_update = FlightPlan.time_to_takeoff
-                total_time_update += FlightPlan.time_to_swap_battery + FlightPlan.time_to_takeoff
-                rtl_swap = True
-
-            flightplan = calculate_optimized_path(next_wp, routes, final_waypoints + [current_waypoint],
-                                                acc_time_update, total_time_update)
-            
-            # pickup procedure
-            flightplan.complete_route()
-            # drop off procedure
-            flightplan.complete_route()
-
-            if rtl_swap:
-                flightplan.append_at_next_head()
-
-            flightplan.add_route_head(route_completed.reward,
-                            route_completed.distance,
-                            next_wp)
+            next_wp, acc_time, total_time, add_origin_before_route_head, rtl_swap = \
+                plan_route_completion(current_waypoint, route_completed, acc_time, total_time)
+            steps.append((True, route_completed, next_wp, add_origin_before_route_head, rtl_swap))
+        else:
+            next_wp = routes[route_index].start_waypoint
+            transit_distance, acc_time, total_time, battery_swap = \
+                plan_transit(current_waypoint, next_wp, acc_time, total_time)
+            steps.append((False, transit_distance, next_wp, battery_swap))
+
+        final_waypoints.push(current_waypoint)
+        current_waypoint = next_wp
+
+    # Build flight plan from the last step back to the first
+    while steps:
+        step = steps.pop()
+        final_waypoints.pop()
+        if step[0]:
+            add_route_completion(flightplan, *step[1:])
+        else:
+            add_transit(flightplan, *step[1:])
+
+    return flightplan
+
+
+class BranchAndBoundPlanner:
+    """Exact Task 2 planner searching route orderings depth first. Partial plans are pruned when an
+    admissible upper bound on their reward (fractional knapsack of the remaining routes over the remaining
+    mission time) cannot beat the best plan found, or when another ordering of the same routes reached the
+    same position sooner with more battery left.
+
+    The search starts from the greedy plan improved by local search, which is also the plan returned when
+    the time limit is reached before anything better is found. Optimality is only proven in practice up to
+    about BRANCH_AND_BOUND_MAX_ROUTES routes: 14 routes take 3 to 6 s and 16 routes 8 to 22 s, while 18 or
+    more routes usually reach the time limit, returning the best plan found without a proof.
+    """
+
+    def __init__(self, cost_model: PlanCostModel, time_limit: float = BRANCH_AND_BOUND_TIME_LIMIT) -> None:
+        """Initialize BranchAndBoundPlanner object
+
+        param cost_model: time tables for the routes to plan (PlanCostModel)
+        param time_limit: max seconds to search before returning the best plan found (float)
+        """
+        self.cost_model = cost_model
+        self.time_limit = time_limit
+        self.best_order = []
+        self.best_swaps = []
+        self.best_reward = 0.0
+        self.best_time = 0.0
+        # (route mask, state): [(total time, battery time)] of partial plans already explored
+        self.labels = {}
+        self.nodes_explored = 0
+        self.is_optimal = True
+        self.deadline = None
+
+    def solve(self) -> tuple[list[int], list[int]]:
+        """Search for the route order collecting the most reward, using the least time on ties
+
+        :return: route indexes in completion order, positions in order preceded by a battery swap
+        """
+        total_time, battery_time = self.cost_model.initial_times()
+        self.best_time = total_time + self.cost_model.finish[self.cost_model.origin_state]
+        self.deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+
+        # Start from the greedy plan improved by local search, so the bound prunes from the first node
+        local_search = LocalSearch(self.cost_model, *self.cost_model.greedy_order())
+        local_search.run(LOCAL_SEARCH_TIME_LIMIT)
+        if is_better_plan(local_search.reward, local_search.total_time, self.best_reward, self.best_time):
+            self.best_reward = local_search.reward
+            self.best_time = local_search.total_time
+            self.best_order = list(local_search.order)
+            self.best_swaps = local_search.battery_swaps()
+
+        self._search(0, self.cost_model.origin_state, total_time, battery_time, 0.0, [], [])
+        return self.best_order, self.best_swaps
+
+    def is_dominated(self, route_mask: int, state: int, total_time: float, battery_time: float) -> bool:
+        """Check if the same routes were already completed ending in state with less time used,
+        recording the partial plan if not
+
+        :return: True if the partial plan cannot improve on one already explored
+        """
+        key = (route_mask, state)
+        labels = self.labels.get(key)
+        if labels is None:
+            self.labels[key] = [(total_time, battery_time)]
+            return False
+        for label_total, label_battery in labels:
+            if label_total <= total_time and label_battery <= battery_time:
+                return True
+        labels[:] = [label for label in labels if not (total_time <= label[0] and battery_time <= label[1])]
+        labels.append((total_time, battery_time))
+        return False
+
+    def _search(self, route_mask: int, state: int, total_time: float, battery_time: float, reward: float,
+                order: list[int], swaps: list[int]) -> None:
+        cost_model = self.cost_model
+        self.nodes_explored += 1
+        if self.deadline is not None and self.nodes_explored % 1024 == 0 and time.perf_counter() > self.deadline:
+            self.is_optimal = False
+        if not self.is_optimal:
+            return
+
+        # Record plan if ending the mission here is the best so far
+        final_time = total_time + cost_model.finish[state]
+        if is_better_plan(reward, final_time, self.best_reward, self.best_time):
+            self.best_reward = reward
+            self.best_time = final_time
+            self.best_order = order.copy()
+            self.best_swaps = swaps.copy()
+
+        # Prune if the remaining routes cannot beat the best plan
+        reward_bound, min_final_time = cost_model.remaining_bounds(route_mask, state, total_time, battery_time,
+                                                                   self.best_reward - reward)
+        # A plan that can at best match the reward of the best plan is pruned if it cannot be done sooner
+        if not is_better_plan(reward + reward_bound, min_final_time, self.best_reward, self.best_time):
+            return
+
+        # Expand next routes, with and without a battery swap beforehand
+        can_swap = state != cost_model.origin_state
+        children = []
+        for j in range(cost_model.num_routes):
+            if route_mask >> j & 1:
+                continue
+            feasible, next_total, next_battery = cost_model.step(state, total_time, battery_time, j, False)
+            if feasible:
+                children.append((cost_model.rewards[j] / (next_total - total_time), j, False, next_total, next_battery))
+            if can_swap:
+                feasible, next_total, next_battery = cost_model.step(state, total_time, battery_time, j, True)
+                if feasible:
+                    children.append((cost_model.rewards[j] / (next_total - total_time), j, True, next_total,
+                                     next_battery))
+
+        # Best reward per second first so good plans are found early
+        children.sort(reverse=True)
+        for _, j, swap, next_total, next_battery in children:
+            next_mask = route_mask | (1 << j)
+            if self.is_dominated(next_mask, j, next_total, next_battery):
+                continue
+            if swap:
+                swaps.append(len(order))
+            order.append(j)
+            self._search(next_mask, j, next_total, next_battery, reward + cost_model.rewards[j], order, swaps)
+            order.pop()
+            if swap:
+                swaps.pop()
+
+
+def task_2_branch_and_bound(all_routes: list[Route], time_limit: float = BRANCH_AND_BOUND_TIME_LIMIT,
+                            local_search_time: float = 0.0) -> FlightPlan:
+    """Exact planner which searches all route orderings and battery swap positions for the plan
+    collecting the most reward within max_time_in_air. Practical up to about BRANCH_AND_BOUND_MAX_ROUTES routes
+
+    param all_routes: list of routes provided to be completed in final flight plan ([Route])
+    param time_limit: max seconds to search, best plan found so far is returned when reached (float)
+    param local_search_time: max seconds for improving the best plan found by local search when
+    time_limit is reached, 0 to skip (float)
+    :return: FlightPlan with route plan and route specific details
+    """
+    if len(all_routes) > BRANCH_AND_BOUND_MAX_ROUTES:
+        logging.warning(f"Branch and bound is unlikely to prove {len(all_routes)} routes optimal "
+                        f"within {time_limit} s")
+    cost_model = PlanCostModel(all_routes)
+    planner = BranchAndBoundPlanner(cost_model, time_limit)
+    order, battery_swaps = planner.solve()
+    flightplan = cost_model.build_flight_plan(order, battery_swaps)
+    if not planner.is_optimal:
+        logging.info(f"Branch and bound time limit reached after {planner.nodes_explored} nodes, "
+                     f"returning best plan found")
+        if local_search_time > 0:
+            flightplan = improve_flight_plan(all_routes, flightplan, local_search_time)
+
+    return flightplan
+
 
-            if add_origin_before_route_head:
-                # Check for signal to add origin before route
-                add_origin_before_route_head = False
-                # Signal for flightplan to add origin before whichever wp is added to the head next
-                flightplan.append_at_next_head()
-            
-            return flightplan
+def calculate_dynamic_programming_path(cost_model: PlanCostModel) -> tuple[list[int], list[int]]:
+    """Held-Karp style planner. Builds plans one route at a time, keeping for every
+    (completed routes bitmask, last route, battery time bucket) only the plan using the least mission time
 
+    param cost_model: time tables for the routes to plan (PlanCostModel)
+    :return: route indexes in completion order, positions in order preceded by a battery swap
+    """
+    total_time, battery_time = cost_model.initial_times()
+    start_key = (0, cost_model.origin_state, int(battery_time // BATTERY_BUCKET_TIME))
+    # key: (total time, battery time, reward)
+    layer = {start_key: (total_time, battery_time, 0.0)}
+    # key: (previous key, route index, swap before route)
+    parents = {}
+    best_key, best_reward, best_time = start_key, 0.0, total_time
+
+    # Greedy plan gives the bound to beat before any layer completes
+    greedy_order, greedy_swaps = cost_model.greedy_order()
+    _, incumbent_time, incumbent_reward = cost_model.evaluate(greedy_order, greedy_swaps)
+
+    for _ in range(cost_model.num_routes):
+        next_layer = {}
+        for key, (total_time, battery_time, reward) in layer.items():
+            route_mask, state, _ = key
+            swap_opts = (False,) if state == cost_model.origin_state else (False, True)
+            for j in range(cost_model.num_routes):
+                if route_mask >> j & 1:
+                    continue
+                for swap in swap_opts:
+                    feasible, next_total, next_battery = cost_model.step(state, total_time, battery_time, j, swap)
+                    if not feasible:
+                        continue
+                    next_key = (route_mask | (1 << j), j, int(next_battery // BATTERY_BUCKET_TIME))
+                    current = next_layer.get(next_key)
+                    if current is None or next_total < current[0] or \
+                            (next_total == current[0] and next_battery < current[1]):
+                        next_layer[next_key] = (next_total, next_battery, reward + cost_model.rewards[j])
+                        parents[next_key] = (key, j, swap)
+
+        if not next_layer:
+            break
+
+        # Drop plans beaten on both mission and battery time by a plan ending at the same route
+        by_route = {}
+        for key, value in next_layer.items():
+            by_route.setdefault(key[:2], []).append((key[2], value[0], key))
+        for buckets in by_route.values():
+            buckets.sort()
+            min_total = None
+            for _, total_time, key in buckets:
+                if min_total is not None and total_time >= min_total:
+                    del next_layer[key]
+                else:
+                    min_total = total_time
+
+        # Record the best plan ending after this many routes
+        for key, (total_time, _, reward) in next_layer.items():
+            final_time = total_time + cost_model.finish[key[1]]
+            if is_better_plan(reward, final_time, best_reward, best_time):
+                best_key, best_reward, best_time = key, reward, final_time
+        if is_better_plan(best_reward, best_time, incumbent_reward, incumbent_time):
+            incumbent_reward, incumbent_time = best_reward, best_time
+
+        # Drop plans whose remaining routes cannot beat the best plan known
+        for key in list(next_layer):
+            total_time, battery_time, reward = next_layer[key]
+            reward_bound, min_final_time = cost_model.remaining_bounds(key[0], key[1], total_time, battery_time,
+                                                                       incumbent_reward - reward)
+            if not is_better_plan(reward + reward_bound, min_final_time, incumbent_reward, incumbent_time):
+                del next_layer[key]
+        layer = next_layer
+
+    # Plans tying the greedy plan are pruned, keep it if nothing better was found
+    if is_better_plan(incumbent_reward, incumbent_time, best_reward, best_time):
+        return greedy_order, greedy_swaps
+
+    # Walk parents back to the start to recover the route order
+    order = []
+    swap_flags = []
+    key = best_key
+    while key in parents:
+        key, route_index, swap = parents[key]
+        order.append(route_index)
+        swap_flags.append(swap)
+    order.reverse()
+    swap_flags.reverse()
+    battery_swaps = [i for i in range(len(order)) if swap_flags[i]]
+    return order, battery_swaps
+
+
+def task_2_dynamic_programming(all_routes: list[Route]) -> FlightPlan:
+    """Dynamic programming planner for small route sets, returning the plan collecting the
+    most reward within max_time_in_air
+
+    param all_routes: list of routes provided to be completed in final flight plan ([Route])
+    :return: FlightPlan with route plan and route specific details
+    """
+    cost_model = PlanCostModel(all_routes)
+    order, battery_swaps = calculate_dynamic_programming_path(cost_model)
+    return cost_model.build_flight_plan(order, battery_swaps)
+
+
+def task_2_multi_start(all_routes: list[Route], workers: int, time_limit: float) -> FlightPlan:
+    """Multi start planner running differently seeded randomized greedy and local search runs
+    on a process pool, returning the best plan found within time_limit
+
+    param all_routes: list of routes provided to be completed in final flight plan ([Route])
+    param workers: number of worker processes (int)
+    param time_limit: max wall clock seconds for planning (float)
+    :return: FlightPlan with route plan and route specific details
+    """
+    cost_model = PlanCostModel(all_routes)
+    # Every worker runs until the same deadline, time.time() is comparable across processes
+    deadline = time.time() + max(time_limit - MULTI_START_OVERHEAD, 0.0)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(multi_start_search, cost_model, seed, deadline) for seed in range(workers)]
+        results = [future.result() for future in futures]
+
+    best = None
+    for order, battery_swaps in results:
+        flightplan = cost_model.build_flight_plan(order, battery_swaps)
+        best = flightplan if best is None else compare_optimal_paths(best, flightplan)
+    logging.info(f"Multi start planner with {workers} workers collected {best.reward_collected} reward "
+                 f"in {best.time_accumulated:.1f} s")
+    return best
+
+
+def set_planning_obstacles(all_routes: list[Route], obstacles: list[list[Waypoint]]) -> list[Route]:
+    """Make waypoint distances used for planning follow the shortest paths around obstacles,
+    an empty list restores straight lines. Detour waypoints are added by format_for_execute_command
+
+    param all_routes: routes to plan, left unchanged ([Route])
+    param obstacles: obstacles to avoid, each a list of waypoints ([[Waypoint]])
+    :return: copies of the routes that can be flown from origin and back around the obstacles,
+    with distances around them ([Route])
+    """
+    detour_distances, detour_paths = {}, {}
+    if obstacles:
+        # Only imported when needed, the detour module pulls in shapely and networkx
+        from detourAlgorithm import get_obstacle_distances
+        detour_distances, detour_paths = get_obstacle_distances(WAYPOINT_LST.matrix_waypoints, obstacles)
+        unreachable = [wp.name for wp in WAYPOINT_LST.matrix_waypoints
+                       if detour_distances.get((FlightPlan.origin.number, wp.number)) == math.inf]
+        if unreachable:
+            logging.warning(f"Waypoints unreachable from origin around obstacles: {unreachable}")
+    if detour_distances or WAYPOINT_LST.detour_distances:
+        WAYPOINT_LST.set_detours(detour_distances, detour_paths)
+
+    # An infinite distance anywhere in a route makes every engine's time checks fail
+    origin = FlightPlan.origin
+    reachable_routes = []
+    unreachable_routes = []
+    for route in all_routes:
+        # Copied so the caller's routes keep their distances across plans with other obstacles
+        route = copy.copy(route)
+        route.distance = WAYPOINT_LST.get_distance(route.start_waypoint, route.end_waypoint)
+        if math.isinf(route.distance) or math.isinf(WAYPOINT_LST.get_distance(origin, route.start_waypoint)) or \
+                math.isinf(WAYPOINT_LST.get_distance(route.end_waypoint, origin)):
+            unreachable_routes.append(route.number)
         else:
-            # Not Completing Route, Move to next best starting point for a route (assume in air)
-            route_to_complete = routes[route_index]
-            next_wp = route_to_complete.start_waypoint
-            route_completed = Route(-1, 0, current_waypoint.name, next_wp.name, 99999, "", 0)
-            
-            # Current accumulated time plus time to next waypoint
-            acc_time_update = acc_time + route_completed.distance / FlightPlan.drone_speed
-            total_time_update = total_time + route_completed.distance / FlightPlan.drone_speed
-
-            if FlightPlan.is_low_battery(acc_time, route_completed.distance, next_wp) or FlightPlan.rtl_swap_battery(next_wp, acc_time_update):
-                # route will need more battery life, add a stop at origin before
-                # going to next_wp
-
-                # reset time to time taken from refuel to next waypoint
-                acc_time_update = FlightPlan.get_time_from_origin(next_wp) + FlightPlan.time_to_takeoff
-                total_time_update -= route_completed.distance / FlightPlan.drone_speed
-                total_time_update += acc_time_update + FlightPlan.get_time_from_origin(current_waypoint) + FlightPlan.time_to_swap_battery \
-                    + FlightPlan.time_to_takeoff
-                flightplan = calculate_optimized_path(next_wp, routes, final_waypoints + [current_waypoint],
-                                                        acc_time_update, total_time_update)
-                # Add signal such that next time a wp is added to the head, origin is added as well
-                flightplan.append_at_next_head()
-            else:
-                flightplan = calculate_optimized_path(next_wp, routes, final_waypoints + [current_waypoint],
-                                                        acc_time_update, total_time_update)
-            
-            flightplan.add_route_head(route_completed.reward,
-                                    route_completed.distance,
-                                    next_wp)
-            
-            return flightplan 
+            reachable_routes.append(route)
+    if unreachable_routes:
+        logging.warning(f"Routes unreachable around obstacles dropped from planning: {unreachable_routes}")
+    return reachable_routes
+
+
+def task_2_anytime(all_routes: list[Route], stop_event: Event, workers: int = MULTI_START_WORKERS,
+                   time_limit: float = ANYTIME_TIME_LIMIT, obstacles: list = None) -> Iterator[FlightPlan]:
+    """Anytime planner yielding a quick plan first, then every improved plan found until stop_event is set,
+    the plan is proven optimal or time_limit runs out.
+    Obstacle distances and the cost model are computed when called, on the caller's thread, so the
+    returned iterator can be consumed on a background thread without touching WAYPOINT_LST
+
+    param all_routes: list of routes provided to be completed in final flight plan ([Route])
+    param stop_event: set to stop planning after the current round (Event)
+    param workers: worker processes for the multi start rounds (int)
+    param time_limit: max seconds to keep improving (float)
+    param obstacles: obstacles to plan around, each a list of waypoints ([[Waypoint]])
+    :return: iterator of FlightPlan's, each better than the one before
+    """
+    all_routes = set_planning_obstacles(all_routes, obstacles or [])
+    cost_model = PlanCostModel(all_routes)
+    return anytime_flight_plans(cost_model, stop_event, workers, time.time() + time_limit)
 
 
-def task_2(all_routes: list[Route]) -> FlightPlan:
-    """Recursive algorithm which builds a route path through all desired waypoints using provided routes
-    and time / distance / reward considerations.
+def anytime_flight_plans(cost_model: PlanCostModel, stop_event: Event, workers: int,
+                         end_time: float) -> Iterator[FlightPlan]:
+    """Plans of task_2_anytime, built from the cost model's time tables only
 
-    param routes: list of routes provided to be completed in final flight plan ([Waypoint])
+    param cost_model: time tables for the routes to plan (PlanCostModel)
+    param stop_event: set to stop planning after the current round (Event)
+    param workers: worker processes for the multi start rounds (int)
+    param end_time: time.time() after which no new round is started (float)
+    :return: iterator of FlightPlan's, each better than the one before
+    """
+    # Quick first plan to launch with
+    order, battery_swaps = cost_model.greedy_order()
+    local_search = LocalSearch(cost_model, order, battery_swaps)
+    local_search.run(LOCAL_SEARCH_TIME_LIMIT)
+    best = cost_model.build_flight_plan(local_search.order, local_search.battery_swaps())
+    yield best
+
+    if cost_model.num_routes <= DYNAMIC_PROGRAMMING_MAX_ROUTES:
+        # Small route sets are solved exactly, no later round can improve on it
+        if not stop_event.is_set():
+            flightplan = cost_model.build_flight_plan(*calculate_dynamic_programming_path(cost_model))
+            if compare_optimal_paths(flightplan, best) is flightplan:
+                yield flightplan
+        return
+
+    seed = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while not stop_event.is_set() and time.time() < end_time:
+            deadline = min(time.time() + ANYTIME_ROUND_TIME, end_time)
+            futures = [executor.submit(multi_start_search, cost_model, seed + i, deadline) for i in range(workers)]
+            seed += workers
+            for future in futures:
+                flightplan = cost_model.build_flight_plan(*future.result())
+                if compare_optimal_paths(flightplan, best) is flightplan:
+                    best = flightplan
+                    yield best
+
+
+def task_2_greedy(all_routes: list[Route], engine: str) -> FlightPlan:
+    """Greedy planner completing the best reward per second route next
+
+    param all_routes: list of routes provided to be completed in final flight plan ([Route])
+    param engine: GREEDY_ENGINE for the recursive planner, ITERATIVE_ENGINE for the iterative one (str)
     :return: FlightPlan with route plan and route specific details
     """
     start_wp = FlightPlan.origin
 
-    flightplan = calculate_optimized_path(start_wp, all_routes.copy(), [], FlightPlan.time_to_takeoff, FlightPlan.time_to_takeoff)
-    flightplan.waypoints = [start_wp] + flightplan.waypoints
+    if engine == ITERATIVE_ENGINE:
+        flightplan = calculate_optimized_path_iterative(start_wp, all_routes.copy(), FlightPlan.time_to_takeoff,
+                                                        FlightPlan.time_to_takeoff)
+    else:
+        flightplan = calculate_optimized_path(start_wp, all_routes.copy(), WaypointPath(), FlightPlan.time_to_takeoff,
+                                              FlightPlan.time_to_takeoff)
+    flightplan.waypoints.appendleft(start_wp)
+    # Plan complete, waypoints are indexed from here on
+    flightplan.waypoints = list(flightplan.waypoints)
     flightplan.takeoff()
 
     flightplan.reformat_battery_indexes()
 
     flightplan.instructions, flightplan.route_plan = add_route_instructions(flightplan.waypoints, all_routes, flightplan.battery_swap_indexes)
 
+    # Rebuilt so mission time follows the same time model as every other engine
+    cost_model = PlanCostModel(all_routes)
+    return cost_model.build_flight_plan(*cost_model.recover_order(flightplan))
+
+
+def improve_flight_plan(all_routes: list[Route], flightplan: FlightPlan, time_limit: float) -> FlightPlan:
+    """Post optimization pass applying route swaps, relocations, 2-opt / or-opt moves, route insertions
+    and battery swap repositioning to a finished plan
+
+    param all_routes: list of routes provided to be completed in final flight plan ([Route])
+    param flightplan: plan returned by a task_2 engine (FlightPlan)
+    param time_limit: max seconds to search (float)
+    :return: FlightPlan rebuilt by PlanCostModel, improved when local search found a better plan
+    """
+    cost_model = PlanCostModel(all_routes)
+    order, battery_swaps = cost_model.recover_order(flightplan)
+    local_search = LocalSearch(cost_model, order, battery_swaps)
+    report = local_search.run(time_limit)
+    logging.info(f"Local search: reward {report['reward_before']} -> {report['reward_after']}, "
+                 f"time {report['time_before']:.1f} -> {report['time_after']:.1f} s, "
+                 f"moves {report['moves']}, {report['elapsed']:.3f} s"
+                 + (", repaired infeasible plan" if report["repaired"] else ""))
+
+    return cost_model.build_flight_plan(local_search.order, local_search.battery_swaps())
+
+
+def task_2(all_routes: list[Route], engine: str = AUTO_ENGINE,
+           time_limit: float = BRANCH_AND_BOUND_TIME_LIMIT, workers: int = None,
+           local_search_time: float = LOCAL_SEARCH_TIME_LIMIT, obstacles: list = None) -> FlightPlan:
+    """Plan which routes to complete, in which order and where to swap the battery to collect the most
+    reward within max_time_in_air, using one of TASK_2_ENGINES:
+        GREEDY_ENGINE / ITERATIVE_ENGINE: best reward per second route next, recursive or iterative
+        DYNAMIC_PROGRAMMING_ENGINE: exact Held-Karp style planner for small route sets
+        BRANCH_AND_BOUND_ENGINE: exact search over route orders, stopped at time_limit
+        MULTI_START_ENGINE: randomized greedy and local search runs on a process pool until time_limit
+    Routes that cannot be flown around the obstacles are dropped before planning, plans of every engine
+    are timed by PlanCostModel.
+
+    param all_routes: list of routes provided to be completed in final flight plan ([Route])
+    param engine: planning engine to use, AUTO_ENGINE picks the multi start engine when workers is given,
+    the dynamic programming engine up to DYNAMIC_PROGRAMMING_MAX_ROUTES routes and the iterative greedy
+    engine otherwise (str)
+    param time_limit: max seconds for the branch and bound and multi start engines to search (float)
+    param workers: worker processes for the multi start engine, AUTO_ENGINE uses the multi start
+    engine when given (int)
+    param local_search_time: max seconds for improving the engine's plan by local search, 0 to skip.
+    Exact plans are kept as they are, branch and bound plans are only improved when time_limit stopped
+    the search before proving them optimal (float)
+    param obstacles: obstacles to plan around, each a list of waypoints, straight lines are flown
+    when not given ([[Waypoint]])
+    :return: FlightPlan with route plan and route specific details
+    """
+    all_routes = set_planning_obstacles(all_routes, obstacles or [])
+
+    if engine == AUTO_ENGINE and workers is not None:
+        engine = MULTI_START_ENGINE
+    elif engine == AUTO_ENGINE:
+        if len(all_routes) <= DYNAMIC_PROGRAMMING_MAX_ROUTES:
+            engine = DYNAMIC_PROGRAMMING_ENGINE
+        else:
+            # Same plans as GREEDY_ENGINE without the recursion depth limit
+            engine = ITERATIVE_ENGINE
+
+    # Exact engines, local search cannot improve a plan proven optimal
+    if engine == BRANCH_AND_BOUND_ENGINE:
+        return task_2_branch_and_bound(all_routes, time_limit, local_search_time)
+    if engine == DYNAMIC_PROGRAMMING_ENGINE:
+        return task_2_dynamic_programming(all_routes)
+
+    if engine == MULTI_START_ENGINE:
+        flightplan = task_2_multi_start(all_routes, workers or MULTI_START_WORKERS, time_limit)
+    else:
+        flightplan = task_2_greedy(all_routes, engine)
+
+    if local_search_time > 0:
+        flightplan = improve_flight_plan(all_routes, flightplan, local_search_time)
     return flightplan
 
 
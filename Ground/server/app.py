@@ -6,6 +6,9 @@ import sys
 sys.path.append('../../')
 
 from Shared.loggingHandler import setup_logging
+from Shared.apiClient import get_api_metrics
+from Shared.shared_utils import error_dict
+from Shared.telemetryCodec import read_telemetry_request
 from Ground.server.groundController import GroundController
 
 
@@ -44,6 +47,12 @@ def heartbeat():
     return {"success": True}
 
 
+@app.route('/api-metrics', methods=['GET'])
+def api_metrics():
+    # Latency and failures of requests sent to Flight
+    return {"success": True, "api_metrics": get_api_metrics()}
+
+
 @app.route('/process-qr', methods=['POST'])
 def process_qr():
     # Accepts 2 form parameters, raw_qr_string and qr_type (enum)
@@ -67,6 +76,18 @@ def load_route():
     return groundController.load_flight_plan_from_file()
 
 
+@app.route('/task-2-plan/commit', methods=['POST'])
+def commit_task_2_plan():
+    # Stop background Task 2 planning and save the best plan found
+    return groundController.commit_task_2_plan()
+
+
+@app.route('/task-2-plan/cancel', methods=['POST'])
+def cancel_task_2_planning():
+    # Stop background Task 2 planning without saving a plan
+    return groundController.cancel_task_2_planning()
+
+
 @app.route('/kill-flight', methods=['POST'])
 def kill_flight():
     # Immediately land the drone
@@ -80,8 +101,11 @@ def get_telemetry():
 
 @app.route('/set-telemetry', methods=['POST'])
 def set_telemetry():
-    # Access POST telemetry
-    json_response = request.get_json()
+    # Access POST telemetry, json or binary (telemetryCodec)
+    try:
+        json_response = read_telemetry_request(request)
+    except ValueError as e:
+        return error_dict(str(e)), 400
     # Process data, and notify event subscribers
     return groundController.process_telemetry(json_response)
 
@@ -1,9 +1,13 @@
 # Manager for sending and verifying route commands
 import json
 import logging
+import math
 import configparser
 import requests
 import os
+import threading
+import time
+from typing import Iterator, Optional
 
 from qr import QrTypes, QrHandler
 from route import RouteTypes
@@ -12,10 +16,14 @@ from waypoint import Waypoint
 from telemetryHandler import TelemetryHandler
 from emailHandler import EmailHandler
 
-from algorithm import task_2, format_for_execute_command
-from detourAlgorithm import get_detour_route
+from algorithm import task_2, task_2_anytime, format_for_execute_command
+from flightplan import FlightPlan
+from detourAlgorithm import DetourCache, DetourPlotRenderer, \
+    IncrementalDetourPlanner
 
 from Shared.loggingHandler import setup_logging
+from Shared.apiClient import get_api_client
+from Shared.shared_utils import get_distance_meters
 
 
 config = configparser.ConfigParser()
@@ -30,6 +38,23 @@ VEHICLE_WEIGHT = 7
 
 FLIGHT_ALTITUDE = 80
 
+# Plan Task 2 in the background, streaming improved plans until committed
+TASK_2_ANYTIME = config['Ground'].getboolean('Task_2_Anytime', fallback=False)
+# SocketIO event streaming Task 2 plans while planning in the background
+TASK_2_PLAN_EVENT = "task-2-plan"
+
+# Save a plot of each detour, rendered in the background
+PLOT_DETOURS = config['Ground'].getboolean('Plot_Detours', fallback=True)
+# Seconds after a Task 1 Update QR the detour is replanned from telemetry
+DETOUR_REFRESH_TIME = config['Ground'].getfloat('Detour_Refresh_Time',
+                                                fallback=30.0)
+# Min seconds between detour replans, each started by new telemetry
+DETOUR_REPLAN_INTERVAL = config['Ground'].getfloat('Detour_Replan_Interval',
+                                                   fallback=1.0)
+# Distance in metres at which the drone has reached the rejoin waypoint and
+# replanning stops. Larger than the distance flown between telemetry samples
+DETOUR_REACHED_DISTANCE = 15
+
 
 class CommandManager:
 
@@ -38,12 +63,30 @@ class CommandManager:
                  telemetry_handler: TelemetryHandler):
         self.qr_handler = qr_handler
         self.telemetry_handler = telemetry_handler
+        self.flight_api = get_api_client(FLIGHT_API)
 
         # For route tracking
         self.waypoint_routes = []
         self.initial_route_plan = []
         self.updated_route_plan = []
 
+        # For background Task 2 planning
+        self.task_2_lock = threading.Lock()
+        self.task_2_stop = threading.Event()
+        self.task_2_plan = None
+        self.task_2_start_time = 0.0
+
+        # For detours
+        self.detour_cache = DetourCache()
+        self.detour_plot_renderer = DetourPlotRenderer()
+        self.detour_planner = None
+        self.detour_route = []
+        self.detour_remaining_waypoints = []
+        self.detour_refresh_until = 0.0
+        # Detours are replanned on a background thread, woken by telemetry
+        self.detour_telemetry = threading.Event()
+        self.detour_refresh_thread = None
+
     def execute_qr(self, qr_type: QrTypes) -> None:
         """Process QR data and sending initial/updated route to Flight
         Assumes QR data is validated
@@ -88,8 +131,8 @@ class CommandManager:
         print(json_route)
 
         try:
-            response = requests.post(f"{FLIGHT_API}/set-initial-route",
-                                     json=json_route)
+            response = self.flight_api.post("/set-initial-route",
+                                            json=json_route)
             response.raise_for_status()
         except requests.exceptions.RequestException as e:
             logging.info(f"Parse Route - Initial Route POST Error:\n\t{e}")
@@ -113,12 +156,107 @@ class CommandManager:
             if self.waypoint_routes[wp_i].name == rejoin_wp_name:
                 remaining_waypoints = self.waypoint_routes[wp_i:]
 
+        # Keep the obstacle graph to replan from telemetry as the drone moves
+        self.detour_planner = IncrementalDetourPlanner(
+            qr_data["rejoin_waypoint"], [qr_data["boundaries"]])
+        self.detour_route = route_update
+        self.detour_remaining_waypoints = remaining_waypoints
+        self.detour_refresh_until = time.time() + DETOUR_REFRESH_TIME
+        if self.detour_refresh_thread is None:
+            self.detour_refresh_thread = threading.Thread(
+                target=self.run_detour_refresh, daemon=True)
+            self.detour_refresh_thread.start()
+
+        self.send_detour_route(route_update, {"Command": "Brake",
+                                              "Details": {}})
+        print(self.updated_route_plan)
+
+    def refresh_detour(self):
+        """
+        Signals new telemetry to the detour refresh thread without waiting
+        for the replan, called for every telemetry sample
+        Returns: None
+        """
+        if self.detour_planner is not None:
+            self.detour_telemetry.set()
+
+    def run_detour_refresh(self):
+        """
+        Background worker replanning the detour after new telemetry, at most
+        once every DETOUR_REPLAN_INTERVAL seconds
+        Returns: None
+        """
+        while True:
+            self.detour_telemetry.wait()
+            self.detour_telemetry.clear()
+            try:
+                self.replan_detour()
+            except Exception as e:
+                logging.error(f"Detour Replan Error:\n\t{e}")
+            time.sleep(DETOUR_REPLAN_INTERVAL)
+
+    def replan_detour(self):
+        """
+        Replans the detour from the latest telemetry while the detour refresh
+        window is open and the rejoin waypoint is not reached yet. Only the
+        drone's position is re-connected to the obstacle graph, and the detour
+        is sent to Flight only if it changed, without a priority command so
+        the drone keeps flying
+        Returns: None
+        """
+        planner = self.detour_planner
+        if planner is None:
+            return
+        if time.time() > self.detour_refresh_until:
+            self.detour_planner = None
+            return
+
+        current_position = self.telemetry_handler.get_recent_data()
+        # Replanning past the rejoin waypoint would send the drone back to it.
+        # Remaining waypoints start at the rejoin, the next one follows it
+        targets = [planner.rejoin] + self.detour_remaining_waypoints[1:2]
+        for target in targets:
+            north, east = get_distance_meters(current_position["latitude"],
+                                              current_position["longitude"],
+                                              target.latitude,
+                                              target.longitude)
+            if math.hypot(north, east) < DETOUR_REACHED_DISTANCE:
+                logging.info(f"Detour to {planner.rejoin.name} reached "
+                             f"{target.name}, replanning stopped")
+                self.detour_planner = None
+                return
+
+        detour_start = Waypoint(name="CurrentPosition", number=1234,
+                                longitude=current_position["longitude"],
+                                latitude=current_position["latitude"])
+        route_update = planner.get_detour_route(detour_start)
+
+        # Keep the previous detour if no detour is found from here, an empty
+        # detour means the direct path is now clear
+        if route_update is None or [(wp.longitude, wp.latitude)
+                                    for wp in route_update] == \
+                [(wp.longitude, wp.latitude) for wp in self.detour_route]:
+            return
+        # A newer Task 1 Update QR replaced this detour while replanning
+        if self.detour_planner is not planner:
+            return
+        logging.info(f"Detour to {planner.rejoin.name} replanned with "
+                     f"{len(route_update)} waypoints")
+        self.detour_route = route_update
+        self.send_detour_route(route_update, {})
+
+    def send_detour_route(self, route_update: list[Waypoint],
+                          priority_command: dict):
+        """
+        Sends the detour followed by the rest of the initial route to Flight
+        Args:
+            route_update: intermediate waypoints to the rejoin waypoint
+            priority_command: command to execute first, empty for none
+        Returns: None
+        """
         # Create flight update message with updated flight plan
         flight_update_msg = {
-            "Priority Command": {
-                "Command": "Brake",
-                "Details": {}
-            },
+            "Priority Command": priority_command,
             "Updated Flight Plan": []
         }
         flight_update_msg["Updated Flight Plan"].append(
@@ -131,7 +269,7 @@ class CommandManager:
                             waypoint.longitude, FLIGHT_ALTITUDE)
             )
         # Add rejoin and remaining waypoints
-        for waypoint in remaining_waypoints:
+        for waypoint in self.detour_remaining_waypoints:
             flight_update_msg["Updated Flight Plan"].append(
                 nav_command(waypoint.name, waypoint.latitude,
                             waypoint.longitude, FLIGHT_ALTITUDE)
@@ -141,11 +279,10 @@ class CommandManager:
         flight_update_msg["Updated Flight Plan"].append({"Command": "Land"})
 
         self.updated_route_plan = flight_update_msg
-        print(flight_update_msg)
 
         try:
-            response = requests.post(f"{FLIGHT_API}/set-detour-route",
-                                     json=flight_update_msg)
+            response = self.flight_api.post("/set-detour-route",
+                                            json=flight_update_msg)
             response.raise_for_status()
         except requests.exceptions.RequestException as e:
             logging.info(f"Parse Route - Detour Route POST Error:\n\t{e}")
@@ -162,9 +299,35 @@ class CommandManager:
         routes = [route for route in qr_data["routes"]
                   if route.max_vehicle_weight > VEHICLE_WEIGHT]
 
+        # Plan around the no-fly area from QR 2 when one was scanned
+        obstacles = self.get_task_2_obstacles()
+
+        if TASK_2_ANYTIME:
+            self.start_task_2_planning(routes, obstacles)
+            return
+
         # Optimization algorithm
-        flight_plan = task_2(routes)
+        flight_plan = task_2(routes, obstacles=obstacles)
+        self.save_task_2_plan(flight_plan)
 
+    def get_task_2_obstacles(self) -> list:
+        """
+        Gets the obstacles Task 2 routes must avoid
+        Returns: List of obstacles, each a list of boundary waypoints
+        """
+        qr_response = self.qr_handler.get_qr(str(QrTypes.Task_1_Update_Qr.value),
+                                             waypoints_as_dicts=False)
+        if not qr_response['success'] or not qr_response['qr_data']["boundaries"]:
+            return []
+        return [qr_response['qr_data']["boundaries"]]
+
+    def save_task_2_plan(self, flight_plan: FlightPlan):
+        """
+        Saves Task 2 Flight plan to json file and sends email
+        Args:
+            flight_plan: Final Task 2 plan
+        Returns: None
+        """
         # Save to json
         flight_instructions = format_for_execute_command(flight_plan)
         json_obj = json.dumps(flight_instructions, indent=4)
@@ -181,6 +344,113 @@ class CommandManager:
         print("Sending Email")
         email_handler.send_email(comp_email["Subject"], comp_email["Body"])
 
+    def start_task_2_planning(self, routes: list, obstacles: list = None):
+        """
+        Starts planning Task 2 in a background thread. Every improved plan is
+        emitted on TASK_2_PLAN_EVENT until the plan is committed or cancelled
+        Args:
+            routes: Routes accessible to the vehicle
+            obstacles: Obstacles to plan around, each a list of waypoints
+        Returns: None
+        """
+        # Stop any previous planning, its plan is replaced
+        self.cancel_task_2_planning()
+        with self.task_2_lock:
+            self.task_2_stop = threading.Event()
+            self.task_2_plan = None
+            self.task_2_start_time = time.time()
+        # Obstacle distances are set on this thread, the planning thread only
+        # reads the cost model built from them
+        try:
+            flight_plans = task_2_anytime(routes, self.task_2_stop,
+                                          obstacles=obstacles)
+        except Exception as e:
+            logging.error(f"Task 2 Background Planning Error:\n\t{e}")
+            self.emit_task_2_plan(None, "failed")
+            return
+        threading.Thread(target=self.run_task_2_planning, args=(flight_plans, self.task_2_stop),
+                         daemon=True).start()
+
+    def run_task_2_planning(self, flight_plans: Iterator[FlightPlan],
+                            stop_event: threading.Event):
+        """
+        Background worker storing and emitting each improved Task 2 plan
+        Args:
+            flight_plans: Plans from task_2_anytime, each better than the last
+            stop_event: Set when the plan is committed or cancelled
+        Returns: None
+        """
+        try:
+            for flight_plan in flight_plans:
+                with self.task_2_lock:
+                    if stop_event.is_set():
+                        return
+                    self.task_2_plan = flight_plan
+                self.emit_task_2_plan(flight_plan, "improved")
+        except Exception as e:
+            logging.error(f"Task 2 Background Planning Error:\n\t{e}")
+            self.emit_task_2_plan(None, "failed")
+            return
+
+        with self.task_2_lock:
+            if stop_event.is_set():
+                return
+            flight_plan = self.task_2_plan
+        self.emit_task_2_plan(flight_plan, "finished")
+
+    def emit_task_2_plan(self, flight_plan: Optional[FlightPlan],
+                         status: str):
+        """
+        Emits a Task 2 plan summary on TASK_2_PLAN_EVENT
+        Args:
+            flight_plan: Plan to summarize, None if no plan is available
+            status: improved, finished, committed, cancelled or failed
+        Returns: None
+        """
+        data = {
+            "status": status,
+            "planning_time": time.time() - self.task_2_start_time
+        }
+        if flight_plan is not None:
+            data.update({
+                "reward": flight_plan.reward_collected,
+                "time": flight_plan.time_accumulated,
+                "distance": flight_plan.distance_travelled,
+                "route_plan": flight_plan.route_plan
+            })
+        self.telemetry_handler.socket_io.emit(TASK_2_PLAN_EVENT, data)
+
+    def commit_task_2_plan(self) -> bool:
+        """
+        Stops background planning and saves the best Task 2 plan found
+        Returns: True if a plan was committed
+        """
+        with self.task_2_lock:
+            flight_plan = self.task_2_plan
+            if flight_plan is None or self.task_2_stop.is_set():
+                return False
+            self.task_2_stop.set()
+
+        logging.info(f"Committing Task 2 plan with reward {flight_plan.reward_collected}")
+        self.save_task_2_plan(flight_plan)
+        self.emit_task_2_plan(flight_plan, "committed")
+        return True
+
+    def cancel_task_2_planning(self) -> bool:
+        """
+        Stops background planning, discarding its plan
+        Returns: True if planning was in progress
+        """
+        with self.task_2_lock:
+            if self.task_2_stop.is_set() or self.task_2_start_time == 0.0:
+                return False
+            self.task_2_stop.set()
+            self.task_2_plan = None
+
+        logging.info("Task 2 planning cancelled")
+        self.emit_task_2_plan(None, "cancelled")
+        return True
+
     def load_flight_plan_from_file(self):
         """
         Reads the saved Flight Plan in Task 2 from file. Sends plan to Flight
@@ -195,8 +465,8 @@ class CommandManager:
             print(json_route)
 
             try:
-                response = requests.post(f"{FLIGHT_API}/set-initial-route",
-                                         json=json_route)
+                response = self.flight_api.post("/set-initial-route",
+                                                json=json_route)
                 response.raise_for_status()
                 return True
             except requests.exceptions.RequestException as e:
@@ -211,8 +481,8 @@ class CommandManager:
             "Priority Command": {"Command": "Emergency Land"}
         }
         try:
-            response = requests.post(f"{FLIGHT_API}/set-priority-command",
-                                     json=priority_command)
+            response = self.flight_api.post("/set-priority-command",
+                                            json=priority_command)
             response.raise_for_status()
             return True
         except requests.exceptions.RequestException as e:
@@ -247,8 +517,12 @@ class CommandManager:
         detour_start = Waypoint(name="CurrentPosition", number=1234,
                                 longitude=current_position["longitude"],
                                 latitude=current_position["latitude"])
-        detour_plan = get_detour_route(detour_start, rejoin_waypoint,
-                                       boundaries, True)
+        detour_plan = self.detour_cache.get_detour_route(detour_start,
+                                                         rejoin_waypoint,
+                                                         [boundaries])
+        if PLOT_DETOURS:
+            self.detour_plot_renderer.submit(detour_start, rejoin_waypoint,
+                                             [boundaries], detour_plan)
         return detour_plan
 
 
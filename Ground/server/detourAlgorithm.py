@@ -1,13 +1,356 @@
+from shapely.errors import GEOSException
 from shapely.geometry import LineString, Point, Polygon
-from typing import List
-import pyproj
+from shapely.prepared import prep
+from shapely.strtree import STRtree
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import math
+import threading
 import networkx as nx
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 
-from Ground.server.waypoint import Waypoint
+from Ground.server.waypoint import Waypoint, GEOD
+from Ground.server.projection import get_projection
 
 BUFFER_DISTANCE = 25
 
+# Number of detour requests remembered by DetourCache
+DETOUR_CACHE_SIZE = 128
+# Decimal places start coordinates are rounded to by DetourCache, about 1m
+DETOUR_CACHE_PRECISION = 5
+
+# Min turn radius in metres the vehicle can fly, detour turns are replaced
+# by arcs of this radius. 0 keeps sharp turns
+DETOUR_TURN_RADIUS = 0
+# Max angle between consecutive points of a fitted arc
+ARC_STEP = math.radians(15)
+
+
+def cross(origin: Tuple[float, float], a: Tuple[float, float],
+          b: Tuple[float, float]) -> float:
+    """
+    Z component of the cross product of origin->a and origin->b, positive
+    when b is counter-clockwise of a
+    """
+    return (a[0] - origin[0]) * (b[1] - origin[1]) - \
+        (a[1] - origin[1]) * (b[0] - origin[0])
+
+
+def polygon_vertices(polygon: Polygon) -> List[Tuple[float, float]]:
+    """
+    Returns the exterior vertices of a polygon in counter-clockwise order,
+    without the closing vertex
+    """
+    vertices = list(polygon.exterior.coords)[:-1]
+    if not polygon.exterior.is_ccw:
+        vertices.reverse()
+    return vertices
+
+
+def is_tangent(vertex: Tuple[float, float], prev_vertex: Tuple[float, float],
+               next_vertex: Tuple[float, float],
+               other: Tuple[float, float]) -> bool:
+    """
+    Checks if the line from other through a convex polygon vertex only
+    touches the polygon, keeping both neighbouring vertices on one side.
+    Shortest paths around convex obstacles only leave or reach a vertex
+    along such lines
+    """
+    return cross(other, vertex, prev_vertex) * \
+        cross(other, vertex, next_vertex) >= 0
+
+
+def blocked(geometry, tree: STRtree, prepared: list) -> bool:
+    """
+    Checks if a geometry intersects any of the polygons indexed in an
+    STRtree, with exact tests only for polygons whose bounds it crosses
+    """
+    return any(prepared[i].intersects(geometry) for i in tree.query(geometry))
+
+
+def build_visibility_graph(points: List[Tuple[float, float]],
+                           obstacles: List[Tuple[Polygon, Polygon]]) -> nx.Graph:
+    """
+    Builds a reduced visibility graph around convex obstacles. Nodes are the
+    free points and the vertices of each obstacle's outer polygon, edges are
+    only added between tangent node pairs whose segment stays clear of every
+    inner polygon. Obstacles are indexed in an STRtree so each segment is
+    only tested against obstacles whose bounds it crosses
+    Args:
+        points: free points such as the start and rejoin coordinates
+        obstacles: (outer, inner) convex polygon pairs, nodes are taken from
+            the outer polygon and edges must not intersect the inner one
+    Returns: graph with edges weighted by length
+    """
+    inner_tree = STRtree([inner for _, inner in obstacles])
+    outer_tree = STRtree([outer for outer, _ in obstacles])
+    prepared_inners = [prep(inner) for _, inner in obstacles]
+    prepared_outers = [prep(outer) for outer, _ in obstacles]
+
+    # Node coordinates with their neighbouring vertices, None for free points.
+    # Free points within an outer polygon's tolerance can reach any vertex
+    nodes = []
+    for point in points:
+        in_tolerance = blocked(Point(point), outer_tree, prepared_outers)
+        nodes.append((point, None, None, in_tolerance))
+    for outer, _ in obstacles:
+        vertices = polygon_vertices(outer)
+        for i, vertex in enumerate(vertices):
+            # Vertices inside another obstacle can not be visited
+            if blocked(Point(vertex), inner_tree, prepared_inners):
+                continue
+            nodes.append((vertex, vertices[i - 1],
+                          vertices[(i + 1) % len(vertices)], False))
+
+    graph = nx.Graph()
+    for node, _, _, _ in nodes:
+        graph.add_node(node)
+
+    for i, (u, u_prev, u_next, u_in_tolerance) in enumerate(nodes):
+        for v, v_prev, v_next, v_in_tolerance in nodes[i + 1:]:
+            if u == v:
+                continue
+            if u_prev is not None and not v_in_tolerance and \
+                    not is_tangent(u, u_prev, u_next, v):
+                continue
+            if v_prev is not None and not u_in_tolerance and \
+                    not is_tangent(v, v_prev, v_next, u):
+                continue
+            edge = LineString([u, v])
+            if not blocked(edge, inner_tree, prepared_inners):
+                graph.add_edge(u, v, weight=math.dist(u, v))
+    return graph
+
+
+def shortcut_path(xy_path: List[Tuple[float, float]], inner_tree: STRtree,
+                  prepared_inners: list) -> List[Tuple[float, float]]:
+    """
+    Removes redundant detour vertices. From each kept vertex the path jumps
+    to the furthest later vertex in line of sight, tested against the
+    buffered obstacles without tolerance
+    Args:
+        xy_path: path from start to rejoin coordinates
+        inner_tree: STRtree of the buffered obstacles without tolerance
+        prepared_inners: prepared buffered obstacles without tolerance
+    Returns: path from start to rejoin coordinates
+    """
+    shortcut = [xy_path[0]]
+    i = 0
+    while i < len(xy_path) - 1:
+        j = len(xy_path) - 1
+        while j > i + 1 and blocked(LineString([xy_path[i], xy_path[j]]),
+                                    inner_tree, prepared_inners):
+            j -= 1
+        shortcut.append(xy_path[j])
+        i = j
+    return shortcut
+
+
+def turn_arc(prev_point: Tuple[float, float], corner: Tuple[float, float],
+             next_point: Tuple[float, float], radius: float,
+             shared_exit: bool = True) -> Optional[List[Tuple[float, float]]]:
+    """
+    Returns points of a circular arc of the given radius tangent to both
+    legs of a turn, replacing the corner. Empty if the legs are collinear,
+    None if the arc does not fit on the legs. The exit leg is shared with
+    the next turn when shared_exit is set, the arc may only use half of it
+    """
+    len_in = math.dist(prev_point, corner)
+    len_out = math.dist(corner, next_point)
+    if len_in == 0 or len_out == 0:
+        return []
+    u = ((prev_point[0] - corner[0]) / len_in,
+         (prev_point[1] - corner[1]) / len_in)
+    w = ((next_point[0] - corner[0]) / len_out,
+         (next_point[1] - corner[1]) / len_out)
+    # Angle between the legs at the corner, pi when going straight on
+    angle = math.acos(max(-1.0, min(1.0, u[0] * w[0] + u[1] * w[1])))
+    deflection = math.pi - angle
+    if deflection < 1e-3:
+        return []
+    if angle < 1e-3:
+        return None
+
+    tangent_dist = radius / math.tan(angle / 2)
+    if tangent_dist > len_in or \
+            tangent_dist > (len_out / 2 if shared_exit else len_out):
+        return None
+    bisector = (u[0] + w[0], u[1] + w[1])
+    bisector_len = math.hypot(*bisector)
+    centre_dist = radius / math.sin(angle / 2)
+    centre = (corner[0] + bisector[0] / bisector_len * centre_dist,
+              corner[1] + bisector[1] / bisector_len * centre_dist)
+    start = (corner[0] + u[0] * tangent_dist, corner[1] + u[1] * tangent_dist)
+
+    # Rotate from the entry tangent point towards the exit tangent point
+    direction = 1 if cross(prev_point, corner, next_point) > 0 else -1
+    start_angle = math.atan2(start[1] - centre[1], start[0] - centre[0])
+    num_steps = max(math.ceil(deflection / ARC_STEP), 1)
+    return [(centre[0] + radius * math.cos(start_angle +
+                                           direction * deflection * k /
+                                           num_steps),
+             centre[1] + radius * math.sin(start_angle +
+                                           direction * deflection * k /
+                                           num_steps))
+            for k in range(num_steps + 1)]
+
+
+def push_corner(prev_point: Tuple[float, float], corner: Tuple[float, float],
+                next_point: Tuple[float, float],
+                radius: float) -> Tuple[float, float]:
+    """
+    Moves a corner away from the inside of its turn so an arc of the given
+    radius fitted at the moved corner passes through the original one
+    """
+    u = (prev_point[0] - corner[0], prev_point[1] - corner[1])
+    w = (next_point[0] - corner[0], next_point[1] - corner[1])
+    u_len, w_len = math.hypot(*u), math.hypot(*w)
+    if u_len == 0 or w_len == 0:
+        return corner
+    bisector = (u[0] / u_len + w[0] / w_len, u[1] / u_len + w[1] / w_len)
+    bisector_len = math.hypot(*bisector)
+    angle = math.acos(max(-1.0, min(1.0, (u[0] * w[0] + u[1] * w[1]) /
+                                    (u_len * w_len))))
+    if bisector_len == 0 or angle < 1e-3:
+        return corner
+    push = radius / math.sin(angle / 2) - radius
+    return (corner[0] - bisector[0] / bisector_len * push,
+            corner[1] - bisector[1] / bisector_len * push)
+
+
+def fit_turn_arcs(xy_path: List[Tuple[float, float]], radius: float,
+                  inner_tree: STRtree, prepared_inners: list
+                  ) -> Optional[List[Tuple[float, float]]]:
+    """
+    Replaces each turn of a detour by an arc of the given radius, the
+    tightest turn the vehicle can fly. An arc cutting into a buffered
+    obstacle without tolerance is moved out with its corner (push_corner).
+    A corner whose arc still does not fit is dropped when the path can go
+    straight past it, otherwise the path is not flyable. Turns are never
+    tightened below the radius
+    Args:
+        xy_path: path from start to rejoin coordinates
+        radius: min turn radius in metres
+        inner_tree: STRtree of the buffered obstacles without tolerance
+        prepared_inners: prepared buffered obstacles without tolerance
+    Returns: path from start to rejoin coordinates, None if not flyable
+    """
+    smoothed = [xy_path[0]]
+    for i in range(1, len(xy_path) - 1):
+        prev_point, corner, next_point = smoothed[-1], xy_path[i], \
+            xy_path[i + 1]
+        shared_exit = i + 1 < len(xy_path) - 1
+        # Start the arc from the end of the previous turn's arc
+        for arc_corner in (corner,
+                           push_corner(prev_point, corner, next_point,
+                                       radius)):
+            arc = turn_arc(prev_point, arc_corner, next_point, radius,
+                           shared_exit)
+            if arc is None:
+                continue
+            if not arc:
+                arc = [arc_corner]
+            if not blocked(LineString([prev_point] + arc), inner_tree,
+                           prepared_inners):
+                smoothed.extend(arc)
+                break
+        else:
+            if blocked(LineString([prev_point, next_point]), inner_tree,
+                       prepared_inners):
+                return None
+    if blocked(LineString([smoothed[-1], xy_path[-1]]), inner_tree,
+               prepared_inners):
+        return None
+    smoothed.append(xy_path[-1])
+    return smoothed
+
+
+def smooth_path(xy_path: List[Tuple[float, float]], inner_tree: STRtree,
+                prepared_inners: list,
+                turn_radius: float = DETOUR_TURN_RADIUS
+                ) -> Optional[List[Tuple[float, float]]]:
+    """
+    Post-processes a detour path, shortcutting redundant vertices and fitting
+    turn arcs when turn_radius is set
+    Returns: path from start to rejoin coordinates, None if a turn is
+        tighter than turn_radius
+    """
+    xy_path = shortcut_path(xy_path, inner_tree, prepared_inners)
+    if turn_radius > 0:
+        xy_path = fit_turn_arcs(xy_path, turn_radius, inner_tree,
+                                prepared_inners)
+    return xy_path
+
+
+def buffer_obstacle(xy_points: List[Tuple[float, float]]) -> Tuple[Polygon, Polygon, Polygon]:
+    """
+    Returns the convex hull of an obstacle's points, the hull buffered by
+    BUFFER_DISTANCE and that buffer with 1m tolerance added
+    """
+    hull = Polygon(xy_points).convex_hull
+    buffer_no_tol = hull.buffer(BUFFER_DISTANCE, join_style=2)
+    return hull, buffer_no_tol, buffer_no_tol.buffer(1, join_style=2)
+
+
+def get_obstacle_distances(waypoints: List[Waypoint],
+                           obstacles: List[List[Waypoint]]) \
+        -> Tuple[Dict[Tuple[int, int], float],
+                 Dict[Tuple[int, int], List[Tuple[float, float]]]]:
+    """
+    Finds the shortest obstacle avoiding path between every pair of waypoints
+    whose straight line crosses an obstacle, using one visibility graph over
+    all waypoints and shortest paths from each waypoint
+    Args:
+        waypoints: waypoints to find distances between
+        obstacles: list of obstacles, each a list of waypoints to avoid
+    Returns: distances in metres keyed by (start number, end number), inf
+        where no path exists, and the (longitude, latitude) coordinates flown
+        through on each detour
+    """
+    projection = get_projection(waypoints + [wp for obstacle in obstacles
+                                             for wp in obstacle])
+    points = [tuple(coord) for coord in projection.waypoints_to_xy(waypoints)]
+    buffered_obstacles = []
+    for obstacle in obstacles:
+        _, buffer_no_tol, buffer = buffer_obstacle(
+            [tuple(coord) for coord in projection.waypoints_to_xy(obstacle)])
+        buffered_obstacles.append((buffer, buffer_no_tol))
+    graph = build_visibility_graph(points, buffered_obstacles)
+
+    # Graph nodes back to longitude, latitude, obstacle vertices in one call
+    node_coords = {point: (wp.longitude, wp.latitude)
+                   for point, wp in zip(points, waypoints)}
+    vertices = [node for node in graph.nodes if node not in node_coords]
+    vertex_lons, vertex_lats = projection.to_lon_lat(
+        [vertex[0] for vertex in vertices], [vertex[1] for vertex in vertices])
+    for vertex, lon, lat in zip(vertices, vertex_lons, vertex_lats):
+        node_coords[vertex] = (float(lon), float(lat))
+
+    distances = {}
+    paths = {}
+    for start_i, start_wp in enumerate(waypoints):
+        _, xy_paths = nx.single_source_dijkstra(graph, points[start_i],
+                                                weight='weight')
+        for end_i, end_wp in enumerate(waypoints):
+            if start_i == end_i or points[start_i] == points[end_i]:
+                continue
+            key = (start_wp.number, end_wp.number)
+            xy_path = xy_paths.get(points[end_i])
+            if xy_path is None:
+                distances[key] = math.inf
+            elif len(xy_path) > 2:
+                # Straight line blocked, sum the geodesic legs of the detour
+                path = [node_coords[node] for node in xy_path[1:-1]]
+                lons = [start_wp.longitude] + [c[0] for c in path] + \
+                    [end_wp.longitude]
+                lats = [start_wp.latitude] + [c[1] for c in path] + \
+                    [end_wp.latitude]
+                distances[key] = GEOD.line_length(lons, lats)
+                paths[key] = path
+    return distances, paths
+
 
 def get_detour_route(start: Waypoint, rejoin: Waypoint,
                      bounding_box: List[Waypoint],
@@ -22,73 +365,102 @@ def get_detour_route(start: Waypoint, rejoin: Waypoint,
         create_plot: whether to plot a graph of the bounding box and detour
     Returns: list of intermediate waypoints
     """
-    # Project all coordinates to x,y plan
-    ll_to_m_proj = pyproj.Proj(proj='utm', zone=10, ellps='WGS84')
-    xy_start = Point(ll_to_m_proj(start.longitude, start.latitude))
-    xy_rejoin = Point(ll_to_m_proj(rejoin.longitude, rejoin.latitude))
-    xy_bbox = []
-    for waypoint in bounding_box:
-        xy_bbox.append(ll_to_m_proj(waypoint.longitude, waypoint.latitude))
+    return get_obstacle_detour_route(start, rejoin, [bounding_box], create_plot)
 
-    # Set up Polygon bounding box using convex hull of points
-    original_bbox = Polygon(xy_bbox)
-    bb_poly = original_bbox.convex_hull
 
-    # Add buffer distance with tolerance to polygon
-    bb_poly_buff_no_tol = bb_poly.buffer(BUFFER_DISTANCE, join_style=2)
-    bb_poly_buffer = bb_poly_buff_no_tol.buffer(1, join_style=2)
+def get_obstacle_detour_route(start: Waypoint, rejoin: Waypoint,
+                              obstacles: List[List[Waypoint]],
+                              create_plot=False,
+                              turn_radius: float = DETOUR_TURN_RADIUS
+                              ) -> List[Waypoint]:
+    """
+    Returns a list of intermediate waypoints to visit to reach rejoin waypoint
+    and circumvent every obstacle, such as no-fly areas and field boundaries.
+    Each obstacle is avoided by the convex hull of its waypoints
+    Args:
+        start: starting waypoint
+        rejoin: ending waypoint
+        obstacles: list of obstacles, each a list of waypoints to avoid
+        create_plot: whether to plot a graph of the obstacles and detour
+        turn_radius: radius in metres of arcs fitted at turns, 0 for none
+    Returns: list of intermediate waypoints
+    """
+    # Project all coordinates to x,y plan in the UTM zone of the waypoints
+    all_waypoints = [start, rejoin] + [wp for obstacle in obstacles
+                                       for wp in obstacle]
+    projection = get_projection(all_waypoints)
+    xy_coords = projection.waypoints_to_xy(all_waypoints)
+    xy_start = Point(xy_coords[0])
+    xy_rejoin = Point(xy_coords[1])
+
+    # Set up Polygon for each obstacle using convex hull of points,
+    # with buffer distance and tolerance added
+    buffered_obstacles = []
+    coord_i = 2
+    for obstacle in obstacles:
+        xy_obstacle = [tuple(coord) for coord in
+                       xy_coords[coord_i:coord_i + len(obstacle)]]
+        coord_i += len(obstacle)
+        hull, buffer_no_tol, buffer = buffer_obstacle(xy_obstacle)
+        buffered_obstacles.append((buffer, buffer_no_tol))
+
+        if create_plot:
+            plt.plot(*Polygon(xy_obstacle).exterior.xy, "xr-")
+            plt.plot(*hull.exterior.xy, "purple")  # Convex hull of obstacle
+            plt.plot(*buffer_no_tol.exterior.xy, "black")
+            plt.plot(*buffer.exterior.xy, "blue")
 
     if create_plot:
-        plt.plot(*original_bbox.exterior.xy, "xr-")
         plt.plot(*xy_start.xy, "og-")
         plt.plot(*xy_rejoin.xy, ">m-")
 
-        plt.plot(*bb_poly.exterior.xy, "purple")  # Convex hull of original bbox
-        plt.plot(*bb_poly_buff_no_tol.exterior.xy, "black")
-        plt.plot(*bb_poly_buffer.exterior.xy, "blue")
-
     # Create a LineString from the start and rejoin coordinates
     route = LineString([xy_start, xy_rejoin])
+    outer_tree = STRtree([buffer for buffer, _ in buffered_obstacles])
+
+    # Check if the route intersects with any buffer polygon
+    if any(buffered_obstacles[i][0].intersects(route)
+           for i in outer_tree.query(route)):
+        # Create a visibility graph with the starting, rejoin, obstacle nodes
+        xy_source = (xy_start.x, xy_start.y)
+        xy_target = (xy_rejoin.x, xy_rejoin.y)
+        graph = build_visibility_graph([xy_source, xy_target],
+                                       buffered_obstacles)
 
-    # Check if the route intersects with the buffer polygon
-    if route.intersects(bb_poly_buffer):
-        # Create a graph with the starting, rejoin, bounding box nodes
-        graph = nx.Graph()
-        nodes = list(bb_poly_buffer.exterior.coords)
-        nodes.append((xy_start.x, xy_start.y))
-        nodes.append((xy_rejoin.x, xy_rejoin.y))
-        for node in nodes:
-            graph.add_node(node)
-
-        # Add edges between nodes that do not intersect the buffer polygon
-        for u in graph.nodes:
-            for v in graph.nodes:
-                edge = LineString([u, v])
-                if edge.length > 0 and not edge.intersects(bb_poly_buff_no_tol):
-                    graph.add_edge(u, v, weight=edge.length)
-
-        # Find the shortest path between the start and rejoin nodes using Graph
-        detour_xy_path = []
+        # Find the shortest path between the start and rejoin nodes using A*
         try:
-            detour_xy_path = nx.shortest_path(graph,
-                                              source=(xy_start.x, xy_start.y),
-                                              target=(xy_rejoin.x, xy_rejoin.y),
-                                              weight='weight')
+            detour_xy_path = nx.astar_path(graph, source=xy_source,
+                                           target=xy_target,
+                                           heuristic=math.dist,
+                                           weight='weight')
             print("Detour Path Found")
 
-            if create_plot:
-                x_coords = [coord[0] for coord in detour_xy_path]
-                y_coords = [coord[1] for coord in detour_xy_path]
-                plt.plot(x_coords, y_coords, "xg-")
-
-            # Filter out starting and rejoin coordinate
-            detour_xy_path = detour_xy_path[1:-1]
-        except Exception as e:
-            # If no valid path is found, return None
+            # Drop redundant vertices, fit turn arcs if set
+            inner_tree = STRtree([inner for _, inner in buffered_obstacles])
+            detour_xy_path = smooth_path(
+                detour_xy_path, inner_tree,
+                [prep(inner) for _, inner in buffered_obstacles],
+                turn_radius)
+        except (nx.NetworkXNoPath, nx.NodeNotFound, GEOSException) as e:
+            # If no valid path is found, return no intermediate waypoints
             print("NO DETOUR FOUND")
             print(e)
+            return []
+
+        if detour_xy_path is None:
+            print(f"NO DETOUR FOUND: turns are tighter than the "
+                  f"{turn_radius}m turn radius")
+            return []
+
+        if create_plot:
+            x_coords = [coord[0] for coord in detour_xy_path]
+            y_coords = [coord[1] for coord in detour_xy_path]
+            plt.plot(x_coords, y_coords, "xg-")
+
+        # Filter out starting and rejoin coordinate
+        detour_xy_path = detour_xy_path[1:-1]
     else:
-        # Return the Rejoin point if no intersection with bounding box
+        # Return the Rejoin point if no intersection with any obstacle
         print("No Detour Needed")
         if create_plot:
             plt.savefig("detourRoute.jpg")
@@ -100,21 +472,272 @@ def get_detour_route(start: Waypoint, rejoin: Waypoint,
         plt.show()
 
     # Convert detour routes back to longitude, latitude
-    xy_zone = pyproj.CRS(proj='utm', zone=10, ellps='WGS84')
-    ll_proj = pyproj.CRS('epsg:4326')
-    xy_to_ll_transformer = pyproj.Transformer.from_crs(xy_zone, ll_proj)
+    detour_lons, detour_lats = projection.to_lon_lat(
+        [coordinate[0] for coordinate in detour_xy_path],
+        [coordinate[1] for coordinate in detour_xy_path])
 
     detour_route = []
     inter_wp_num = 1
-    for coordinate in detour_xy_path:
-        detour_lat, detour_lon = xy_to_ll_transformer.transform(coordinate[0],
-                                                                coordinate[1])
+    for detour_lon, detour_lat in zip(detour_lons, detour_lats):
         detour_route.append(
             Waypoint(name=f"InterNode {inter_wp_num}",
                      number=(50 + inter_wp_num),
-                     longitude=detour_lon,
-                     latitude=detour_lat))
+                     longitude=float(detour_lon),
+                     latitude=float(detour_lat)))
         inter_wp_num += 1
 
     print("Detour Intermediate Waypoints: ", detour_route)
     return detour_route
+
+
+class IncrementalDetourPlanner:
+    """
+    Detour planner for a moving start position. The visibility graph of the
+    obstacles and rejoin waypoint, and every node's shortest path to the
+    rejoin waypoint, are built once. Each update only connects the new start
+    position to the nodes it can see
+    """
+
+    def __init__(self, rejoin: Waypoint, obstacles: List[List[Waypoint]],
+                 turn_radius: float = DETOUR_TURN_RADIUS):
+        """
+        Args:
+            rejoin: ending waypoint
+            obstacles: list of obstacles, each a list of waypoints to avoid
+            turn_radius: radius in metres of arcs fitted at turns, 0 for none
+        """
+        self.rejoin = rejoin
+        self.turn_radius = turn_radius
+        self.projection = get_projection(
+            [rejoin] + [wp for obstacle in obstacles for wp in obstacle])
+        self.xy_rejoin = tuple(self.projection.waypoints_to_xy([rejoin])[0])
+
+        buffered_obstacles = []
+        for obstacle in obstacles:
+            _, buffer_no_tol, buffer = buffer_obstacle(
+                [tuple(coord) for coord in
+                 self.projection.waypoints_to_xy(obstacle)])
+            buffered_obstacles.append((buffer, buffer_no_tol))
+        self.inner_tree = STRtree([inner for _, inner in buffered_obstacles])
+        self.outer_tree = STRtree([outer for outer, _ in buffered_obstacles])
+        self.prepared_inners = [prep(inner) for _, inner in buffered_obstacles]
+        self.prepared_outers = [prep(outer) for outer, _ in buffered_obstacles]
+
+        graph = build_visibility_graph([self.xy_rejoin], buffered_obstacles)
+        # Shortest distance and path from every node to the rejoin waypoint
+        self.rejoin_distances, rejoin_paths = nx.single_source_dijkstra(
+            graph, self.xy_rejoin, weight='weight')
+        self.rejoin_paths = {node: path[::-1]
+                             for node, path in rejoin_paths.items()}
+
+        # Obstacle vertices that can reach the rejoin waypoint, with their
+        # neighbouring vertices for tangency checks
+        self.vertices = []
+        for outer, _ in buffered_obstacles:
+            vertices = polygon_vertices(outer)
+            for i, vertex in enumerate(vertices):
+                if vertex in self.rejoin_distances:
+                    self.vertices.append((vertex, vertices[i - 1],
+                                          vertices[(i + 1) % len(vertices)]))
+
+        # Longitude, latitude of every node, converted once
+        nodes = list(self.rejoin_distances)
+        lons, lats = self.projection.to_lon_lat([node[0] for node in nodes],
+                                                [node[1] for node in nodes])
+        self.node_coords = {node: (float(lon), float(lat))
+                            for node, lon, lat in zip(nodes, lons, lats)}
+
+    def get_detour_route(self, start: Waypoint) -> Optional[List[Waypoint]]:
+        """
+        Returns a list of intermediate waypoints to visit to reach the rejoin
+        waypoint from a new start position, same as get_obstacle_detour_route
+        Args:
+            start: current position
+        Returns: list of intermediate waypoints, [rejoin] if no detour is
+            needed, empty if the direct path clears the obstacles and None if
+            no detour is found
+        """
+        xs, ys = self.projection.to_xy([start.longitude], [start.latitude])
+        xy_start = (float(xs[0]), float(ys[0]))
+        if not blocked(LineString([xy_start, self.xy_rejoin]),
+                       self.outer_tree, self.prepared_outers):
+            return [self.rejoin]
+
+        # Within the outer polygon's tolerance the direct line may still be
+        # clear of the inner polygon, as an edge in the full visibility graph
+        if xy_start != self.xy_rejoin and not blocked(
+                LineString([xy_start, self.xy_rejoin]), self.inner_tree,
+                self.prepared_inners):
+            return []
+
+        # Connect the start to visible tangent vertices, each already knowing
+        # its shortest distance to the rejoin waypoint
+        in_tolerance = blocked(Point(xy_start), self.outer_tree,
+                               self.prepared_outers)
+        best_vertex = None
+        best_distance = math.inf
+        for vertex, prev_vertex, next_vertex in self.vertices:
+            distance = math.dist(xy_start, vertex) + \
+                self.rejoin_distances[vertex]
+            if distance >= best_distance:
+                continue
+            if not in_tolerance and \
+                    not is_tangent(vertex, prev_vertex, next_vertex, xy_start):
+                continue
+            if blocked(LineString([xy_start, vertex]), self.inner_tree,
+                       self.prepared_inners):
+                continue
+            best_vertex = vertex
+            best_distance = distance
+
+        if best_vertex is None:
+            print("NO DETOUR FOUND")
+            return None
+
+        xy_path = smooth_path([xy_start] + self.rejoin_paths[best_vertex],
+                              self.inner_tree, self.prepared_inners,
+                              self.turn_radius)
+        if xy_path is None:
+            print(f"NO DETOUR FOUND: turns are tighter than the "
+                  f"{self.turn_radius}m turn radius")
+            return None
+        # Intermediate points only, arc points are converted in one call
+        xy_path = xy_path[1:-1]
+        new_points = [point for point in xy_path
+                      if point not in self.node_coords]
+        if new_points:
+            lons, lats = self.projection.to_lon_lat(
+                [point[0] for point in new_points],
+                [point[1] for point in new_points])
+            new_coords = {point: (float(lon), float(lat))
+                          for point, lon, lat in zip(new_points, lons, lats)}
+        else:
+            new_coords = {}
+
+        detour_route = []
+        for inter_wp_num, point in enumerate(xy_path, start=1):
+            longitude, latitude = self.node_coords.get(point) or \
+                new_coords[point]
+            detour_route.append(
+                Waypoint(name=f"InterNode {inter_wp_num}",
+                         number=(50 + inter_wp_num),
+                         longitude=longitude,
+                         latitude=latitude))
+        return detour_route
+
+
+class DetourCache:
+    """
+    LRU cache of detour routes keyed by start position rounded to
+    DETOUR_CACHE_PRECISION decimal places, rejoin waypoint and obstacle
+    coordinates, so repeated or near-identical requests skip planning
+    """
+
+    def __init__(self, max_size: int = DETOUR_CACHE_SIZE,
+                 precision: int = DETOUR_CACHE_PRECISION):
+        self.max_size = max_size
+        self.precision = precision
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, start: Waypoint, rejoin: Waypoint,
+            obstacles: List[List[Waypoint]]) -> tuple:
+        """
+        Returns the cache key of a detour request
+        """
+        return (round(start.longitude, self.precision),
+                round(start.latitude, self.precision),
+                rejoin.number, rejoin.longitude, rejoin.latitude,
+                tuple(tuple((wp.longitude, wp.latitude) for wp in obstacle)
+                      for obstacle in obstacles))
+
+    def get_detour_route(self, start: Waypoint, rejoin: Waypoint,
+                         obstacles: List[List[Waypoint]]) -> List[Waypoint]:
+        """
+        Returns a cached detour route, planning and caching it when missing
+        Args:
+            start: starting waypoint
+            rejoin: ending waypoint
+            obstacles: list of obstacles, each a list of waypoints to avoid
+        Returns: list of intermediate waypoints
+        """
+        key = self.key(start, rejoin, obstacles)
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return list(self.entries[key])
+            self.misses += 1
+
+        detour_route = get_obstacle_detour_route(start, rejoin, obstacles)
+        with self.lock:
+            self.entries[key] = detour_route
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return list(detour_route)
+
+    def clear(self):
+        """
+        Removes every cached detour, e.g. when obstacles move
+        """
+        with self.lock:
+            self.entries.clear()
+
+
+def plot_detour_route(start: Waypoint, rejoin: Waypoint,
+                      obstacles: List[List[Waypoint]],
+                      detour_route: List[Waypoint],
+                      filename: str = "detourRoute.jpg"):
+    """
+    Saves a plot of the obstacles and detour route, drawn on its own Figure so
+    it can run outside the main thread
+    Args:
+        start: starting waypoint
+        rejoin: ending waypoint
+        obstacles: list of obstacles, each a list of waypoints to avoid
+        detour_route: intermediate waypoints returned for the request
+        filename: image file to save
+    """
+    all_waypoints = [start, rejoin] + [wp for obstacle in obstacles
+                                       for wp in obstacle]
+    projection = get_projection(all_waypoints)
+    figure = Figure()
+    axes = figure.subplots()
+
+    for obstacle in obstacles:
+        xy_obstacle = [tuple(coord) for coord in
+                       projection.waypoints_to_xy(obstacle)]
+        hull, buffer_no_tol, buffer = buffer_obstacle(xy_obstacle)
+        axes.plot(*Polygon(xy_obstacle).exterior.xy, "xr-")
+        axes.plot(*hull.exterior.xy, "purple")  # Convex hull of obstacle
+        axes.plot(*buffer_no_tol.exterior.xy, "black")
+        axes.plot(*buffer.exterior.xy, "blue")
+
+    xy_path = projection.waypoints_to_xy([start] + detour_route + [rejoin])
+    axes.plot(*xy_path[0], "og-")
+    axes.plot(*xy_path[-1], ">m-")
+    axes.plot(xy_path[:, 0], xy_path[:, 1], "xg-")
+    figure.savefig(filename)
+
+
+class DetourPlotRenderer:
+    """
+    Renders detour plots on a background thread, keeping matplotlib off the
+    detour request path
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def submit(self, start: Waypoint, rejoin: Waypoint,
+               obstacles: List[List[Waypoint]],
+               detour_route: List[Waypoint],
+               filename: str = "detourRoute.jpg"):
+        """
+        Queues a plot of a detour route to be saved to filename
+        """
+        return self.executor.submit(plot_detour_route, start, rejoin,
+                                    obstacles, detour_route, filename)
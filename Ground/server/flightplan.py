@@ -1,5 +1,6 @@
+from collections import deque
+
 from waypoint import WAYPOINT_LST, Waypoint
-from utils import calculate_distance
 
 
 class FlightPlan:
@@ -15,19 +16,17 @@ class FlightPlan:
     # User configured RTL location
     origin = WAYPOINT_LST.get_wp_by_name("Alpha")
 
-    # Static Memory Storage start: {end : {value}}
-    dist_store = {}
-
-    def __init__(self, reward: float = 0.0, distance: float = 0.0, waypoints: list = []) -> None:
+    def __init__(self, reward: float = 0.0, distance: float = 0.0, waypoints: list = None) -> None:
         """Initialize FlightPlan object
 
         param reward: reward earned from initial route in flight plan (float)
         param distance: distance travelled completing initial route in flight plan (float)
-        param waypoints: list of waypoints traveled (list)
+        param waypoints: list of waypoints traveled, a deque while the plan is built from
+        both ends (list)
         """
         self.reward_collected = reward
         self.distance_travelled = distance
-        self.waypoints = waypoints
+        self.waypoints = deque() if waypoints is None else waypoints
         # time accumulated completing the routes
         self.time_accumulated = self.distance_travelled / self.drone_speed
         # ratio based on distance time and reward earned
@@ -47,7 +46,7 @@ class FlightPlan:
         param start_wp: starting waypoint to start route (Waypoint)
         param end_wp: ending waypoint to complete route (Waypoint)
         """
-        self.waypoints = self.waypoints + [start_wp, end_wp]
+        self.waypoints.extend((start_wp, end_wp))
 
     def add_route_tail(self, start_wp: Waypoint, end_wp: Waypoint, reward: float = None, without_start: bool = False) \
             -> None:
@@ -65,9 +64,9 @@ class FlightPlan:
         self.update_time(dist / self.drone_speed)
 
         if without_start:
-            self.waypoints = self.waypoints + [end_wp]
+            self.waypoints.append(end_wp)
         else:
-            self.waypoints = self.waypoints + [start_wp, end_wp]
+            self.waypoints.extend((start_wp, end_wp))
 
         if reward:
             self.reward_collected += reward
@@ -82,7 +81,7 @@ class FlightPlan:
         """
         self.distance_travelled += distance
         self.update_time(distance / self.drone_speed)
-        self.waypoints = [waypoint] + self.waypoints
+        self.waypoints.appendleft(waypoint)
         self.reward_collected += reward
 
         if self.origin_head:
@@ -125,7 +124,7 @@ class FlightPlan:
 
     def battery_swap(self) -> None:
         """Add a stop at origin for a battery swap, updating distance from origin to head waypoint"""
-        dist_to_origin = calculate_distance(self.waypoints[0], FlightPlan.origin)
+        dist_to_origin = FlightPlan.calculate_distance(self.waypoints[0], FlightPlan.origin)
         self.add_route_head(0.0, dist_to_origin, FlightPlan.origin)
         self.update_time(FlightPlan.time_to_swap_battery)
         self.battery_swap_indexes.append(len(self.waypoints) - 1)
@@ -189,22 +188,11 @@ class FlightPlan:
     
     @staticmethod
     def calculate_distance(start_wp: Waypoint, end_wp: Waypoint) -> float:
-        """ Wrappers around calculate distance function to check if a stored data 
-        value exist before calling function
+        """ Wrapper around the waypoint distance matrix, computed once for all
+        known waypoints
 
         :param start_wp: Waypoint Object
         :param end_wp: Waypoint Object
         :return: Calculated distance between start and end
         """
-        if start_wp.name in FlightPlan.dist_store:
-            if end_wp.name in FlightPlan.dist_store[start_wp.name]:
-                return FlightPlan.dist_store[start_wp.name][end_wp.name]
-        
-        elif end_wp.name in FlightPlan.dist_store:
-            if start_wp.name in FlightPlan.dist_store[end_wp.name]:
-                return FlightPlan.dist_store[end_wp.name][start_wp.name]
-            
-        computed_dist = calculate_distance(start_wp, end_wp)
-        FlightPlan.dist_store[start_wp.name] = {end_wp.name : computed_dist}
-
-        return computed_dist
+        return WAYPOINT_LST.get_distance(start_wp, end_wp)
@@ -80,6 +80,24 @@ class GroundController:
         else:
             return error_dict("Unable to Send Emergency Command. See Logs")
 
+    def commit_task_2_plan(self):
+        """Stops background Task 2 planning, saving and emailing the best plan
+        Returns: API Response
+        """
+        if self.command_manager.commit_task_2_plan():
+            return success_dict("Task 2 Plan Committed")
+        else:
+            return error_dict("No Task 2 Plan to Commit")
+
+    def cancel_task_2_planning(self):
+        """Stops background Task 2 planning, discarding its plan
+        Returns: API Response
+        """
+        if self.command_manager.cancel_task_2_planning():
+            return success_dict("Task 2 Planning Cancelled")
+        else:
+            return error_dict("No Task 2 Planning in Progress")
+
     def process_telemetry(self, json_response: dict):
         """Processes telemetry information by updating React and verifying
         drone not nearing boundary
@@ -94,6 +112,9 @@ class GroundController:
         # TODO: Handle boundary violation (Not needed for current tasks)
         self.boundary_handler.verify_boundaries()
 
+        # Keep an active detour up to date with the drone's position
+        self.command_manager.refresh_detour()
+
         return success_dict("Telemetry Received")
 
     def get_latest_telemetry(self) -> dict:
@@ -0,0 +1,241 @@
+# Local search improvement of Task 2 route orders
+# Moves are evaluated against cached per position times, re-simulating only
+# the battery segment a move touches and shifting the rest of the plan
+import time
+from collections import Counter
+
+from flightplan import FlightPlan
+from planCostModel import PlanCostModel
+
+# Tolerance when comparing plan rewards and times
+EPSILON = 1e-6
+# Longest block of consecutive routes moved by or-opt
+OR_OPT_MAX_BLOCK = 3
+
+
+class LocalSearch:
+    """First improvement local search over a feasible route order.
+
+    The plan is a route order with a battery swap flag per position (swap
+    before completing the route at that position). Every move replaces a
+    slice of the plan; the plan before the slice is read from the cache and
+    the plan after it only needs simulating up to its next battery swap,
+    from where on times are shifted by a constant offset.
+    """
+
+    def __init__(self, cost_model: PlanCostModel, order: list[int], battery_swaps: list[int]) -> None:
+        """Initialize LocalSearch object, repairing the plan with PlanCostModel.schedule if it is infeasible
+
+        param cost_model: time tables for the routes to plan (PlanCostModel)
+        param order: route indexes in completion order ([int])
+        param battery_swaps: positions in order preceded by a battery swap ([int])
+        """
+        self.cost_model = cost_model
+        self.repaired = not cost_model.evaluate(order, battery_swaps)[0]
+        if self.repaired:
+            order, battery_swaps, _, _ = cost_model.schedule(order)
+        swap_positions = set(battery_swaps)
+        self.order = list(order)
+        self.swaps = [position in swap_positions and position > 0 for position in range(len(order))]
+        self.moves = Counter()
+        self.update()
+
+    def update(self) -> None:
+        """Simulate the current plan, caching times after every position"""
+        cost_model = self.cost_model
+        self.totals = []
+        self.batteries = []
+        state = cost_model.origin_state
+        total_time, battery_time = cost_model.initial_times()
+        for route_index, swap in zip(self.order, self.swaps):
+            _, total_time, battery_time = cost_model.step(state, total_time, battery_time, route_index, swap)
+            self.totals.append(total_time)
+            self.batteries.append(battery_time)
+            state = route_index
+        self.total_time = total_time + cost_model.finish[state]
+        self.reward = sum(cost_model.rewards[route_index] for route_index in self.order)
+
+        # slack[k]: how much later every position from k on can finish within max_time_in_air
+        self.slack = [0.0] * len(self.order)
+        min_slack = float("inf")
+        for position in range(len(self.order) - 1, -1, -1):
+            min_slack = min(min_slack, FlightPlan.max_time_in_air - self.totals[position]
+                            - cost_model.finish[self.order[position]])
+            self.slack[position] = min_slack
+
+        planned = set(self.order)
+        self.unplanned = [j for j in range(cost_model.num_routes) if j not in planned]
+
+    def battery_swaps(self) -> list[int]:
+        """Positions in the current order preceded by a battery swap
+
+        :return: positions ([int])
+        """
+        return [position for position, swap in enumerate(self.swaps) if swap]
+
+    def evaluate_move(self, start: int, end: int, routes: list[int], swaps: list[bool]) -> tuple[bool, float]:
+        """Evaluate replacing positions start to end (exclusive) of the plan
+
+        param start: first position replaced (int)
+        param end: position after the last one replaced (int)
+        param routes: route indexes replacing the slice ([int])
+        param swaps: battery swap flags replacing the slice ([bool])
+        :return: 1. True if the new plan is feasible 2. total mission time of the new plan (float)
+        """
+        cost_model = self.cost_model
+        origin_state = cost_model.origin_state
+        if start == 0:
+            state = origin_state
+            total_time, battery_time = cost_model.initial_times()
+        else:
+            state = self.order[start - 1]
+            total_time, battery_time = self.totals[start - 1], self.batteries[start - 1]
+
+        for route_index, swap in zip(routes, swaps):
+            feasible, total_time, battery_time = cost_model.step(state, total_time, battery_time, route_index,
+                                                                 swap and state != origin_state)
+            if not feasible:
+                return False, 0.0
+            state = route_index
+
+        for position in range(end, len(self.order)):
+            if position > end and self.swaps[position]:
+                # Battery is replaced from here on, the rest of the plan is only shifted in time
+                offset = total_time - self.totals[position - 1]
+                return offset <= self.slack[position], self.total_time + offset
+            route_index = self.order[position]
+            feasible, total_time, battery_time = cost_model.step(state, total_time, battery_time, route_index,
+                                                                 self.swaps[position] and state != origin_state)
+            if not feasible:
+                return False, 0.0
+            state = route_index
+        return True, total_time + cost_model.finish[state]
+
+    def try_move(self, name: str, start: int, end: int, routes: list[int], swaps: list[bool]) -> bool:
+        """Apply a move if it gives a better plan, collecting more reward or equal reward in less time
+
+        param name: move type, counted in the report (str)
+        param start: first position replaced (int)
+        param end: position after the last one replaced (int)
+        param routes: route indexes replacing the slice ([int])
+        param swaps: battery swap flags replacing the slice ([bool])
+        :return: True if the move was applied (bool)
+        """
+        reward = self.reward + sum(self.cost_model.rewards[j] for j in routes) \
+            - sum(self.cost_model.rewards[j] for j in self.order[start:end])
+        if reward < self.reward - EPSILON:
+            return False
+        feasible, total_time = self.evaluate_move(start, end, routes, swaps)
+        if not feasible:
+            return False
+        if reward <= self.reward + EPSILON and total_time >= self.total_time - EPSILON:
+            return False
+
+        self.order[start:end] = routes
+        self.swaps[start:end] = swaps
+        self.moves[name] += 1
+        self.update()
+        return True
+
+    def insert_routes(self) -> bool:
+        """Insert a route not yet planned anywhere in the plan, with or without a battery swap before it"""
+        for route_index in self.unplanned:
+            for position in range(len(self.order) + 1):
+                if self.try_move("insert", position, position, [route_index], [False]):
+                    return True
+                if position > 0 and self.try_move("insert", position, position, [route_index], [True]):
+                    return True
+        return False
+
+    def replace_routes(self) -> bool:
+        """Replace a planned route with a route not yet planned"""
+        for route_index in self.unplanned:
+            for position in range(len(self.order)):
+                if self.try_move("replace", position, position + 1, [route_index], self.swaps[position:position + 1]):
+                    return True
+        return False
+
+    def relocate_blocks(self, deadline: float) -> bool:
+        """Move a block of up to OR_OPT_MAX_BLOCK consecutive routes to another position, single routes
+        are counted as relocate moves and longer blocks as or-opt moves. Battery swaps stay at their positions
+        """
+        num_positions = len(self.order)
+        for length in range(1, min(OR_OPT_MAX_BLOCK, num_positions) + 1):
+            name = "relocate" if length == 1 else "or-opt"
+            for i in range(num_positions - length + 1):
+                if time.perf_counter() > deadline:
+                    return False
+                block = self.order[i:i + length]
+                for j in range(num_positions - length + 1):
+                    if j < i:
+                        # Block moves earlier
+                        routes = block + self.order[j:i]
+                        if self.try_move(name, j, i + length, routes, self.swaps[j:i + length]):
+                            return True
+                    elif j > i:
+                        # Block moves later
+                        routes = self.order[i + length:j + length] + block
+                        if self.try_move(name, i, j + length, routes, self.swaps[i:j + length]):
+                            return True
+        return False
+
+    def exchange_routes(self, deadline: float) -> bool:
+        """Swap two routes, or reverse the routes between them (2-opt). Battery swaps stay at their positions"""
+        num_positions = len(self.order)
+        for i in range(num_positions):
+            if time.perf_counter() > deadline:
+                return False
+            for j in range(i + 1, num_positions):
+                routes = [self.order[j]] + self.order[i + 1:j] + [self.order[i]]
+                if self.try_move("swap", i, j + 1, routes, self.swaps[i:j + 1]):
+                    return True
+                if j - i > 1 and self.try_move("2-opt", i, j + 1, self.order[i:j + 1][::-1], self.swaps[i:j + 1]):
+                    return True
+        return False
+
+    def reposition_battery_swaps(self) -> bool:
+        """Add or remove a battery swap, or move one to the neighbouring position"""
+        for position in range(1, len(self.order)):
+            route_index = self.order[position]
+            if self.try_move("battery", position, position + 1, [route_index], [not self.swaps[position]]):
+                return True
+            if not self.swaps[position]:
+                continue
+            if position > 1 and not self.swaps[position - 1] and \
+                    self.try_move("battery", position - 1, position + 1, self.order[position - 1:position + 1],
+                                  [True, False]):
+                return True
+            if position + 1 < len(self.order) and not self.swaps[position + 1] and \
+                    self.try_move("battery", position, position + 2, self.order[position:position + 2],
+                                  [False, True]):
+                return True
+        return False
+
+    def run(self, time_limit: float) -> dict:
+        """Apply improving moves until none is left or time_limit runs out
+
+        param time_limit: max seconds to search (float)
+        :return: report with reward and time before and after, moves applied by type,
+        elapsed seconds and whether the search converged (dict)
+        """
+        start_time = time.perf_counter()
+        deadline = start_time + time_limit
+        reward_before, time_before = self.reward, self.total_time
+
+        converged = False
+        while time.perf_counter() < deadline:
+            if not (self.insert_routes() or self.replace_routes() or self.relocate_blocks(deadline)
+                    or self.exchange_routes(deadline) or self.reposition_battery_swaps()):
+                converged = time.perf_counter() < deadline
+                break
+
+        return {
+            "reward_before": reward_before,
+            "reward_after": self.reward,
+            "time_before": time_before,
+            "time_after": self.total_time,
+            "moves": dict(self.moves),
+            "elapsed": time.perf_counter() - start_time,
+            "converged": converged,
+            "repaired": self.repaired,
+        }
@@ -0,0 +1,40 @@
+# Randomized multi-start search for Task 2 plans
+# Each run is seeded separately so runs can be spread over a process pool
+import time
+from random import Random
+
+from planCostModel import PlanCostModel, is_better_plan
+from localSearch import LocalSearch
+
+# Max fraction route ratios are perturbed by when building randomized starts
+GREEDY_NOISE = 0.3
+
+
+def multi_start_search(cost_model: PlanCostModel, seed: int, deadline: float) -> tuple[list[int], list[int]]:
+    """Repeat randomized greedy construction followed by local search until the deadline,
+    keeping the best plan. Runs in a worker process
+
+    param cost_model: time tables for the routes to plan, built once by the caller (PlanCostModel)
+    param seed: seed for this run's random generator (int)
+    param deadline: time.time() after which the search stops (float)
+    :return: route indexes in completion order, positions in order preceded by a battery swap
+    """
+    rng = Random(seed)
+    best_order, best_swaps = [], []
+    best_reward, best_time = 0.0, 0.0
+
+    start_num = 0
+    while start_num == 0 or time.time() < deadline:
+        # First start of the first worker is the unperturbed greedy plan
+        noise = 0.0 if seed == 0 and start_num == 0 else GREEDY_NOISE
+        order, battery_swaps = cost_model.greedy_order(rng, noise)
+        local_search = LocalSearch(cost_model, order, battery_swaps)
+        local_search.run(max(deadline - time.time(), 0.0))
+
+        reward, total_time = local_search.reward, local_search.total_time
+        if not best_order or is_better_plan(reward, total_time, best_reward, best_time):
+            best_order, best_swaps = local_search.order, local_search.battery_swaps()
+            best_reward, best_time = reward, total_time
+        start_num += 1
+
+    return best_order, best_swaps
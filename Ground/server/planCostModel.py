@@ -0,0 +1,385 @@
+# Cost model for Task 2 route orderings
+# Precomputes the time of every transition between routes so that search
+# engines can evaluate route orders with table lookups only
+from random import Random
+
+from route import Route
+from flightplan import FlightPlan
+
+# Tolerance when comparing plan rewards
+REWARD_EPSILON = 1e-9
+
+
+def is_better_plan(reward: float, total_time: float, best_reward: float, best_time: float) -> bool:
+    """Compare plans by reward collected, then by mission time
+
+    param reward: reward collected by the plan (float)
+    param total_time: mission time of the plan (float)
+    param best_reward: reward collected by the plan to beat (float)
+    param best_time: mission time of the plan to beat (float)
+    :return: True if the plan collects more reward, or as much reward in less time (bool)
+    """
+    return reward > best_reward + REWARD_EPSILON or (reward > best_reward - REWARD_EPSILON and total_time < best_time)
+
+
+class PlanCostModel:
+    """Time tables for completing a set of routes in any order.
+
+    States are indexed by route index (drone has just dropped off at the end
+    of that route) with one extra state, origin_state, for the drone sitting
+    on the ground at origin before the mission starts. Times follow the
+    command sequence produced by format_for_execute_command:
+        START / END stop = land + load + takeoff
+        START-I0 = load + takeoff
+        RTL-BSWP = land + battery swap + takeoff
+        RTL-CR = land + load + battery swap + takeoff
+    """
+
+    def __init__(self, routes: list[Route]) -> None:
+        """Initialize PlanCostModel object
+
+        param routes: routes available to complete ([Route])
+        """
+        self.routes = routes
+        self.num_routes = len(routes)
+        self.origin_state = self.num_routes
+        self.rewards = [route.reward for route in routes]
+
+        origin = FlightPlan.origin
+        speed = FlightPlan.drone_speed
+        stop = FlightPlan.time_to_land + FlightPlan.time_to_load + FlightPlan.time_to_takeoff
+
+        # Position of the drone for each state
+        positions = [route.end_waypoint for route in routes] + [origin]
+        self.ends_at_origin = [position == origin for position in positions]
+
+        # leg[i][j]: time from state i to pickup and drop off route j
+        self.leg = []
+        for i, position in enumerate(positions):
+            row = []
+            for route in routes:
+                time = route.distance / speed + stop
+                if position != route.start_waypoint:
+                    time += FlightPlan.calculate_distance(position, route.start_waypoint) / speed + stop
+                elif i == self.origin_state:
+                    # Loading on the ground at origin before takeoff
+                    time += FlightPlan.time_to_load
+                row.append(time)
+            self.leg.append(row)
+
+        # swap_leg[i][j]: time from state i to swap battery at origin, then complete route j
+        # swap_state[i]: state the next leg is measured from after the swap
+        self.swap_state = []
+        self.swap_leg = []
+        for i in range(self.num_routes):
+            if self.ends_at_origin[i]:
+                # Already landed at origin, only the swap itself is added
+                swap_time = FlightPlan.time_to_swap_battery
+                self.swap_state.append(i)
+            else:
+                swap_time = FlightPlan.calculate_distance(positions[i], origin) / speed \
+                    + FlightPlan.time_to_land + FlightPlan.time_to_swap_battery + FlightPlan.time_to_takeoff
+                self.swap_state.append(self.origin_state)
+            self.swap_leg.append([swap_time + leg for leg in self.leg[self.swap_state[i]]])
+
+        # finish[i]: time from state i to the final landing at origin
+        # return_time[i]: battery time needed to get back to origin from state i
+        self.finish = []
+        self.return_time = []
+        for i, position in enumerate(positions):
+            if i == self.origin_state:
+                self.finish.append(0.0)
+                self.return_time.append(0.0)
+            elif self.ends_at_origin[i]:
+                # Final takeoff is dropped from the command sequence
+                self.finish.append(-FlightPlan.time_to_takeoff)
+                self.return_time.append(0.0)
+            else:
+                time = FlightPlan.calculate_distance(position, origin) / speed + FlightPlan.time_to_land
+                self.finish.append(time)
+                self.return_time.append(time)
+
+        # For each route, the states it can be started from sorted by cheapest leg first
+        self.entry_order = [sorted((self.leg[i][j], i) for i in range(self.num_routes + 1) if i != j)
+                            for j in range(self.num_routes)]
+
+    def step(self, state: int, total_time: float, battery_time: float, next_route: int,
+             swap: bool) -> tuple[bool, float, float]:
+        """Advance the drone from state to the end of next_route, optionally swapping the battery first
+
+        param state: current state index (int)
+        param total_time: mission time accumulated so far (float)
+        param battery_time: time accumulated on the current battery (float)
+        param next_route: index of the route to complete (int)
+        param swap: signal to return to origin for a battery swap before the route (bool)
+        :return: 1. True if the route fits within battery and mission limits. 2. updated total time (float)
+        3. updated battery time (float)
+        """
+        if swap:
+            total_time += self.swap_leg[state][next_route]
+            battery_time = FlightPlan.time_to_takeoff + self.leg[self.swap_state[state]][next_route]
+        else:
+            leg = self.leg[state][next_route]
+            total_time += leg
+            battery_time += leg
+
+        return_time = self.return_time[next_route]
+        feasible = battery_time + return_time <= FlightPlan.max_time_on_battery and \
+            total_time + self.finish[next_route] <= FlightPlan.max_time_in_air
+        return feasible, total_time, battery_time
+
+    def initial_times(self) -> tuple[float, float]:
+        """Mission and battery time accumulated before the first route is started
+
+        :return: total time and battery time (float, float)
+        """
+        return FlightPlan.time_to_takeoff, FlightPlan.time_to_takeoff
+
+    def evaluate(self, order: list[int], battery_swaps: list[int]) -> tuple[bool, float, float]:
+        """Simulate a complete route order
+
+        param order: route indexes in completion order ([int])
+        param battery_swaps: positions in order preceded by a battery swap ([int])
+        :return: 1. True if feasible. 2. total mission time including final landing (float)
+        3. reward collected (float)
+        """
+        swaps = set(battery_swaps)
+        state = self.origin_state
+        total_time, battery_time = self.initial_times()
+        feasible = True
+        reward = 0.0
+        for position, route_index in enumerate(order):
+            swap = position in swaps and state != self.origin_state
+            step_ok, total_time, battery_time = self.step(state, total_time, battery_time, route_index, swap)
+            feasible = feasible and step_ok
+            reward += self.rewards[route_index]
+            state = route_index
+        return feasible, total_time + self.finish[state], reward
+
+    def greedy_order(self, rng: Random = None, noise: float = 0.0) -> tuple[list[int], list[int]]:
+        """Build a route order by repeatedly completing the feasible route with the most reward per second,
+        swapping the battery beforehand only when the route does not fit on the current battery
+
+        param rng: random generator used to perturb route ratios (Random)
+        param noise: max fraction each ratio is randomly scaled up or down by (float)
+        :return: route indexes in completion order, positions in order preceded by a battery swap
+        """
+        order = []
+        battery_swaps = []
+        state = self.origin_state
+        total_time, battery_time = self.initial_times()
+        remaining = set(range(self.num_routes))
+        while remaining:
+            best = None
+            for j in remaining:
+                swap = False
+                feasible, next_total, next_battery = self.step(state, total_time, battery_time, j, False)
+                if not feasible and state != self.origin_state:
+                    swap = True
+                    feasible, next_total, next_battery = self.step(state, total_time, battery_time, j, True)
+                if feasible:
+                    ratio = self.rewards[j] / (next_total - total_time)
+                    if rng is not None:
+                        ratio *= rng.uniform(1 - noise, 1 + noise)
+                    if best is None or ratio > best[0]:
+                        best = (ratio, j, swap, next_total, next_battery)
+            if best is None:
+                break
+            _, j, swap, total_time, battery_time = best
+            if swap:
+                battery_swaps.append(len(order))
+            order.append(j)
+            remaining.remove(j)
+            state = j
+        return order, battery_swaps
+
+    def schedule(self, order: list[int]) -> tuple[list[int], list[int], float, float]:
+        """Turn any route order into a feasible plan, swapping the battery only when a route does not fit on
+        the current battery and skipping routes that do not fit at all
+
+        param order: route indexes in preferred completion order ([int])
+        :return: 1. route indexes kept in completion order 2. positions preceded by a battery swap
+        3. total mission time including final landing (float) 4. reward collected (float)
+        """
+        kept = []
+        battery_swaps = []
+        state = self.origin_state
+        total_time, battery_time = self.initial_times()
+        reward = 0.0
+        for j in order:
+            swap = False
+            feasible, next_total, next_battery = self.step(state, total_time, battery_time, j, False)
+            if not feasible and state != self.origin_state:
+                swap = True
+                feasible, next_total, next_battery = self.step(state, total_time, battery_time, j, True)
+            if not feasible:
+                continue
+            if swap:
+                battery_swaps.append(len(kept))
+            kept.append(j)
+            reward += self.rewards[j]
+            total_time, battery_time, state = next_total, next_battery, j
+        return kept, battery_swaps, total_time + self.finish[state], reward
+
+    @staticmethod
+    def max_route_time(total_time: float, battery_time: float) -> float:
+        """Upper bound on the time left for completing routes, after the battery swaps
+        needed to fly that long
+
+        param total_time: mission time accumulated so far, including the final return (float)
+        param battery_time: time accumulated on the current battery, including the final return (float)
+        :return: max time available for routes (float)
+        """
+        time_left = FlightPlan.max_time_in_air - total_time
+        battery_left = FlightPlan.max_time_on_battery - battery_time
+        full_battery = FlightPlan.max_time_on_battery - FlightPlan.time_to_takeoff
+        max_time = min(time_left, battery_left)
+        num_swaps = 1
+        while battery_left + (num_swaps - 1) * full_battery < time_left - (num_swaps - 1) * FlightPlan.time_to_swap_battery:
+            max_time = max(max_time, min(battery_left + num_swaps * full_battery,
+                                         time_left - num_swaps * FlightPlan.time_to_swap_battery))
+            num_swaps += 1
+        return max(max_time, 0.0)
+
+    def remaining_bounds(self, route_mask: int, state: int, total_time: float, battery_time: float,
+                         reward_needed: float) -> tuple[float, float]:
+        """Fractional knapsack bounds over the routes not yet completed. Each remaining route costs at least
+        its cheapest leg from the current state, origin or another remaining route
+
+        param route_mask: bitmask of routes already completed (int)
+        param state: current state index (int)
+        param total_time: mission time accumulated so far (float)
+        param battery_time: time accumulated on the current battery (float)
+        param reward_needed: reward the remaining routes must add to match the best plan (float)
+        :return: 1. upper bound on the reward the remaining routes can add (float)
+        2. lower bound on the final mission time of a plan adding reward_needed (float)
+        """
+        # Reserve the cheapest final return to origin from any state the plan could end in
+        final_time = self.finish[state]
+        for j in range(self.num_routes):
+            if not route_mask >> j & 1 and self.finish[j] < final_time:
+                final_time = self.finish[j]
+        time_left = self.max_route_time(total_time + final_time, battery_time + max(final_time, 0.0))
+
+        items = []
+        for j in range(self.num_routes):
+            if route_mask >> j & 1:
+                continue
+            for min_leg, i in self.entry_order[j]:
+                if i == state or i == self.origin_state or not route_mask >> i & 1:
+                    break
+            items.append((self.rewards[j] / min_leg, self.rewards[j], min_leg))
+        items.sort(reverse=True)
+
+        reward_bound = 0.0
+        for _, reward, min_leg in items:
+            if min_leg <= time_left:
+                reward_bound += reward
+                time_left -= min_leg
+            else:
+                reward_bound += reward * time_left / min_leg
+                break
+
+        min_final_time = total_time + final_time
+        for _, reward, min_leg in items:
+            if reward_needed <= REWARD_EPSILON:
+                break
+            if reward <= reward_needed:
+                min_final_time += min_leg
+                reward_needed -= reward
+            else:
+                min_final_time += min_leg * reward_needed / reward
+                break
+        return reward_bound, min_final_time
+
+    def build_flight_plan(self, order: list[int], battery_swaps: list[int]) -> FlightPlan:
+        """Build a FlightPlan with waypoints, instructions and route plan for a route order
+
+        param order: route indexes in completion order ([int])
+        param battery_swaps: positions in order preceded by a battery swap ([int])
+        :return: FlightPlan ready for format_for_execute_command and generate_email (FlightPlan)
+        """
+        origin = FlightPlan.origin
+        flightplan = FlightPlan(waypoints=[origin])
+        if not order:
+            flightplan.instructions = ["Takeoff"]
+            flightplan.battery_swap_indexes = [0]
+            return flightplan
+
+        swaps = set(battery_swaps)
+        waypoints = flightplan.waypoints
+        instructions = flightplan.instructions
+        if self.routes[order[0]].start_waypoint == origin:
+            instructions.append("START-I0")
+        else:
+            instructions.append("Takeoff")
+
+        state = self.origin_state
+        position = origin
+        distance = 0.0
+        for i, route_index in enumerate(order):
+            route = self.routes[route_index]
+            if i in swaps and state != self.origin_state:
+                if self.ends_at_origin[state]:
+                    # Dropped off at origin, swap battery during the same stop
+                    instructions[-1] = "RTL-CR"
+                else:
+                    distance += FlightPlan.calculate_distance(position, origin)
+                    waypoints.append(origin)
+                    instructions.append("RTL-CR" if route.start_waypoint == origin else "RTL-BSWP")
+                    position = origin
+                flightplan.battery_swap_indexes.append(len(waypoints) - 1)
+
+            if position != route.start_waypoint:
+                distance += FlightPlan.calculate_distance(position, route.start_waypoint)
+                waypoints.append(route.start_waypoint)
+                instructions.append("START")
+
+            distance += route.distance
+            waypoints.append(route.end_waypoint)
+            instructions.append("END")
+            flightplan.route_plan.append(route.number)
+            flightplan.reward_collected += route.reward
+            position = route.end_waypoint
+            state = route_index
+
+        # Return to origin to land
+        if position == origin:
+            instructions[-1] = "RTL-CR"
+        else:
+            distance += FlightPlan.calculate_distance(position, origin)
+            waypoints.append(origin)
+            instructions.append("RTL-BSWP")
+        flightplan.battery_swap_indexes.append(len(waypoints) - 1)
+
+        flightplan.distance_travelled = distance
+        _, flightplan.time_accumulated, _ = self.evaluate(order, battery_swaps)
+        return flightplan
+
+    def recover_order(self, flightplan: FlightPlan) -> tuple[list[int], list[int]]:
+        """Recover the route order and battery swap positions of a FlightPlan built by any task_2 engine
+
+        param flightplan: plan with waypoints, route_plan and battery_swap_indexes for these routes (FlightPlan)
+        :return: route indexes in completion order, positions in order preceded by a battery swap
+        """
+        route_indexes = {route.number: i for i, route in enumerate(self.routes)}
+        order = [route_indexes[number] for number in flightplan.route_plan]
+        # Last index is the final landing
+        swap_indexes = set(flightplan.battery_swap_indexes[:-1])
+
+        battery_swaps = []
+        swap_pending = False
+        position = 0
+        waypoints = flightplan.waypoints
+        for i in range(1, len(waypoints)):
+            if position < len(order):
+                route = self.routes[order[position]]
+                if waypoints[i - 1] == route.start_waypoint and waypoints[i] == route.end_waypoint:
+                    if swap_pending:
+                        battery_swaps.append(position)
+                        swap_pending = False
+                    position += 1
+            if i in swap_indexes:
+                # Swap happens after any route completed at this waypoint
+                swap_pending = True
+        return order, battery_swaps
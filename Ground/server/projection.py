@@ -0,0 +1,86 @@
+# Projections between longitude / latitude and UTM x,y metres
+# Transformers are built once per UTM zone and reused by every request
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+import pyproj
+
+from Ground.server.waypoint import Waypoint
+
+WGS84 = pyproj.CRS("EPSG:4326")
+
+
+class UtmProjection:
+
+    def __init__(self, epsg: int) -> None:
+        """Initialize UtmProjection object, building transformers both ways
+
+        :param epsg: EPSG code of the UTM zone (int)
+        """
+        self.epsg = epsg
+        utm = pyproj.CRS.from_epsg(epsg)
+        # always_xy keeps coordinate order as (longitude, latitude)
+        self.to_xy_transformer = pyproj.Transformer.from_crs(WGS84, utm, always_xy=True)
+        self.to_lon_lat_transformer = pyproj.Transformer.from_crs(utm, WGS84, always_xy=True)
+
+    def to_xy(self, longitudes, latitudes) -> Tuple[np.ndarray, np.ndarray]:
+        """Project arrays of coordinates to x,y metres in one call
+
+        :param longitudes: longitudes in degrees (array like)
+        :param latitudes: latitudes in degrees (array like)
+        :return: x and y arrays in metres
+        """
+        return self.to_xy_transformer.transform(np.asarray(longitudes, dtype=float),
+                                                np.asarray(latitudes, dtype=float))
+
+    def to_lon_lat(self, xs, ys) -> Tuple[np.ndarray, np.ndarray]:
+        """Convert arrays of x,y metres back to longitude, latitude in one call
+
+        :param xs: x coordinates in metres (array like)
+        :param ys: y coordinates in metres (array like)
+        :return: longitude and latitude arrays in degrees
+        """
+        return self.to_lon_lat_transformer.transform(np.asarray(xs, dtype=float),
+                                                     np.asarray(ys, dtype=float))
+
+    def waypoints_to_xy(self, waypoints: List[Waypoint]) -> np.ndarray:
+        """Project waypoints to x,y metres
+
+        :param waypoints: waypoints to project ([Waypoint])
+        :return: array of shape (len(waypoints), 2)
+        """
+        xs, ys = self.to_xy([wp.longitude for wp in waypoints], [wp.latitude for wp in waypoints])
+        return np.column_stack([xs, ys])
+
+
+def utm_epsg(longitude: float, latitude: float) -> int:
+    """EPSG code of the WGS84 UTM zone containing a coordinate
+
+    :param longitude: longitude in degrees (float)
+    :param latitude: latitude in degrees (float)
+    :return: EPSG code, 326xx north of the equator and 327xx south of it
+    """
+    zone = int((longitude + 180) // 6) % 60 + 1
+    return (32600 if latitude >= 0 else 32700) + zone
+
+
+@lru_cache(maxsize=None)
+def get_utm_projection(epsg: int) -> UtmProjection:
+    """Cached UtmProjection for a UTM zone
+
+    :param epsg: EPSG code of the UTM zone (int)
+    :return: UtmProjection
+    """
+    return UtmProjection(epsg)
+
+
+def get_projection(waypoints: List[Waypoint]) -> UtmProjection:
+    """Cached UtmProjection for the UTM zone at the centre of a set of waypoints
+
+    :param waypoints: waypoints to be projected ([Waypoint])
+    :return: UtmProjection
+    """
+    longitude = sum(wp.longitude for wp in waypoints) / len(waypoints)
+    latitude = sum(wp.latitude for wp in waypoints) / len(waypoints)
+    return get_utm_projection(utm_epsg(longitude, latitude))
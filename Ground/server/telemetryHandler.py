@@ -1,8 +1,17 @@
+import configparser
+import os
 from collections import deque
-from flask_socketio import SocketIO
+from flask_socketio import SocketIO, join_room, leave_room, rooms
 
+from telemetryScheduler import TelemetryScheduler, DEFAULT_FRAME_ROOM
 from Shared.shared_utils import success_dict, error_dict
 
+config = configparser.ConfigParser()
+config.read(os.path.join(os.path.dirname(__file__), '../..', 'config.ini'))
+
+# Telemetry frames per second emitted to every client
+TELEMETRY_UI_RATE = config['Ground'].getint('Telemetry_UI_Rate', fallback=10)
+
 
 class TelemetryHandler:
 
@@ -19,6 +28,11 @@ class TelemetryHandler:
             "timestamp": 0
         })
         self.socket_io = socket_io
+        # Samples are emitted in frames at fixed rates, not per request
+        self.scheduler = TelemetryScheduler(socket_io, TELEMETRY_UI_RATE)
+        socket_io.on_event("connect", self.join_default_frames)
+        socket_io.on_event("subscribe-telemetry", self.subscribe)
+        socket_io.on_event("unsubscribe-telemetry", self.unsubscribe)
 
     def extract_and_notify(self, json_r: dict) -> dict:
         """Pull out incoming telemetry and validate.
@@ -41,8 +55,10 @@ class TelemetryHandler:
                 "height": height,
                 "timestamp": timestamp
             }
-            # Notify subscribers with new data
-            self.send("telemetry", new_telemetry)
+            # Keep freshest sample for get_recent_data, notify subscribers
+            # with the next frame
+            self.log_data(new_telemetry)
+            self.scheduler.add_sample(new_telemetry)
             return success_dict("Telemetry Updated")
         return error_dict("Missing Payload Values")
 
@@ -63,6 +79,57 @@ class TelemetryHandler:
         self.socket_io.emit(event, data)
         self.log_data(data)
 
+    def join_default_frames(self, auth: dict = None) -> None:
+        """Send telemetry frames at the default rate to a connecting client
+
+        :param auth: authentication data of the client, unused (dict)
+        """
+        join_room(DEFAULT_FRAME_ROOM)
+
+    def subscribe(self, data: dict) -> dict:
+        """Subscribe the requesting client to telemetry frames at a rate,
+        replacing the rate it received frames at
+
+        :param data: event data with the frames per second, {"rate": 5} (dict)
+        :return: acknowledgement with the room joined
+        """
+        if not isinstance(data, dict):
+            return error_dict("Invalid Telemetry Rate")
+        try:
+            room = self.scheduler.subscribe(data.get("rate",
+                                                     TELEMETRY_UI_RATE))
+        except ValueError as e:
+            return error_dict(str(e))
+        self.leave_frame_rooms()
+        join_room(room)
+        return {"success": True, "room": room}
+
+    def unsubscribe(self, data: dict) -> dict:
+        """Unsubscribe the requesting client from telemetry frames at a rate,
+        returning it to frames at the default rate
+
+        :param data: event data with the frames per second, {"rate": 5} (dict)
+        :return: acknowledgement with the room left
+        """
+        if not isinstance(data, dict):
+            return error_dict("Invalid Telemetry Rate")
+        try:
+            room = self.scheduler.room_name(data.get("rate",
+                                                     TELEMETRY_UI_RATE))
+        except ValueError as e:
+            return error_dict(str(e))
+        if room in rooms():
+            leave_room(room)
+            join_room(DEFAULT_FRAME_ROOM)
+        return {"success": True, "room": room}
+
+    def leave_frame_rooms(self) -> None:
+        # A client receives frames from one room only, at one rate
+        frame_rooms = self.scheduler.frame_rooms()
+        for room in rooms():
+            if room in frame_rooms:
+                leave_room(room)
+
     def get_recent_data(self) -> dict:
         """Return the latest collected telemetry
 
@@ -0,0 +1,136 @@
+import math
+import threading
+from collections import deque
+from flask_socketio import SocketIO
+
+# Event with the latest sample, emitted at the default rate to every client
+TELEMETRY_EVENT = "telemetry"
+# Event with every sample since the previous frame as compact arrays
+TELEMETRY_FRAME_EVENT = "telemetry-frame"
+# Room of the clients receiving frames at the default rate, every client
+# joins it on connect and leaves it when subscribing to another rate
+DEFAULT_FRAME_ROOM = "telemetry-default"
+# Fields of each sample in a frame, in order
+FRAME_FIELDS = ["longitude", "latitude", "height", "timestamp"]
+# Samples kept per frame before the oldest are dropped
+MAX_FRAME_SAMPLES = 100
+# Range of rates in Hz clients can subscribe at
+MIN_UI_RATE = 1
+MAX_UI_RATE = 30
+
+
+class TelemetryGroup:
+
+    def __init__(self, rate: int, room: str) -> None:
+        """Initialize TelemetryGroup object, the clients receiving frames at
+        one rate
+
+        :param rate: frames per second (int)
+        :param room: SocketIO room of the clients (str)
+        """
+        self.rate = rate
+        self.room = room
+        self.pending = deque(maxlen=MAX_FRAME_SAMPLES)
+        self.dropped = 0
+
+
+class TelemetryScheduler:
+    """Aggregates telemetry samples into frames emitted at fixed rates.
+
+    Every client gets the latest sample at the default rate. Frames of all
+    samples are emitted to one SocketIO room per rate, so each client
+    receives frames only at the rate of the room it is in, the default rate
+    unless it subscribed to another. A rate only emits when new samples
+    arrived since its previous frame.
+    """
+
+    def __init__(self, socket_io: SocketIO, default_rate: int) -> None:
+        """Initialize TelemetryScheduler object
+
+        :param socket_io: web socket for event notification (SocketIO)
+        :param default_rate: frames per second of clients not subscribed to
+                             another rate (int)
+        """
+        self.socket_io = socket_io
+        self.lock = threading.Lock()
+        self.default_group = TelemetryGroup(self.clamp_rate(default_rate),
+                                            DEFAULT_FRAME_ROOM)
+        self.groups = [self.default_group]
+        self.started = False
+
+    @staticmethod
+    def clamp_rate(rate) -> int:
+        """Round and clamp a rate to MIN_UI_RATE-MAX_UI_RATE
+
+        :param rate: frames per second (int | float | str)
+        :return: clamped frames per second (int)
+        :raises ValueError: rate is not a finite number
+        """
+        try:
+            rate = float(rate)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid Telemetry Rate: {rate!r}")
+        if not math.isfinite(rate):
+            raise ValueError(f"Invalid Telemetry Rate: {rate!r}")
+        return int(min(max(round(rate), MIN_UI_RATE), MAX_UI_RATE))
+
+    def room_name(self, rate) -> str:
+        return f"telemetry-{self.clamp_rate(rate)}hz"
+
+    def frame_rooms(self) -> set:
+        with self.lock:
+            return {group.room for group in self.groups}
+
+    def add_sample(self, sample: dict) -> None:
+        """Queue a sample for the next frame of every rate
+
+        :param sample: telemetry sample (dict)
+        """
+        with self.lock:
+            if not self.started:
+                self.started = True
+                self._start(self.default_group)
+            for group in self.groups:
+                if len(group.pending) == group.pending.maxlen:
+                    group.dropped += 1
+                group.pending.append(sample)
+
+    def subscribe(self, rate) -> str:
+        """Get the room receiving frames at a rate, starting it if needed
+
+        :param rate: frames per second, clamped to MIN_UI_RATE-MAX_UI_RATE
+        :return: SocketIO room name for the rate (str)
+        :raises ValueError: rate is not a finite number
+        """
+        rate = self.clamp_rate(rate)
+        room = self.room_name(rate)
+        with self.lock:
+            if not any(group.room == room for group in self.groups):
+                group = TelemetryGroup(rate, room)
+                self.groups.append(group)
+                self._start(group)
+        return room
+
+    def _start(self, group: TelemetryGroup) -> None:
+        self.socket_io.start_background_task(self._emit_frames, group)
+
+    def _emit_frames(self, group: TelemetryGroup) -> None:
+        while True:
+            self.socket_io.sleep(1 / group.rate)
+            with self.lock:
+                samples = list(group.pending)
+                dropped = group.dropped
+                group.pending.clear()
+                group.dropped = 0
+            if not samples:
+                continue
+
+            frame = {
+                "fields": FRAME_FIELDS,
+                "samples": [[sample.get(field) for field in FRAME_FIELDS]
+                            for sample in samples],
+                "dropped": dropped
+            }
+            if group is self.default_group:
+                self.socket_io.emit(TELEMETRY_EVENT, samples[-1])
+            self.socket_io.emit(TELEMETRY_FRAME_EVENT, frame, to=group.room)
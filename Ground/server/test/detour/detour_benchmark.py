@@ -0,0 +1,213 @@
+# Benchmark and fuzzing suite for the detour engines
+# Generates seeded start / rejoin / bounding box cases from ALL_WAYPOINTS, plans
+# them with every engine in parallel, checks no detour enters a buffered
+# bounding box and reports latency percentiles and path length ratios
+#
+# Usage (from the repository root):
+#   python Ground/server/test/detour/detour_benchmark.py --cases 5000
+#   python Ground/server/test/detour/detour_benchmark.py --engines full --json detour_benchmark.json
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from shapely.geometry import LineString, Point
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../../..'))
+
+from Ground.server.waypoint import ALL_WAYPOINTS, Waypoint
+from Ground.server.detourAlgorithm import get_detour_route, buffer_obstacle, IncrementalDetourPlanner
+from Ground.server.projection import get_projection
+
+# Length of a detour inside a buffered bounding box, in metres, reported as a violation
+VIOLATION_TOLERANCE = 0.01
+
+
+def plan_full(start: Waypoint, rejoin: Waypoint, bounding_box: list[Waypoint]) -> tuple[list[Waypoint], float]:
+    """Plan a detour with get_detour_route
+
+    :return: 1. intermediate waypoints 2. seconds taken
+    """
+    start_time = time.perf_counter()
+    detour_route = get_detour_route(start, rejoin, bounding_box)
+    return detour_route, time.perf_counter() - start_time
+
+
+def plan_incremental(start: Waypoint, rejoin: Waypoint, bounding_box: list[Waypoint]) -> tuple[list[Waypoint], float]:
+    """Plan a detour with an IncrementalDetourPlanner, timing the per telemetry update only
+    as the planner is built once per Task 1 Update QR
+
+    :return: 1. intermediate waypoints 2. seconds taken
+    """
+    planner = IncrementalDetourPlanner(rejoin, [bounding_box])
+    start_time = time.perf_counter()
+    detour_route = planner.get_detour_route(start)
+    latency = time.perf_counter() - start_time
+    # None when no detour is found, get_detour_route returns [] for it
+    return detour_route if detour_route is not None else [], latency
+
+
+DETOUR_ENGINES = {
+    "full": plan_full,
+    "incremental": plan_incremental,
+}
+
+
+def generate_case(seed: int) -> tuple[int, int, list[int]]:
+    """Pick distinct start, rejoin and 3 to 6 bounding box waypoints
+
+    :param seed: seed of the case (int)
+    :return: indexes into ALL_WAYPOINTS of 1. start 2. rejoin 3. bounding box
+    """
+    rng = random.Random(seed)
+    num_bbox_points = rng.randint(3, 6)
+    indexes = rng.sample(range(len(ALL_WAYPOINTS)), num_bbox_points + 2)
+    return indexes[0], indexes[1], indexes[2:]
+
+
+def path_length(xy_path: list) -> float:
+    return sum(math.dist(xy_path[i], xy_path[i + 1]) for i in range(len(xy_path) - 1))
+
+
+def run_case(seed: int, engines: list[str]) -> list[dict]:
+    """Plan one case with every engine and verify the detours
+
+    :param seed: seed of the case (int)
+    :param engines: names of engines in DETOUR_ENGINES ([str])
+    :return: one result dictionary per engine
+    """
+    start_i, rejoin_i, bbox_i = generate_case(seed)
+    start, rejoin = ALL_WAYPOINTS[start_i], ALL_WAYPOINTS[rejoin_i]
+    bounding_box = [ALL_WAYPOINTS[i] for i in bbox_i]
+
+    # Buffered bounding box without tolerance, detours must stay outside of it
+    projection = get_projection([start, rejoin] + bounding_box)
+    _, inner, _ = buffer_obstacle([tuple(coord) for coord in projection.waypoints_to_xy(bounding_box)])
+    xy_start, xy_rejoin = projection.waypoints_to_xy([start, rejoin])
+    direct_length = math.dist(xy_start, xy_rejoin)
+    # No detour exists when the start or rejoin waypoint is inside the buffer
+    reachable = not inner.intersects(Point(xy_start)) and not inner.intersects(Point(xy_rejoin))
+
+    results = []
+    for engine in engines:
+        # Engines print progress, keep the benchmark output readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            detour_route, latency = DETOUR_ENGINES[engine](start, rejoin, bounding_box)
+
+        # [rejoin] when no detour is needed, otherwise the waypoints between start and rejoin
+        if detour_route == [rejoin]:
+            detour_route = []
+        xy_path = [tuple(xy_start)] + [tuple(coord) for coord in projection.waypoints_to_xy(detour_route)] \
+            if detour_route else [tuple(xy_start)]
+        xy_path.append(tuple(xy_rejoin))
+        length = path_length(xy_path)
+        violation = reachable and LineString(xy_path).intersection(inner).length > VIOLATION_TOLERANCE
+
+        results.append({
+            "engine": engine,
+            "seed": seed,
+            "start": start.name,
+            "rejoin": rejoin.name,
+            "bounding_box": [wp.name for wp in bounding_box],
+            "reachable": reachable,
+            "latency": latency,
+            "waypoints": len(detour_route),
+            "path_length": length,
+            "length_ratio": length / direct_length if direct_length > 0 else 1.0,
+            "violation": violation,
+        })
+    return results
+
+
+def run_benchmark(engines: list[str], num_cases: int, seed: int, workers: int) -> list[dict]:
+    """Run every engine on num_cases seeded cases across worker processes
+
+    :return: List of result dictionaries, one per case and engine
+    """
+    seeds = range(seed, seed + num_cases)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for case_results in executor.map(run_case, seeds, [engines] * num_cases,
+                                         chunksize=max(num_cases // (workers * 8), 1)):
+            results.extend(case_results)
+    return results
+
+
+def summarize(results: list[dict], engines: list[str]) -> list[dict]:
+    """Latency percentiles, length ratios and violations of each engine over the reachable cases
+
+    :return: List of summary dictionaries, one per engine
+    """
+    full_lengths = {r["seed"]: r["path_length"] for r in results if r["engine"] == "full"}
+    summaries = []
+    for engine in engines:
+        engine_results = [r for r in results if r["engine"] == engine and r["reachable"]]
+        if not engine_results:
+            continue
+        latencies = np.array([r["latency"] for r in engine_results]) * 1000
+        ratios = np.array([r["length_ratio"] for r in engine_results])
+        summary = {
+            "engine": engine,
+            "cases": len(engine_results),
+            "latency_p50_ms": float(np.percentile(latencies, 50)),
+            "latency_p90_ms": float(np.percentile(latencies, 90)),
+            "latency_p99_ms": float(np.percentile(latencies, 99)),
+            "latency_max_ms": float(latencies.max()),
+            "length_ratio_mean": float(ratios.mean()),
+            "length_ratio_max": float(ratios.max()),
+            "violations": sum(r["violation"] for r in engine_results),
+        }
+        if full_lengths and engine != "full":
+            # Path length against get_detour_route on the same case
+            vs_full = np.array([r["path_length"] / full_lengths[r["seed"]] for r in engine_results
+                                if full_lengths[r["seed"]] > 0])
+            summary["vs_full_mean"] = float(vs_full.mean())
+            summary["vs_full_max"] = float(vs_full.max())
+        summaries.append(summary)
+    return summaries
+
+
+def print_summary(summaries: list[dict]) -> None:
+    print(f"{'engine':<14}{'cases':>7}{'p50 (ms)':>10}{'p90 (ms)':>10}{'p99 (ms)':>10}{'max (ms)':>10}"
+          f"{'ratio':>8}{'max ratio':>11}{'vs full':>9}{'violations':>12}")
+    for s in summaries:
+        vs_full = f"{s['vs_full_mean']:>9.4f}" if "vs_full_mean" in s else f"{'-':>9}"
+        print(f"{s['engine']:<14}{s['cases']:>7}{s['latency_p50_ms']:>10.3f}{s['latency_p90_ms']:>10.3f}"
+              f"{s['latency_p99_ms']:>10.3f}{s['latency_max_ms']:>10.3f}{s['length_ratio_mean']:>8.3f}"
+              f"{s['length_ratio_max']:>11.3f}{vs_full}{s['violations']:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark and fuzz the detour engines")
+    parser.add_argument("--engines", nargs="+", default=list(DETOUR_ENGINES), choices=list(DETOUR_ENGINES))
+    parser.add_argument("--cases", type=int, default=2000, help="number of seeded cases")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first case")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--json", help="write per case results to this json file")
+    args = parser.parse_args()
+
+    benchmark_start = time.perf_counter()
+    benchmark_results = run_benchmark(args.engines, args.cases, args.seed, args.workers)
+    print(f"{args.cases} cases in {time.perf_counter() - benchmark_start:.1f}s with {args.workers} workers, "
+          f"{sum(not r['reachable'] for r in benchmark_results) // len(args.engines)} "
+          f"with start or rejoin inside the bounding box skipped")
+    benchmark_summaries = summarize(benchmark_results, args.engines)
+    print_summary(benchmark_summaries)
+
+    if args.json:
+        with open(args.json, "w") as outfile:
+            json.dump(benchmark_results, outfile, indent=4)
+        print(f"Results written to {args.json}")
+
+    violating = [r for r in benchmark_results if r["violation"]]
+    for r in violating[:20]:
+        print(f"VIOLATION {r['engine']} seed={r['seed']}: {r['start']} -> {r['rejoin']} around {r['bounding_box']}")
+    if violating:
+        sys.exit(1)
@@ -0,0 +1,163 @@
+# Benchmark for the Task 2 planning engines
+# Runs each engine on seeded generated route sets and reports speed and plan quality
+# Every engine times its plans with PlanCostModel, so mission times compare like for like.
+# Peak memory is traced in this process only, worker processes of the multi start engine are not included
+#
+# Usage (from Ground/server/test):
+#   python planner_benchmark.py --max-routes 24 --json planner_benchmark.json
+#   python planner_benchmark.py --baseline planner_benchmark.json
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from algorithm import task_2, TASK_2_ENGINES, DYNAMIC_PROGRAMMING_ENGINE, \
+    DYNAMIC_PROGRAMMING_MAX_ROUTES, MULTI_START_ENGINE
+from route_generator import generate_routes
+from planCostModel import PlanCostModel
+
+# Allowed slowdown before a result is reported as a regression
+TIME_REGRESSION_FACTOR = 1.5
+
+
+def run_engine(engine: str, num_routes: int, seed: int, time_limit: float, measure_memory: bool = True,
+               local_search_time: float = 0.0) -> dict:
+    """Plan one seeded route set with an engine and measure it
+
+    :param engine: task_2 engine name (str)
+    :param num_routes: number of routes to generate (int)
+    :param seed: seed for route generation (int)
+    :param time_limit: max seconds for time limited engines (float)
+    :param measure_memory: signal to re-run the engine to measure peak memory (bool)
+    :param local_search_time: seconds of local search after the engine, 0 benchmarks the engine alone (float)
+    :return: Dictionary with benchmark measurements
+    """
+    random.seed(seed)
+    routes = generate_routes(num_routes)
+
+    start = time.perf_counter()
+    flightplan = task_2(routes, engine=engine, time_limit=time_limit, local_search_time=local_search_time)
+    wall_time = time.perf_counter() - start
+
+    # Greedy plans can break battery or mission limits the cost model checks
+    cost_model = PlanCostModel(routes)
+    feasible, _, _ = cost_model.evaluate(*cost_model.recover_order(flightplan))
+
+    # Memory measured on a separate run as tracing slows the planner down.
+    # Only this process is traced, multi start worker processes are not included
+    peak_memory = 0
+    if measure_memory:
+        tracemalloc.start()
+        task_2(routes, engine=engine, time_limit=time_limit, local_search_time=local_search_time)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "engine": engine,
+        "num_routes": num_routes,
+        "seed": seed,
+        "wall_time": wall_time,
+        "peak_memory_kb": peak_memory / 1024,
+        "reward_collected": flightplan.reward_collected,
+        "total_time": flightplan.time_accumulated,
+        # Last battery swap index is the final landing at origin
+        "battery_swaps": max(len(flightplan.battery_swap_indexes) - 1, 0),
+        "routes_completed": len(flightplan.route_plan),
+        "feasible": feasible
+    }
+
+
+def run_benchmark(engines: list[str], route_counts: list[int], num_seeds: int,
+                  time_limit: float, dp_max_routes: int, measure_memory: bool = True,
+                  local_search_time: float = 0.0) -> list[dict]:
+    """Run every engine on every route count and seed
+
+    :return: List of benchmark result dictionaries
+    """
+    results = []
+    for num_routes in route_counts:
+        for seed_i in range(num_seeds):
+            seed = num_routes * 1000 + seed_i
+            for engine in engines:
+                if engine == DYNAMIC_PROGRAMMING_ENGINE and num_routes > dp_max_routes:
+                    continue
+                result = run_engine(engine, num_routes, seed, time_limit, measure_memory, local_search_time)
+                results.append(result)
+                print_row(result)
+    return results
+
+
+def print_header() -> None:
+    print(f"{'engine':<20}{'routes':>7}{'seed':>7}{'wall (s)':>10}{'peak (KB)':>11}"
+          f"{'reward':>9}{'time (s)':>10}{'swaps':>7}{'done':>6}{'feasible':>10}")
+
+
+def print_row(result: dict) -> None:
+    print(f"{result['engine']:<20}{result['num_routes']:>7}{result['seed']:>7}"
+          f"{result['wall_time']:>10.3f}{result['peak_memory_kb']:>11.0f}"
+          f"{result['reward_collected']:>9.0f}{result['total_time']:>10.0f}"
+          f"{result['battery_swaps']:>7}{result['routes_completed']:>6}{str(result['feasible']):>10}", flush=True)
+
+
+def compare_to_baseline(results: list[dict], baseline: list[dict]) -> list[str]:
+    """Find results that collect less reward or run much slower than a baseline run
+
+    :param results: results of this run ([dict])
+    :param baseline: results of a previous run loaded from json ([dict])
+    :return: List of regression messages
+    """
+    baseline_results = {(r["engine"], r["num_routes"], r["seed"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline_results.get((result["engine"], result["num_routes"], result["seed"]))
+        if previous is None:
+            continue
+        name = f"{result['engine']} routes={result['num_routes']} seed={result['seed']}"
+        if result["reward_collected"] < previous["reward_collected"]:
+            regressions.append(f"{name}: reward {previous['reward_collected']} -> {result['reward_collected']}")
+        if result["wall_time"] > TIME_REGRESSION_FACTOR * previous["wall_time"] and result["wall_time"] > 0.05:
+            regressions.append(f"{name}: wall time {previous['wall_time']:.3f}s -> {result['wall_time']:.3f}s")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Task 2 planning engines")
+    parser.add_argument("--engines", nargs="+", default=TASK_2_ENGINES, choices=TASK_2_ENGINES)
+    parser.add_argument("--min-routes", type=int, default=4)
+    parser.add_argument("--max-routes", type=int, default=40)
+    parser.add_argument("--step", type=int, default=4)
+    parser.add_argument("--seeds", type=int, default=3, help="route sets generated per route count")
+    parser.add_argument("--time-limit", type=float, default=10.0, help="seconds for time limited engines")
+    parser.add_argument("--dp-max-routes", type=int, default=DYNAMIC_PROGRAMMING_MAX_ROUTES)
+    parser.add_argument("--local-search-time", type=float, default=0.0,
+                        help="seconds of local search improving each engine's plan")
+    parser.add_argument("--skip-memory", action="store_true", help="skip the peak memory run of each engine")
+    parser.add_argument("--json", help="write results to this json file")
+    parser.add_argument("--baseline", help="json results of a previous run to check for regressions")
+    args = parser.parse_args()
+
+    if MULTI_START_ENGINE in args.engines and not args.skip_memory:
+        print(f"Peak memory of {MULTI_START_ENGINE} excludes its worker processes")
+    print_header()
+    benchmark_results = run_benchmark(args.engines, list(range(args.min_routes, args.max_routes + 1, args.step)),
+                                      args.seeds, args.time_limit, args.dp_max_routes, not args.skip_memory,
+                                      args.local_search_time)
+
+    if args.json:
+        with open(args.json, "w") as outfile:
+            json.dump(benchmark_results, outfile, indent=4)
+        print(f"Results written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as infile:
+            regression_msgs = compare_to_baseline(benchmark_results, json.load(infile))
+        for msg in regression_msgs:
+            print(f"REGRESSION {msg}")
+        if regression_msgs:
+            sys.exit(1)
+        print("No regressions against baseline")
@@ -0,0 +1,142 @@
+# Tests for the Task 2 planning engines
+#
+# Usage (from the repository root):
+#   python -m pytest Ground/server/test/planner_engines_test.py
+import os
+import random
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import algorithm
+from algorithm import task_2, GREEDY_ENGINE, ITERATIVE_ENGINE, AUTO_ENGINE, DYNAMIC_PROGRAMMING_ENGINE, \
+    BRANCH_AND_BOUND_ENGINE, BranchAndBoundPlanner, calculate_dynamic_programming_path
+from flightplan import FlightPlan
+from localSearch import LocalSearch
+from multiStartPlanner import multi_start_search
+from planCostModel import PlanCostModel, is_better_plan
+from route import Route
+from route_generator import generate_routes
+
+
+def seeded_routes(num_routes: int, seed: int) -> list[Route]:
+    random.seed(seed)
+    return generate_routes(num_routes)
+
+
+def brute_force(cost_model: PlanCostModel) -> tuple[float, float]:
+    """Best reward and mission time over every feasible route order and battery swap position"""
+    total_time, battery_time = cost_model.initial_times()
+    best = [0.0, total_time + cost_model.finish[cost_model.origin_state]]
+
+    def search(route_mask: int, state: int, total_time: float, battery_time: float, reward: float) -> None:
+        final_time = total_time + cost_model.finish[state]
+        if is_better_plan(reward, final_time, *best):
+            best[:] = [reward, final_time]
+        for j in range(cost_model.num_routes):
+            if route_mask >> j & 1:
+                continue
+            for swap in (False,) if state == cost_model.origin_state else (False, True):
+                # Time only adds up, a plan past a limit cannot come back within it
+                feasible, next_total, next_battery = cost_model.step(state, total_time, battery_time, j, swap)
+                if feasible:
+                    search(route_mask | 1 << j, j, next_total, next_battery, reward + cost_model.rewards[j])
+
+    search(0, cost_model.origin_state, total_time, battery_time, 0.0)
+    return best[0], best[1]
+
+
+def test_exact_engines_match_brute_force(monkeypatch):
+    # Shorter mission, brute force stays within seconds and plans still need a battery swap
+    monkeypatch.setattr(FlightPlan, "max_time_in_air", 2400.0)
+    for num_routes, num_seeds in [(7, 3), (8, 2), (9, 1)]:
+        for seed in range(num_seeds):
+            cost_model = PlanCostModel(seeded_routes(num_routes, 100 * num_routes + seed))
+            best_reward, best_time = brute_force(cost_model)
+            for name, (order, battery_swaps) in [("branch_and_bound", BranchAndBoundPlanner(cost_model, None).solve()),
+                                                 ("dynamic_programming",
+                                                  calculate_dynamic_programming_path(cost_model))]:
+                feasible, total_time, reward = cost_model.evaluate(order, battery_swaps)
+                assert feasible, (name, num_routes, seed)
+                assert reward == pytest.approx(best_reward), (name, num_routes, seed)
+                assert total_time == pytest.approx(best_time), (name, num_routes, seed)
+
+
+def test_branch_and_bound_time_limit_keeps_local_search_plan():
+    cost_model = PlanCostModel(seeded_routes(20, 20))
+    local_search = LocalSearch(cost_model, *cost_model.greedy_order())
+    local_search.run(algorithm.LOCAL_SEARCH_TIME_LIMIT)
+
+    planner = BranchAndBoundPlanner(cost_model, 0.0)
+    feasible, total_time, reward = cost_model.evaluate(*planner.solve())
+    assert not planner.is_optimal
+    assert feasible
+    assert not is_better_plan(local_search.reward, local_search.total_time, reward, total_time)
+
+
+def test_local_search_never_worsens_plan():
+    for num_routes in [6, 12, 20]:
+        for seed in range(3):
+            cost_model = PlanCostModel(seeded_routes(num_routes, 100 * num_routes + seed))
+            rng = random.Random(seed)
+            order, battery_swaps = cost_model.greedy_order(rng, 0.5)
+            # Feasible start, and a shuffled one that local search repairs first
+            shuffled = rng.sample(range(num_routes), num_routes)
+            for start_order, start_swaps in [(order, battery_swaps), (shuffled, [])]:
+                feasible, start_time, start_reward = cost_model.evaluate(start_order, start_swaps)
+                local_search = LocalSearch(cost_model, start_order, start_swaps)
+                report = local_search.run(0.5)
+
+                feasible_after, total_time, reward = cost_model.evaluate(local_search.order,
+                                                                         local_search.battery_swaps())
+                assert feasible_after, (num_routes, seed)
+                assert total_time <= FlightPlan.max_time_in_air
+                assert (reward, total_time) == pytest.approx((local_search.reward, local_search.total_time))
+                assert reward >= report["reward_before"] - 1e-9
+                if feasible:
+                    assert not is_better_plan(start_reward, start_time, reward, total_time), (num_routes, seed)
+
+
+def test_multi_start_not_worse_than_greedy_start():
+    for num_routes in [12, 20]:
+        cost_model = PlanCostModel(seeded_routes(num_routes, num_routes))
+        # First start of seed 0 is the unperturbed greedy plan improved by local search
+        local_search = LocalSearch(cost_model, *cost_model.greedy_order())
+        local_search.run(10.0)
+
+        order, battery_swaps = multi_start_search(cost_model, 0, time.time() + 1.0)
+        feasible, total_time, reward = cost_model.evaluate(order, battery_swaps)
+        assert feasible, num_routes
+        assert not is_better_plan(local_search.reward, local_search.total_time, reward, total_time), num_routes
+
+
+def test_engines_share_time_model():
+    for num_routes in [1, 3, 8]:
+        routes = seeded_routes(num_routes, num_routes)
+        cost_model = PlanCostModel(routes)
+        for engine in [GREEDY_ENGINE, ITERATIVE_ENGINE, AUTO_ENGINE, BRANCH_AND_BOUND_ENGINE]:
+            for local_search_time in [0, 1]:
+                flightplan = task_2(routes, engine=engine, local_search_time=local_search_time)
+                _, total_time, reward = cost_model.evaluate(*cost_model.recover_order(flightplan))
+                assert flightplan.time_accumulated == total_time, (num_routes, engine, local_search_time)
+                assert flightplan.reward_collected == reward, (num_routes, engine, local_search_time)
+
+    # Same single route plan whichever engine planned it
+    routes = seeded_routes(1, 1)
+    times = {engine: task_2(routes, engine=engine, local_search_time=0).time_accumulated
+             for engine in [GREEDY_ENGINE, ITERATIVE_ENGINE, DYNAMIC_PROGRAMMING_ENGINE]}
+    assert len(set(times.values())) == 1, times
+
+
+def test_exact_engines_skip_local_search(monkeypatch):
+    calls = []
+    monkeypatch.setattr(algorithm, "improve_flight_plan", lambda *args: calls.append(args) or args[1])
+    routes = seeded_routes(8, 8)
+    task_2(routes, engine=DYNAMIC_PROGRAMMING_ENGINE, local_search_time=1)
+    task_2(routes, engine=BRANCH_AND_BOUND_ENGINE, local_search_time=1)
+    assert not calls
+    task_2(routes, engine=GREEDY_ENGINE, local_search_time=1)
+    assert len(calls) == 1
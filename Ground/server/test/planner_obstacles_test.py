@@ -0,0 +1,73 @@
+# Tests for planning Task 2 around obstacles
+#
+# Usage (from the repository root):
+#   python -m pytest Ground/server/test/planner_obstacles_test.py
+import math
+import os
+import random
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from algorithm import task_2, set_planning_obstacles, GREEDY_ENGINE, ITERATIVE_ENGINE, \
+    DYNAMIC_PROGRAMMING_ENGINE
+from route import Route
+from route_generator import generate_routes
+from waypoint import WAYPOINT_LST
+
+# Triangle around Point 18. Point 18 and the buffered corners cannot be reached around it
+OBSTACLE = [WAYPOINT_LST.get_wp_by_name(name) for name in ["Golf", "Papa", "Quebec"]]
+UNREACHABLE_WAYPOINTS = ["Golf", "Papa", "Quebec", "Point 18"]
+UNREACHABLE_ROUTE = 999
+
+
+def routes_with_unreachable(num_routes: int) -> list[Route]:
+    """Seeded generated routes avoiding the obstacle, plus one high reward route starting at Point 18"""
+    random.seed(num_routes)
+    routes = [route for route in generate_routes(num_routes)
+              if route.start_waypoint_name not in UNREACHABLE_WAYPOINTS and
+              route.end_waypoint_name not in UNREACHABLE_WAYPOINTS]
+    routes.append(Route(UNREACHABLE_ROUTE, 6, "Point 18", "Bravo", 10, "", 500))
+    return routes
+
+
+def test_unreachable_routes_dropped():
+    routes = routes_with_unreachable(20)
+    try:
+        reachable_routes = set_planning_obstacles(routes, [OBSTACLE])
+    finally:
+        set_planning_obstacles(routes, [])
+
+    assert [route.number for route in reachable_routes] == \
+        [route.number for route in routes if route.number != UNREACHABLE_ROUTE]
+    assert all(not math.isinf(route.distance) for route in reachable_routes)
+
+
+def test_engines_plan_around_unreachable_route():
+    for engine, num_routes in [(GREEDY_ENGINE, 21), (ITERATIVE_ENGINE, 21), (DYNAMIC_PROGRAMMING_ENGINE, 10)]:
+        routes = routes_with_unreachable(num_routes)
+        try:
+            flightplan = task_2(routes, engine=engine, local_search_time=0, obstacles=[OBSTACLE])
+        finally:
+            set_planning_obstacles(routes, [])
+
+        assert flightplan.reward_collected > 0, engine
+        assert UNREACHABLE_ROUTE not in flightplan.route_plan, engine
+        assert not math.isinf(flightplan.time_accumulated), engine
+
+
+def test_caller_routes_unchanged():
+    routes = routes_with_unreachable(10)
+    distances = [route.distance for route in routes]
+    try:
+        detour_plan = task_2(routes, engine=DYNAMIC_PROGRAMMING_ENGINE, local_search_time=0, obstacles=[OBSTACLE])
+        assert [route.distance for route in routes] == distances
+    finally:
+        set_planning_obstacles(routes, [])
+
+    # Planning without obstacles afterwards starts from straight line distances
+    plan = task_2(routes, engine=DYNAMIC_PROGRAMMING_ENGINE, local_search_time=0)
+    fresh_plan = task_2(routes_with_unreachable(10), engine=DYNAMIC_PROGRAMMING_ENGINE, local_search_time=0)
+    assert plan.route_plan == fresh_plan.route_plan
+    assert plan.time_accumulated == fresh_plan.time_accumulated
+    assert UNREACHABLE_ROUTE not in detour_plan.route_plan
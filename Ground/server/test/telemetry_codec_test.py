@@ -0,0 +1,97 @@
+# Tests for the binary telemetry encoding and the telemetry uplink
+#
+# Usage (from the repository root):
+#   python -m pytest Ground/server/test/telemetry_codec_test.py
+import os
+import sys
+import threading
+import time
+
+import pytest
+from flask import Flask, request
+from werkzeug.serving import make_server
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../..'))
+
+from Shared.apiClient import ApiClient
+from Shared.telemetryCodec import encode_telemetry, decode_telemetry, format_time_ns, TELEMETRY_CONTENT_TYPE
+from Shared.telemetryUplink import TelemetryUplink
+
+SAMPLE = {
+    "latitude": 44.2253012,
+    "longitude": -76.4951234,
+    "altitude": 87.654,
+    "roll": 0.125,
+    "yaw": -1.5,
+    "pitch": 0.0625,
+    "battery_percentage": 87,
+    "time_ns": 1700000000123456789,
+    "current_command": "Navigate"
+}
+
+
+def test_round_trip():
+    decoded = decode_telemetry(encode_telemetry(SAMPLE))
+
+    assert decoded["latitude"] == pytest.approx(SAMPLE["latitude"], abs=1e-7)
+    assert decoded["longitude"] == pytest.approx(SAMPLE["longitude"], abs=1e-7)
+    assert decoded["altitude"] == pytest.approx(SAMPLE["altitude"], abs=1e-3)
+    for field in ["roll", "yaw", "pitch", "battery_percentage", "time_ns", "current_command"]:
+        assert decoded[field] == SAMPLE[field], field
+    assert decoded["time"] == format_time_ns(SAMPLE["time_ns"])
+
+
+def test_round_trip_sentinels():
+    # Attitude and battery not received from the Pixhawk yet, no command
+    sample = {"latitude": 44.2253012, "longitude": -76.4951234, "altitude": 0, "roll": -1, "yaw": -1, "pitch": -1,
+              "battery_percentage": -1, "time_ns": SAMPLE["time_ns"], "current_command": None}
+    decoded = decode_telemetry(encode_telemetry(sample))
+
+    for field in ["roll", "yaw", "pitch", "battery_percentage"]:
+        assert decoded[field] == -1, field
+    assert decoded["current_command"] is None
+    # Missing fields are encoded as the same sentinels
+    decoded = decode_telemetry(encode_telemetry({"latitude": 1, "longitude": 2, "altitude": 3}))
+    assert [decoded[field] for field in ["roll", "yaw", "pitch", "battery_percentage"]] == [-1, -1, -1, -1]
+
+
+def test_malformed_telemetry():
+    encoded = encode_telemetry(SAMPLE)
+    for data in [b"", encoded[:10], bytes([encoded[0] + 1]) + encoded[1:]]:
+        with pytest.raises(ValueError):
+            decode_telemetry(data)
+    with pytest.raises(ValueError):
+        encode_telemetry({"latitude": 1})
+
+
+def test_uplink_falls_back_to_json_on_415():
+    # Endpoint accepting json only, as before the binary encoding
+    app = Flask(__name__)
+    received = []
+
+    @app.route('/telemetry', methods=['POST'])
+    def telemetry():
+        received.append((request.mimetype, request.get_json()))
+        return {"success": True}
+
+    server = make_server("127.0.0.1", 0, app)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    uplink = TelemetryUplink(ApiClient(f"http://127.0.0.1:{server.server_port}"), "/telemetry", encoding="binary")
+    try:
+        uplink.submit(SAMPLE)
+        deadline = time.monotonic() + 5
+        while uplink.stats()["sent"] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        uplink.submit(SAMPLE)
+        while uplink.stats()["sent"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        uplink.close()
+        server.shutdown()
+
+    stats = uplink.stats()
+    assert stats["sent"] == 2 and stats["failed"] == 0
+    assert stats["encoding"] == "json"
+    # Both samples arrived as json, the binary POST was rejected before the handler appended
+    assert received == [("application/json", SAMPLE), ("application/json", SAMPLE)]
+    assert TELEMETRY_CONTENT_TYPE not in [mimetype for mimetype, _ in received]
@@ -0,0 +1,65 @@
+# Tests for the telemetry frames emitted to SocketIO clients
+#
+# Usage (from the repository root):
+#   python -m pytest Ground/server/test/telemetry_scheduler_test.py
+import os
+import sys
+import time
+
+from flask import Flask
+from flask_socketio import SocketIO
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../..'))
+
+from telemetryHandler import TelemetryHandler, TELEMETRY_UI_RATE
+from telemetryScheduler import TELEMETRY_EVENT, TELEMETRY_FRAME_EVENT
+
+
+def make_handler() -> tuple[Flask, SocketIO, TelemetryHandler]:
+    app = Flask(__name__)
+    socket_io = SocketIO(app, async_mode="threading")
+    return app, socket_io, TelemetryHandler(socket_io)
+
+
+def send_samples(handler: TelemetryHandler, seconds: float) -> None:
+    end_time = time.monotonic() + seconds
+    while time.monotonic() < end_time:
+        handler.extract_and_notify({"longitude": -76.4, "latitude": 44.2, "altitude": 30, "time": "12:00:00 000000"})
+        time.sleep(0.02)
+
+
+def frames(client) -> list:
+    return [event for event in client.get_received() if event["name"] == TELEMETRY_FRAME_EVENT]
+
+
+def test_subscribed_client_receives_only_its_rate():
+    app, socket_io, handler = make_handler()
+    default_client = socket_io.test_client(app)
+    slow_client = socket_io.test_client(app)
+    ack = slow_client.emit("subscribe-telemetry", {"rate": 2}, callback=True)
+    assert ack == {"success": True, "room": "telemetry-2hz"}
+
+    send_samples(handler, 1.5)
+
+    default_received = default_client.get_received()
+    default_frames = [event for event in default_received if event["name"] == TELEMETRY_FRAME_EVENT]
+    assert len(default_frames) >= TELEMETRY_UI_RATE * 0.75
+    assert any(event["name"] == TELEMETRY_EVENT for event in default_received)
+    # 2 Hz for 1.5 seconds, no frames of the default rate
+    assert 1 <= len(frames(slow_client)) <= 4
+
+    ack = slow_client.emit("unsubscribe-telemetry", {"rate": 2}, callback=True)
+    assert ack["success"]
+    send_samples(handler, 1)
+    assert len(frames(slow_client)) >= TELEMETRY_UI_RATE * 0.5
+
+
+def test_invalid_rate_acknowledged_with_error():
+    app, socket_io, handler = make_handler()
+    client = socket_io.test_client(app)
+    for data in [{"rate": None}, {"rate": "fast"}, {"rate": float("nan")}, "fast"]:
+        for event in ["subscribe-telemetry", "unsubscribe-telemetry"]:
+            ack = client.emit(event, data, callback=True)
+            assert ack["success"] is False, (event, data)
+            assert ack["message"]
@@ -1,5 +1,13 @@
 from typing import Union
 
+import numpy as np
+from pyproj import Geod
+
+# WGS84 ellipsoid used for all waypoint distances
+GEOD = Geod(ellps="WGS84")
+# Detour waypoints around obstacles are numbered from here
+DETOUR_WAYPOINT_NUMBER = 1000
+
 
 class Waypoint:
     def __init__(self, name, number, longitude, latitude):
@@ -78,6 +86,20 @@ class WaypointList:
         for waypoint in ALL_WAYPOINTS:
             self.waypoints[waypoint.name] = waypoint
 
+        # Distances in metres between every registered waypoint, rows and
+        # columns indexed through matrix_index by Waypoint number
+        self.matrix_index = {}
+        self.matrix_waypoints = []
+        self.geodesic_matrix = np.zeros((0, 0))
+        self.distance_matrix = np.zeros((0, 0))
+        self.distance_rows = []
+
+        # Obstacle avoiding distances replacing straight line ones and the
+        # waypoints flown between, keyed by (start number, end number)
+        self.detour_distances = {}
+        self.detour_paths = {}
+        self.register_waypoints(ALL_WAYPOINTS)
+
     def get_wp_by_name(self, name) -> Union[None, Waypoint]:
         """Returns waypoint associated with input name
 
@@ -94,10 +116,128 @@ class WaypointList:
         :param number: Waypoint number to search for (str)
         :return: Waypoint with given number, else None
         """
-        for waypoint in self.waypoints:
+        for waypoint in self.waypoints.values():
             if waypoint.number == number:
                 return waypoint
         return None
 
+    def register_waypoints(self, waypoints: list[Waypoint]) -> None:
+        """Add waypoints to the distance matrix, computing all new distances
+        in one vectorized call. Waypoints already registered are replaced
+        if their coordinates changed
+
+        :param waypoints: Waypoints to add to the distance matrix (list)
+        """
+        new_waypoints = []
+        for waypoint in waypoints:
+            if waypoint.number in self.matrix_index:
+                registered = self.matrix_waypoints[self.matrix_index[waypoint.number]]
+                if registered.longitude == waypoint.longitude and \
+                        registered.latitude == waypoint.latitude:
+                    continue
+            new_waypoints.append(waypoint)
+        if not new_waypoints:
+            return
+
+        for waypoint in new_waypoints:
+            if waypoint.number in self.matrix_index:
+                self.matrix_waypoints[self.matrix_index[waypoint.number]] = waypoint
+            else:
+                self.matrix_index[waypoint.number] = len(self.matrix_waypoints)
+                self.matrix_waypoints.append(waypoint)
+
+        longitudes = np.array([wp.longitude for wp in self.matrix_waypoints], dtype=float)
+        latitudes = np.array([wp.latitude for wp in self.matrix_waypoints], dtype=float)
+        lon_1, lon_2 = np.meshgrid(longitudes, longitudes, indexing="ij")
+        lat_1, lat_2 = np.meshgrid(latitudes, latitudes, indexing="ij")
+        _, _, distances = GEOD.inv(lon_1, lat_1, lon_2, lat_2)
+        self.geodesic_matrix = distances
+        self.update_distance_matrix()
+
+    def update_distance_matrix(self) -> None:
+        """Rebuild the distance matrix from geodesic distances, replacing
+        those with a registered obstacle avoiding detour
+        """
+        self.distance_matrix = self.geodesic_matrix.copy()
+        for (start_num, end_num), distance in self.detour_distances.items():
+            start_i = self.matrix_index.get(start_num)
+            end_i = self.matrix_index.get(end_num)
+            if start_i is not None and end_i is not None:
+                self.distance_matrix[start_i, end_i] = distance
+        # Nested lists are faster than numpy for single element lookups
+        self.distance_rows = self.distance_matrix.tolist()
+
+    def set_detours(self, detour_distances: dict, detour_paths: dict) -> None:
+        """Replace straight line distances between registered waypoints with
+        obstacle avoiding ones. Empty dicts restore straight lines
+
+        :param detour_distances: Distance in metres keyed by (start number,
+        end number), inf where no path exists (dict)
+        :param detour_paths: (longitude, latitude) coordinates flown between
+        the waypoints, keyed by (start number, end number) (dict)
+        """
+        self.detour_distances = detour_distances
+        # Paths sharing an obstacle vertex share its Waypoint
+        vertex_waypoints = {}
+        self.detour_paths = {}
+        for key, coordinates in detour_paths.items():
+            path = []
+            for longitude, latitude in coordinates:
+                if (longitude, latitude) not in vertex_waypoints:
+                    vertex_num = len(vertex_waypoints) + 1
+                    vertex_waypoints[(longitude, latitude)] = Waypoint(
+                        f"Detour {vertex_num}", DETOUR_WAYPOINT_NUMBER + vertex_num, longitude, latitude)
+                path.append(vertex_waypoints[(longitude, latitude)])
+            self.detour_paths[key] = path
+        self.update_distance_matrix()
+
+    def get_detour_path(self, start_wp: Waypoint, end_wp: Waypoint) -> list[Waypoint]:
+        """Returns the waypoints to fly through between two registered
+        waypoints to avoid obstacles
+
+        :param start_wp: Waypoint flown from (Waypoint)
+        :param end_wp: Waypoint flown to (Waypoint)
+        :return: Intermediate waypoints, empty if the straight line is clear
+        """
+        if not self.detour_paths or self.get_matrix_index(start_wp) is None or \
+                self.get_matrix_index(end_wp) is None:
+            return []
+        return self.detour_paths.get((start_wp.number, end_wp.number), [])
+
+    def get_matrix_index(self, waypoint: Waypoint) -> Union[None, int]:
+        """Returns the distance matrix row of a registered waypoint
+
+        :param waypoint: Waypoint to look up (Waypoint)
+        :return: Row index, else None if not registered at these coordinates
+        """
+        index = self.matrix_index.get(waypoint.number)
+        if index is None:
+            return None
+        registered = self.matrix_waypoints[index]
+        if registered is waypoint or (registered.longitude == waypoint.longitude and
+                                      registered.latitude == waypoint.latitude):
+            return index
+        return None
+
+    def get_distance(self, start_wp: Waypoint, end_wp: Waypoint) -> float:
+        """Returns the distance in metres between two waypoints, read from
+        the distance matrix when both are registered
+
+        :param start_wp: Waypoint to measure from (Waypoint)
+        :param end_wp: Waypoint to measure to (Waypoint)
+        :return: Distance in metres (float)
+        """
+        start_i = self.matrix_index.get(start_wp.number)
+        end_i = self.matrix_index.get(end_wp.number)
+        if start_i is not None and end_i is not None:
+            if (self.matrix_waypoints[start_i] is start_wp and self.matrix_waypoints[end_i] is end_wp) or \
+                    (self.get_matrix_index(start_wp) is not None and self.get_matrix_index(end_wp) is not None):
+                return self.distance_rows[start_i][end_i]
+
+        # Ad-hoc waypoint, e.g. current drone position
+        _, _, distance = GEOD.inv(start_wp.longitude, start_wp.latitude,
+                                  end_wp.longitude, end_wp.latitude)
+        return distance
+
 
 WAYPOINT_LST = WaypointList()
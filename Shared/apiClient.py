@@ -0,0 +1,170 @@
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) seconds before a request is abandoned
+DEFAULT_TIMEOUT = (3.05, 10)
+# Timeouts of endpoints that must fail fast
+ENDPOINT_TIMEOUTS = {
+    "/heartbeat": (1, 1.5),
+    "/set-telemetry": (1, 2),
+    "/propagate-telemetry": (1, 2)
+}
+# Retries after a failed attempt
+DEFAULT_RETRIES = 2
+# Seconds before the first retry, doubled for each retry after it
+RETRY_BACKOFF = 0.2
+# Responses worth retrying, the server is restarting or overloaded
+RETRY_STATUSES = {502, 503, 504}
+# Connections kept alive per host
+POOL_SIZE = 8
+# Latencies kept per endpoint for percentiles
+LATENCY_SAMPLES = 256
+
+# Shared clients by base url
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def percentile(sorted_values: list, percent: float) -> float:
+    """Nearest rank percentile of sorted values"""
+    rank = max(int(round(percent / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[rank]
+
+
+class ApiClient:
+    """HTTP client for one of the Ground or Flight APIs.
+
+    Requests share a keep-alive Session, time out per endpoint and are
+    retried with jittered exponential backoff. GET requests are retried on
+    any connection error, timeout or RETRY_STATUSES response; other methods
+    only on connection errors, not after a read timeout as the request may
+    have been received. Latency is recorded per endpoint.
+    """
+
+    def __init__(self, base_url: str, retries: int = DEFAULT_RETRIES) -> None:
+        """Initialize ApiClient object with a pooled Session
+
+        :param base_url: scheme, host and port of the API (str)
+        :param retries: default retries after a failed attempt (int)
+        """
+        self.base_url = base_url
+        self.retries = retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.metrics_lock = threading.Lock()
+        self.endpoint_metrics = {}
+
+    def get(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("GET", endpoint, **kwargs)
+
+    def post(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("POST", endpoint, **kwargs)
+
+    def request(self, method: str, endpoint: str, retries: int = None,
+                **kwargs) -> requests.Response:
+        """Send a request, retrying failed attempts
+
+        :param method: HTTP method (str)
+        :param endpoint: path on the API, such as "/heartbeat" (str)
+        :param retries: retries after a failed attempt, defaults to the
+            client's (int)
+        :param kwargs: passed to requests, timeout defaults to the endpoint's
+        :return: response of the last attempt, the caller checks its status
+        :raises requests.exceptions.RequestException: the last attempt failed
+        """
+        retries = self.retries if retries is None else retries
+        kwargs.setdefault("timeout",
+                          ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT))
+        start_time = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method,
+                                                f"{self.base_url}{endpoint}",
+                                                **kwargs)
+                retry = method == "GET" and \
+                    response.status_code in RETRY_STATUSES
+                error = None
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout) as e:
+                # A request timing out once sent may have been received
+                retry = method == "GET" or \
+                    isinstance(e, requests.exceptions.ConnectionError)
+                error = e
+            except requests.exceptions.RequestException as e:
+                retry = False
+                error = e
+
+            if not retry or attempt >= retries:
+                self._record(endpoint, time.perf_counter() - start_time,
+                             attempt, error is not None)
+                if error is not None:
+                    raise error
+                return response
+            time.sleep(RETRY_BACKOFF * 2 ** attempt *
+                       random.uniform(0.5, 1.5))
+            attempt += 1
+
+    def _record(self, endpoint: str, latency: float, retries: int,
+                failed: bool) -> None:
+        with self.metrics_lock:
+            metrics = self.endpoint_metrics.setdefault(endpoint, {
+                "calls": 0,
+                "failures": 0,
+                "retries": 0,
+                "latencies": deque(maxlen=LATENCY_SAMPLES)
+            })
+            metrics["calls"] += 1
+            metrics["failures"] += failed
+            metrics["retries"] += retries
+            metrics["latencies"].append(latency)
+
+    def metrics(self) -> dict:
+        """Calls, failures, retries and latency percentiles per endpoint
+
+        :return: dictionary of metrics by endpoint, latencies in ms
+        """
+        with self.metrics_lock:
+            summary = {}
+            for endpoint, metrics in self.endpoint_metrics.items():
+                latencies = sorted(metrics["latencies"])
+                summary[endpoint] = {
+                    "calls": metrics["calls"],
+                    "failures": metrics["failures"],
+                    "retries": metrics["retries"],
+                    "latency_p50_ms": percentile(latencies, 50) * 1000,
+                    "latency_p95_ms": percentile(latencies, 95) * 1000,
+                    "latency_max_ms": latencies[-1] * 1000
+                }
+            return summary
+
+
+def get_api_client(base_url: str) -> ApiClient:
+    """Shared ApiClient for an API, so every caller in a process pools
+    connections to it
+
+    :param base_url: scheme, host and port of the API (str)
+    :return: ApiClient
+    """
+    with _clients_lock:
+        if base_url not in _clients:
+            _clients[base_url] = ApiClient(base_url)
+        return _clients[base_url]
+
+
+def get_api_metrics() -> dict:
+    """Metrics of every shared ApiClient in this process
+
+    :return: dictionary of ApiClient.metrics by base url
+    """
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {client.base_url: client.metrics() for client in clients}
@@ -0,0 +1,95 @@
+import struct
+import time
+from datetime import datetime
+from functools import lru_cache
+
+# Content type of a telemetry sample encoded by encode_telemetry
+TELEMETRY_CONTENT_TYPE = "application/x-telemetry"
+# Layout version, the first byte of every encoded sample
+TELEMETRY_VERSION = 1
+# Little-endian: version, epoch ns, latitude and longitude in 1e-7 degrees,
+# altitude in mm, roll, yaw and pitch in radians, battery percentage.
+# The current command follows as UTF-8, empty when there is none
+TELEMETRY_STRUCT = struct.Struct("<Bqiiifffb")
+
+
+@lru_cache(maxsize=1)
+def _format_seconds(seconds: int) -> str:
+    # Consecutive samples share their second, formatted once
+    return datetime.fromtimestamp(seconds).strftime("%H:%M:%S")
+
+
+def format_time_ns(time_ns: int) -> str:
+    """Format an epoch timestamp as the "time" field of telemetry,
+    "%H:%M:%S %f" in local time
+
+    :param time_ns: nanoseconds since the epoch (int)
+    :return: formatted time (str)
+    """
+    seconds, nanoseconds = divmod(time_ns, 10 ** 9)
+    return f"{_format_seconds(seconds)} {nanoseconds // 1000:06d}"
+
+
+def encode_telemetry(sample: dict) -> bytes:
+    """Encode a telemetry dictionary with TELEMETRY_STRUCT.
+    Values are stored at MAVLink resolution, 1e-7 degrees and 1 mm
+
+    :param sample: telemetry from PixhawkController.get_telemetry (dict)
+    :return: encoded sample (bytes)
+    :raises ValueError: a field is missing or out of range
+    """
+    command = sample.get("current_command")
+    try:
+        return TELEMETRY_STRUCT.pack(
+            TELEMETRY_VERSION,
+            sample.get("time_ns") or time.time_ns(),
+            round(sample["latitude"] * 1e7),
+            round(sample["longitude"] * 1e7),
+            round(sample["altitude"] * 1e3),
+            sample.get("roll", -1),
+            sample.get("yaw", -1),
+            sample.get("pitch", -1),
+            sample.get("battery_percentage", -1)
+        ) + (str(command).encode() if command else b"")
+    except (KeyError, TypeError, struct.error) as e:
+        raise ValueError(f"Telemetry not encodable: {e}")
+
+
+def decode_telemetry(data: bytes) -> dict:
+    """Decode a sample encoded by encode_telemetry into the telemetry
+    dictionary it was encoded from
+
+    :param data: encoded sample (bytes)
+    :return: telemetry dictionary, with "time" formatted from "time_ns"
+    :raises ValueError: data is not an encoded sample of this version
+    """
+    if len(data) < TELEMETRY_STRUCT.size or data[0] != TELEMETRY_VERSION:
+        raise ValueError("Malformed Telemetry")
+    (_, time_ns, latitude, longitude, altitude, roll, yaw, pitch,
+     battery_percentage) = TELEMETRY_STRUCT.unpack_from(data)
+    command = data[TELEMETRY_STRUCT.size:]
+    return {
+        "latitude": latitude / 1e7,
+        "longitude": longitude / 1e7,
+        "altitude": altitude / 1e3,
+        "roll": roll,
+        "yaw": yaw,
+        "pitch": pitch,
+        "battery_percentage": battery_percentage,
+        "time": format_time_ns(time_ns),
+        "time_ns": time_ns,
+        "current_command": command.decode() if command else None
+    }
+
+
+def read_telemetry_request(request) -> dict:
+    """Telemetry dictionary of a Flask request, decoded by its content type,
+    TELEMETRY_CONTENT_TYPE or json
+
+    :param request: request POSTing telemetry (flask.Request)
+    :return: telemetry dictionary
+    :raises ValueError: the body is not an encoded sample
+    """
+    if request.mimetype == TELEMETRY_CONTENT_TYPE:
+        return decode_telemetry(request.get_data())
+    return request.get_json()
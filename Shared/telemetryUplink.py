@@ -0,0 +1,186 @@
+import configparser
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+
+from Shared.apiClient import ApiClient
+from Shared.telemetryCodec import TELEMETRY_CONTENT_TYPE, encode_telemetry
+
+config = configparser.ConfigParser()
+config.read(os.path.join(os.path.dirname(__file__), '..', 'config.ini'))
+
+# Samples waiting to be sent before the oldest is dropped
+TELEMETRY_QUEUE_SIZE = 8
+# Seconds a sample can wait before it is too stale to send
+MAX_TELEMETRY_AGE = 2.0
+# Seconds before a telemetry POST is abandoned
+TELEMETRY_POST_TIMEOUT = 2.0
+# Seconds between logged drop counts
+TELEMETRY_REPORT_INTERVAL = 10.0
+# Encoding samples are sent in, "json" or "binary" (telemetryCodec) once
+# every receiving endpoint decodes it
+TELEMETRY_ENCODING = config['Shared'].get('Telemetry_Encoding',
+                                          fallback='json')
+
+
+class TelemetryUplink:
+    """Sends telemetry samples to an endpoint from a background thread.
+
+    Callers submit samples without waiting on the network. Samples wait in a
+    bounded queue; the sender always posts the latest one and drops the
+    samples it supersedes, as well as samples older than max_age.
+    Binary samples rejected as an unsupported media type are sent again as
+    json, and every later sample with them.
+    """
+
+    def __init__(self, client: ApiClient, endpoint: str,
+                 max_pending: int = TELEMETRY_QUEUE_SIZE,
+                 max_age: float = MAX_TELEMETRY_AGE,
+                 timeout: float = TELEMETRY_POST_TIMEOUT,
+                 encoding: str = TELEMETRY_ENCODING) -> None:
+        """Initialize TelemetryUplink object and start its sender thread
+
+        :param client: client of the API samples are sent to (ApiClient)
+        :param endpoint: endpoint samples are POSTed to as json (str)
+        :param max_pending: max samples waiting to be sent (int)
+        :param max_age: max seconds a sample waits before it is dropped (float)
+        :param timeout: seconds before a POST is abandoned (float)
+        :param encoding: "binary" or "json" (str)
+        """
+        self.client = client
+        self.endpoint = endpoint
+        self.url = f"{client.base_url}{endpoint}"
+        self.max_age = max_age
+        self.timeout = timeout
+        self.encoding = encoding
+        self.pending = deque(maxlen=max_pending)
+        self.condition = threading.Condition()
+        self.closed = False
+        self.failing = False
+
+        self.submitted = 0
+        self.sent = 0
+        self.dropped = 0
+        self.stale = 0
+        self.failed = 0
+        self.bytes_sent = 0
+        self.last_report_time = time.monotonic()
+        self.last_report_dropped = 0
+
+        self.sender_thread = threading.Thread(target=self._send_samples)
+        self.sender_thread.daemon = True
+        self.sender_thread.start()
+
+    def submit(self, sample: dict) -> None:
+        """Queue a sample to be sent without blocking.
+        When the queue is full the oldest sample is dropped
+
+        :param sample: telemetry to send (dict)
+        """
+        with self.condition:
+            if len(self.pending) == self.pending.maxlen:
+                self.dropped += 1
+            self.pending.append((time.monotonic(), sample))
+            self.submitted += 1
+            self.condition.notify()
+
+    def stats(self) -> dict:
+        """Counts of samples submitted, sent and dropped
+
+        :return: dictionary of sample counts
+        """
+        with self.condition:
+            return {
+                "submitted": self.submitted,
+                "sent": self.sent,
+                "dropped": self.dropped,
+                "stale": self.stale,
+                "failed": self.failed,
+                "pending": len(self.pending),
+                "encoding": self.encoding,
+                "bytes_per_sample": self.bytes_sent / self.sent
+                if self.sent else 0
+            }
+
+    def close(self) -> None:
+        """Stop the sender thread, dropping samples not yet sent"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+    def _send_samples(self) -> None:
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending or self.closed)
+                if self.closed:
+                    return
+                # Coalesce to the latest sample
+                submit_time, sample = self.pending.pop()
+                self.dropped += len(self.pending)
+                self.pending.clear()
+
+            if time.monotonic() - submit_time > self.max_age:
+                with self.condition:
+                    self.stale += 1
+                self._report()
+                continue
+
+            try:
+                response, size = self._post(sample)
+                if response.status_code == 415 and self.encoding == "binary":
+                    logging.warning(f"Telemetry Uplink - {self.url} does not "
+                                    f"accept binary telemetry, sending json")
+                    self.encoding = "json"
+                    response, size = self._post(sample)
+                response.raise_for_status()
+                with self.condition:
+                    self.sent += 1
+                    self.bytes_sent += size
+                if self.failing:
+                    logging.info(f"Telemetry Uplink - {self.url} reconnected")
+                    self.failing = False
+            except requests.exceptions.RequestException as e:
+                with self.condition:
+                    self.failed += 1
+                # Log the first failure only, later ones are counted
+                if not self.failing:
+                    logging.warning(f"Telemetry Uplink - POST Error:\n\t{e}")
+                    self.failing = True
+            self._report()
+
+    def _post(self, sample: dict) -> tuple:
+        # Not retried, the next sample supersedes this one
+        body = None
+        if self.encoding == "binary":
+            try:
+                body = encode_telemetry(sample)
+                headers = {"Content-Type": TELEMETRY_CONTENT_TYPE}
+            except ValueError:
+                # Incomplete samples can only be forwarded as json
+                pass
+        if body is None:
+            body = json.dumps(sample).encode()
+            headers = {"Content-Type": "application/json"}
+        response = self.client.post(self.endpoint, data=body,
+                                    headers=headers, timeout=self.timeout,
+                                    retries=0)
+        return response, len(body)
+
+    def _report(self) -> None:
+        # Log samples dropped since the last report
+        now = time.monotonic()
+        if now - self.last_report_time < TELEMETRY_REPORT_INTERVAL:
+            return
+        stats = self.stats()
+        lost = stats["dropped"] + stats["stale"] - self.last_report_dropped
+        if lost:
+            logging.warning(f"Telemetry Uplink - {lost} samples to {self.url} "
+                            f"dropped in {now - self.last_report_time:.0f}s: "
+                            f"{stats}")
+        self.last_report_time = now
+        self.last_report_dropped = stats["dropped"] + stats["stale"]